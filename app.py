@@ -1,13 +1,14 @@
 import streamlit as st
 import pandas as pd
+import json
 import sys
 import os
 
 # Add modules to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
 
-from modules.data_loader import LoanDataLoader
-from modules.chat_engine import LoanApprovalChatEngine
+from modules.registry import create_session_engine, get_shared_resources
+from modules import metrics
 from modules.utils import *
 
 # Page configuration
@@ -19,10 +20,10 @@ st.set_page_config(
 )
 
 # Initialize session state
-# Initialize session state
+# Dataset, stats and model handler are shared process-wide; only chat history is per session
 if 'chat_engine' not in st.session_state:
     try:
-        st.session_state.chat_engine = LoanApprovalChatEngine('loan_data.csv')
+        st.session_state.chat_engine = create_session_engine('loan_data.csv')
         st.session_state.messages = []
     except Exception as e:
         st.error(f"Note: AI features limited - {e}")
@@ -32,13 +33,23 @@ if 'chat_engine' not in st.session_state:
 
 if 'data_loaded' not in st.session_state:
     try:
-        st.session_state.data_loader = LoanDataLoader('loan_data.csv')
-        st.session_state.df = st.session_state.data_loader.load_data()
-        st.session_state.stats = st.session_state.data_loader.get_approval_stats()
+        shared = get_shared_resources('loan_data.csv')
+        if shared.df is None:
+            raise RuntimeError(shared.data_context)
+        st.session_state.data_loader = shared.data_loader
+        st.session_state.df = shared.df
+        st.session_state.stats = shared.stats
+        st.session_state.segment_cube = shared.segment_cube
         st.session_state.data_loaded = True
     except Exception as e:
         st.error(f"Error loading data: {e}")
         st.session_state.data_loaded = False
+elif st.session_state.data_loaded:
+    # Pick up applications ingested since this session started (see SharedResources.ingest)
+    shared = get_shared_resources('loan_data.csv')
+    st.session_state.df = shared.df
+    st.session_state.stats = shared.stats
+    st.session_state.segment_cube = shared.segment_cube
 
 def main():
     # Header
@@ -55,6 +66,10 @@ def main():
         ["Chat with Bot", "Data Analysis", "Loan Application Analysis", "About"]
     )
     
+    # Timings are only recorded with LOAN_METRICS=1
+    if metrics.REGISTRY.enabled:
+        display_metrics_sidebar()
+    
     if app_mode == "Chat with Bot":
         display_chat_interface()
     elif app_mode == "Data Analysis":
@@ -64,6 +79,20 @@ def main():
     else:
         display_about()
 
+def display_metrics_sidebar():
+    with st.sidebar.expander("Performance metrics"):
+        snapshot = metrics.REGISTRY.snapshot()
+        rows = []
+        for name, metric in snapshot['metrics'].items():
+            if metric['type'] == 'histogram':
+                rows.append({'metric': name, 'count': metric['count'], 'p50': metric['p50'], 'p95': metric['p95']})
+            else:
+                rows.append({'metric': name, 'count': metric['value']})
+        if rows:
+            st.dataframe(pd.DataFrame(rows), hide_index=True)
+        st.download_button("Prometheus text", metrics.REGISTRY.render_prometheus(), file_name="metrics.prom")
+        st.download_button("JSON snapshot", json.dumps(snapshot, indent=2), file_name="metrics.json")
+
 def display_chat_interface():
     st.header("💬 Chat with Uniccon Loan Bot")
     
@@ -83,22 +112,21 @@ def display_chat_interface():
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Get bot response
+        # Get bot response, rendered token by token as the model streams it
         with st.chat_message("assistant"):
-            with st.spinner("Analyzing..."):
-                try:
-                    if st.session_state.chat_engine:
-                        response = st.session_state.chat_engine.process_message(prompt)
-                    else:
-                        # Fallback response if chat engine failed to initialize
-                        response = "I can provide general loan guidance. For AI features, please ensure Ollama is installed and running."
-            
+            try:
+                if st.session_state.chat_engine:
+                    response = st.write_stream(st.session_state.chat_engine.process_message_stream(prompt))
+                else:
+                    # Fallback response if chat engine failed to initialize
+                    response = "I can provide general loan guidance. For AI features, please ensure Ollama is installed and running."
                     st.markdown(response)
-                    st.session_state.messages.append({"role": "assistant", "content": response})
-                except Exception as e:
-                    error_msg = f"I'm here to help with loan information! For full AI features, please check that Ollama is installed. Error: {str(e)}"
-                    st.markdown(error_msg)
-                    st.session_state.messages.append({"role": "assistant", "content": error_msg})
+                
+                st.session_state.messages.append({"role": "assistant", "content": response})
+            except Exception as e:
+                error_msg = f"I'm here to help with loan information! For full AI features, please check that Ollama is installed. Error: {str(e)}"
+                st.markdown(error_msg)
+                st.session_state.messages.append({"role": "assistant", "content": error_msg})
     # Clear chat button
     if st.button("Clear Chat History"):
         st.session_state.messages = []
@@ -116,14 +144,27 @@ def display_data_analysis():
     st.subheader("Key Statistics")
     display_loan_stats(st.session_state.stats)
     
-    # Visualizations
+    # Visualizations: figures are cached per dataset, and large data is binned server-side
+    data_key = st.session_state.data_loader.data_key()
+    chart_modes = {"Automatic": 'auto', "Density (binned)": 'density', "Stratified sample": 'sample', "All points": 'raw'}
+    chart_mode = st.selectbox("Scatter rendering", list(chart_modes))
     col1, col2 = st.columns(2)
     
     with col1:
-        create_approval_chart(st.session_state.df)
+        create_approval_chart(st.session_state.df, cache_key=data_key)
     
     with col2:
-        create_income_vs_credit_chart(st.session_state.df)
+        create_income_vs_credit_chart(st.session_state.df, mode=chart_modes[chart_mode], cache_key=data_key)
+    
+    # Approval rates per segment, read from the precomputed cube
+    cube = st.session_state.get('segment_cube')
+    if cube is not None:
+        st.subheader("Approval Rate by Segment")
+        dimension_titles = {"Credit score group": 'credit_score', "DTI ratio": 'dti_ratio', "Income decile": 'income',
+                            "Employment status": 'employment_status', "Loan-to-income ratio": 'loan_to_income'}
+        dimensions = st.multiselect("Break down by", list(dimension_titles), default=["Credit score group"])
+        if dimensions:
+            st.dataframe(cube.rollup(*(dimension_titles[d] for d in dimensions)), hide_index=True, use_container_width=True)
     
     # Sample data
     st.subheader("Sample Loan Applications")
@@ -195,11 +236,27 @@ def display_loan_analysis():
                         ))
                         st.plotly_chart(fig)
                         
+                        if 'approval_probability' in analysis_result:
+                            st.metric("Model Approval Probability", f"{analysis_result['approval_probability']:.1%}")
+                        
                         # Factors and recommendations
                         st.subheader("Key Factors")
                         for factor in analysis_result['factors']:
                             st.write(f"• {factor}")
                         
+                        if 'similar_applications' in analysis_result:
+                            similar = analysis_result['similar_applications']
+                            st.subheader("Applicants Like You")
+                            st.write(f"{similar['approved']} of the {similar['k']} most similar past applications "
+                                     f"were approved ({similar['approval_rate']:.0f}%).")
+                            st.dataframe(similar['neighbors'], use_container_width=True)
+                        
+                        if analysis_result.get('segment', {}).get('applications'):
+                            segment = analysis_result['segment']
+                            st.metric("Approval Rate in Your Segment", f"{segment['approval_rate']:.1f}%",
+                                      help=f"{segment['applications']:,} past applications with "
+                                           + "; ".join(f"{k.replace('_', ' ')}: {v}" for k, v in segment['segment'].items()))
+                        
                         st.subheader("AI Analysis")
                         st.write(analysis_result['analysis'])
                         
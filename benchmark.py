@@ -0,0 +1,337 @@
+"""Benchmark suite for the loan data pipeline and chat paths.
+
+Generates synthetic CSVs matching the loan_data.csv schema and times, at
+each size, CSV parsing against the columnar cache, approval stats,
+preprocessing and batch scoring. The chat paths (approval analysis,
+fallback answers and process_message against a local stub Ollama server)
+are timed on the smallest dataset. Results are written as JSON so runs
+can be compared across releases.
+
+    python benchmark.py                                  # 24k, 1M and 10M rows, JSON to stdout
+    python benchmark.py --rows 24000 --output bench.json
+    python benchmark.py --rows 24000 --compare bench.json   # exit 1 on regressions
+    python benchmark.py --fallback                       # fallback intent matching vs table size
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+# Add modules to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+from modules.data_loader import LoanDataLoader
+from modules.fallback import DEFAULT_INTENTS, FallbackResponder, Intent
+from modules.registry import clear_shared_resources, create_session_engine
+from modules.scoring import score_applications
+from ollama_stub import OllamaStubServer
+
+DEFAULT_ROWS = [24_000, 1_000_000, 10_000_000]
+DEFAULT_REPEAT = 5
+CHAT_MESSAGES = 50
+REGRESSION_THRESHOLD = 1.5
+SEED = 42
+
+APPLICATION = {
+    'income': 65_000,
+    'credit_score': 690,
+    'loan_amount': 20_000,
+    'dti_ratio': 28.0,
+    'employment_status': 'employed',
+    'purpose': 'home renovation',
+}
+FALLBACK_INTENT_COUNTS = [len(DEFAULT_INTENTS), 100, 300, 1000]
+
+FALLBACK_PROMPTS = [
+    "Hello, can you help?",
+    "What credit score do I need for a personal loan?",
+    "Is a debt to income ratio of 40% too high for approval?",
+    "I want to ask about topic 950 keyword 2",
+    "Tell me something about the weather in my city this weekend please",
+]
+
+PURPOSES = [
+    "I need a loan to pay for an international vacation with my family.",
+    "I want to make home improvements like installing solar panels.",
+    "I need a loan for home renovation, including a kitchen remodel.",
+    "I need funds to buy new furniture and appliances for my house.",
+    "I need funds to upgrade my computer and buy software for freelance work.",
+    "I need a loan to buy a truck and start a moving business.",
+    "I need money to cover unexpected medical expenses from surgery.",
+    "I want to expand my small online clothing store.",
+]
+
+
+def generate_loan_data(n_rows: int, seed: int = SEED) -> pd.DataFrame:
+    """Synthetic frame with the loan_data.csv columns and value ranges"""
+    rng = np.random.default_rng(seed)
+    income = rng.integers(20_000, 200_001, n_rows)
+    credit_score = rng.integers(300, 851, n_rows)
+    loan_amount = np.maximum(1_000, (income * rng.uniform(0.05, 0.8, n_rows)).astype(np.int64))
+    dti_ratio = np.round(rng.gamma(2.0, 17.0, n_rows) + 2.5, 2)
+    employed = rng.random(n_rows) < 0.5
+
+    approval_score = (credit_score - 300) / 550 + employed * 0.3 - dti_ratio / 100
+    approved = approval_score + rng.normal(0, 0.15, n_rows) > 0.85
+
+    return pd.DataFrame({
+        'Text': np.asarray(PURPOSES, dtype=object)[rng.integers(0, len(PURPOSES), n_rows)],
+        'Income': income,
+        'Credit_Score': credit_score,
+        'Loan_Amount': loan_amount,
+        'DTI_Ratio': dti_ratio,
+        'Employment_Status': np.where(employed, 'employed', 'unemployed'),
+        'Approval': np.where(approved, 'Approved', 'Rejected'),
+    })
+
+
+def write_dataset(directory: str, n_rows: int) -> str:
+    path = os.path.join(directory, f"loan_data_{n_rows}.csv")
+    generate_loan_data(n_rows).to_csv(path, index=False)
+    return path
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def measure(func, repeat: int = DEFAULT_REPEAT, number: int = 1) -> dict:
+    """Seconds per call over `repeat` runs of `number` calls each"""
+    times = [timed(lambda: [func() for _ in range(number)]) / number for _ in range(repeat)]
+    return {
+        'min_s': min(times),
+        'median_s': statistics.median(times),
+        'mean_s': statistics.fmean(times),
+        'runs': repeat,
+        'calls_per_run': number,
+    }
+
+
+def bench_load(path: str) -> dict:
+    """Time a plain CSV parse, the first cached load and a warm cached load"""
+    LoanDataLoader(path).cache.invalidate()
+    return {
+        'csv_parse_s': timed(lambda: LoanDataLoader(path, use_cache=False).load_data()),
+        'cache_build_s': timed(lambda: LoanDataLoader(path).load_data()),
+        'cache_load_s': timed(lambda: LoanDataLoader(path).load_data()),
+    }
+
+
+def bench_dataset(path: str, repeat: int = DEFAULT_REPEAT) -> dict:
+    """Loading, stats, preprocessing and scoring for one dataset"""
+    result = bench_load(path)
+    loader = LoanDataLoader(path)
+    loader.load_data()
+    result['memory_bytes'] = loader.memory_report()['total_bytes']
+
+    def cold_stats():
+        loader._set_data(loader.df)  # drops memoized stats
+        loader.get_approval_stats()
+
+    result['approval_stats'] = measure(cold_stats, repeat)
+    result['approval_stats_memoized'] = measure(loader.get_approval_stats, repeat, number=100)
+    result['preprocess_data'] = measure(loader.preprocess_data, repeat)
+    result['score_applications'] = measure(lambda: score_applications(loader.df), repeat)
+    return result
+
+
+def bench_chat(path: str, repeat: int = DEFAULT_REPEAT, messages: int = CHAT_MESSAGES) -> dict:
+    """Chat engine paths against a zero-latency stub, so only our own overhead and HTTP are timed.
+
+    The engine is built by create_session_engine exactly as the app builds it,
+    routing and hedging included, with OLLAMA_HOST pointed at the stub.
+    """
+    stub = OllamaStubServer().start()
+    previous_host = os.environ.get('OLLAMA_HOST')
+    os.environ['OLLAMA_HOST'] = stub.url
+    clear_shared_resources()
+    try:
+        engine = create_session_engine(path)
+        counter = itertools.count()
+
+        def analysis():
+            # A new income each call, so the response cache never answers
+            engine.get_approval_analysis(dict(APPLICATION, income=APPLICATION['income'] + next(counter)))
+
+        def cached_message():
+            engine.clear_history()
+            engine.process_message("What credit score do I need?")
+
+        result = {
+            'get_approval_analysis': measure(analysis, repeat, number=10),
+            'fallback_response': measure(
+                lambda: [engine.model_handler._get_fallback_response(p) for p in FALLBACK_PROMPTS],
+                repeat, number=100),
+            'process_message': measure(
+                lambda: engine.process_message(f"Question {next(counter)}: how does my credit score affect approval?"),
+                repeat, number=messages),
+            'process_message_cached': measure(cached_message, repeat, number=messages),
+            'prompt_tokens': engine.last_prompt_report.get('prompt_tokens'),
+        }
+        result['fallback_response']['calls_per_run'] *= len(FALLBACK_PROMPTS)
+        for key in ('min_s', 'median_s', 'mean_s'):
+            result['fallback_response'][key] /= len(FALLBACK_PROMPTS)
+        return result
+    finally:
+        # Later benchmarks build their own resources against the configured server
+        clear_shared_resources()
+        if previous_host is None:
+            os.environ.pop('OLLAMA_HOST', None)
+        else:
+            os.environ['OLLAMA_HOST'] = previous_host
+        stub.stop()
+
+
+def synthetic_intents(n_intents: int):
+    """The default intents followed by generated lower-priority ones"""
+    extra = [Intent(f'topic_{i}', (f'topic {i} keyword 1', f'topic {i} keyword 2', f'subject{i}'), f'Answer {i}')
+             for i in range(n_intents - len(DEFAULT_INTENTS))]
+    return list(DEFAULT_INTENTS) + extra
+
+
+def linear_respond(intents, responses, prompt: str) -> str:
+    """The previous approach: scan every intent's keywords in order"""
+    prompt_lower = prompt.lower()
+    for intent, response in zip(intents, responses):
+        if any(word in prompt_lower for word in intent.keywords):
+            return response
+    return ''
+
+
+def bench_fallback(n_intents: int, repeat: int = 2000) -> dict:
+    """Mean microseconds per fallback answer for the automaton and a linear keyword scan"""
+    intents = synthetic_intents(n_intents)
+    responder = FallbackResponder(intents=intents)
+    n_calls = repeat * len(FALLBACK_PROMPTS)
+
+    def run(respond):
+        return timed(lambda: [respond(p) for _ in range(repeat) for p in FALLBACK_PROMPTS]) / n_calls * 1e6
+
+    return {
+        'matcher_us': run(responder.respond),
+        'linear_us': run(lambda p: linear_respond(intents, responder.responses, p)),
+    }
+
+
+def environment(repeat: int) -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'seed': SEED,
+        'repeat': repeat,
+    }
+
+
+def run_suite(rows, repeat: int = DEFAULT_REPEAT) -> dict:
+    results = {'environment': environment(repeat), 'datasets': {}}
+    with tempfile.TemporaryDirectory() as directory:
+        for n_rows in rows:
+            path = write_dataset(directory, n_rows)
+            print(f"Benchmarking {n_rows:,} rows...", file=sys.stderr)
+            results['datasets'][str(n_rows)] = bench_dataset(path, repeat)
+            if n_rows == min(rows):
+                results['chat'] = dict(bench_chat(path, repeat), rows=n_rows)
+    results['fallback_scaling'] = [dict(bench_fallback(n), intents=n) for n in FALLBACK_INTENT_COUNTS]
+    return results
+
+
+def timing_metrics(results: dict, prefix: str = '') -> dict:
+    """Flatten to {'datasets.24000.approval_stats': seconds}, taking the best of repeated measurements"""
+    metrics = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            if 'min_s' in value:
+                metrics[path] = value['min_s']
+            else:
+                metrics.update(timing_metrics(value, f"{path}."))
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict) and 'intents' in item:
+                    metrics.update(timing_metrics({k: v for k, v in item.items() if k != 'intents'},
+                                                  f"{path}.{item['intents']}."))
+        elif key.endswith('_s') and isinstance(value, (int, float)):
+            metrics[path] = value
+        elif key.endswith('_us') and isinstance(value, (int, float)):
+            metrics[path] = value / 1e6
+    return metrics
+
+
+def compare(results: dict, baseline: dict, threshold: float = REGRESSION_THRESHOLD) -> list:
+    """Metrics that got slower than `threshold` times the baseline"""
+    current, previous = timing_metrics(results), timing_metrics(baseline)
+    regressions = []
+    for name, seconds in sorted(current.items()):
+        before = previous.get(name)
+        if before and seconds > before * threshold and seconds - before > 1e-6:
+            regressions.append({'metric': name, 'baseline_s': before, 'current_s': seconds, 'ratio': seconds / before})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS)
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--output', help="write the JSON results to this file instead of stdout")
+    parser.add_argument('--compare', metavar='BASELINE', help="JSON results of an earlier run to check for regressions")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="slowdown ratio reported as a regression (default %(default)s)")
+    parser.add_argument('--fallback', action='store_true', help="only benchmark fallback intent matching")
+    args = parser.parse_args()
+
+    if args.fallback:
+        for n_intents in FALLBACK_INTENT_COUNTS:
+            result = bench_fallback(n_intents)
+            print(f"{n_intents:>5} intents | matcher {result['matcher_us']:7.2f} us | "
+                  f"linear scan {result['linear_us']:8.2f} us")
+        return
+
+    results = run_suite(args.rows, args.repeat)
+    for n_rows, result in results['datasets'].items():
+        speedup = result['csv_parse_s'] / result['cache_load_s']
+        print(f"{int(n_rows):>11,} rows | csv {result['csv_parse_s']:8.3f}s | cached {result['cache_load_s']:8.3f}s "
+              f"({speedup:5.1f}x) | stats {result['approval_stats']['median_s']:7.3f}s | "
+              f"preprocess {result['preprocess_data']['median_s']:7.3f}s | "
+              f"score {result['score_applications']['median_s']:7.3f}s", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            results['regressions'] = compare(results, json.load(f), args.threshold)
+        for regression in results['regressions']:
+            print(f"REGRESSION {regression['metric']}: {regression['baseline_s']:.6f}s -> "
+                  f"{regression['current_s']:.6f}s ({regression['ratio']:.2f}x)", file=sys.stderr)
+
+    payload = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+
+    if results.get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Union
+
+import httpx
+import ollama
+
+from modules import metrics
+from modules.fallback import FallbackResponder
+from modules.health import CircuitOpenError, OllamaHealthMonitor
+from modules.model_handler import GENERATION_OPTIONS, LoanApprovalModel, PromptContext, context_key
+from modules.response_cache import ResponseCache, make_cache_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_QUEUE_TIMEOUT = 30.0
+DEFAULT_REQUEST_TIMEOUT = 120.0
+
+
+class QueueTimeoutError(Exception):
+    """A request waited longer than queue_timeout for a generation slot"""
+
+
+class AsyncLoanApprovalModel(LoanApprovalModel):
+    """asyncio counterpart of LoanApprovalModel.
+
+    Generations go through one pooled ollama.AsyncClient (keep-alive httpx
+    connections). At most `max_concurrency` run at once and the rest queue
+    for up to `queue_timeout` seconds. Identical in-flight prompts share a
+    single generation. Prompts, caching and fallbacks are inherited from
+    LoanApprovalModel.
+
+    This is a library class for asyncio applications. The bundled server and
+    Streamlit app do not use it: they run the synchronous handlers and the
+    router on worker threads.
+    """
+
+    def __init__(self, model_name: str = "llama2", response_cache: Optional[ResponseCache] = None,
+                 host: Optional[str] = None, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 queue_timeout: float = DEFAULT_QUEUE_TIMEOUT, request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+                 health_monitor: Optional[OllamaHealthMonitor] = None, fallback: Optional[FallbackResponder] = None,
+                 keep_alive: Union[str, float, None] = None):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.request_timeout = request_timeout
+        self.async_client = ollama.AsyncClient(
+            host=host,
+            timeout=request_timeout,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.counters = {'requests': 0, 'generations': 0, 'coalesced': 0, 'cache_hits': 0,
+                         'queue_timeouts': 0, 'fallbacks': 0}
+        super().__init__(model_name, response_cache, host, health_monitor, fallback, keep_alive)
+
+    async def initialize_model_async(self) -> bool:
+        """Probe Ollama through the async client and update the shared circuit"""
+        try:
+            await self.async_client.list()
+            self.health.record_success()
+            logger.info("Async Ollama client initialized successfully")
+        except Exception as e:
+            logger.warning(f"Could not list Ollama models: {e}")
+            self.health.breaker.trip()
+        return self.health.reachable
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _generate(self, prompt: str, context: PromptContext) -> str:
+        semaphore = self._get_semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.counters['queue_timeouts'] += 1
+            raise QueueTimeoutError(f"No generation slot free within {self.queue_timeout}s")
+
+        try:
+            self.counters['generations'] += 1
+            try:
+                response = await self.async_client.chat(
+                    model=self.model_name,
+                    messages=self._build_messages(prompt, context),
+                    options=GENERATION_OPTIONS,
+                    keep_alive=self.keep_alive
+                )
+            except Exception:
+                self.health.record_failure()
+                raise
+            self.health.record_success()
+            self._record_timing(response)
+            return response['message']['content'].strip()
+        finally:
+            semaphore.release()
+
+    async def agenerate_response(self, prompt: str, context: PromptContext = "") -> str:
+        """Generate a response without blocking the event loop"""
+        self.counters['requests'] += 1
+        try:
+            if self.model_available:
+                return await self._acall_model(prompt, context)
+        except Exception as e:
+            logger.error(f"Error generating AI response: {e}")
+        self.counters['fallbacks'] += 1
+        metrics.inc('loan_model_fallbacks_total')
+        return self._get_fallback_response(prompt)
+
+    async def _acall_model(self, prompt: str, context: PromptContext) -> str:
+        """One cached, coalesced model call; failures are raised to every waiting caller"""
+        cache_key = make_cache_key(self.model_name, prompt, context_key(context), GENERATION_OPTIONS)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            self.counters['cache_hits'] += 1
+            metrics.inc('loan_model_cache_hits_total')
+            return cached
+
+        # Join an identical generation that is already running. Every caller, the first one
+        # included, awaits the shared task through shield, so a caller that is cancelled (e.g. its
+        # client disconnected) stops waiting without cancelling the generation for the others.
+        task = self._in_flight.get(cache_key)
+        if task is not None:
+            self.counters['coalesced'] += 1
+        else:
+            if not self.health.try_acquire():
+                raise CircuitOpenError("Ollama circuit open - half-open trial already in flight")
+            task = asyncio.ensure_future(self._generate_and_cache(prompt, context, cache_key))
+            self._in_flight[cache_key] = task
+            task.add_done_callback(lambda done: self._finish_in_flight(cache_key, done))
+        return await asyncio.shield(task)
+
+    async def _generate_and_cache(self, prompt: str, context: PromptContext, cache_key: str) -> str:
+        with metrics.timer('loan_model_generate_seconds'):
+            answer = await self._generate(prompt, context)
+        self.response_cache.put(cache_key, answer)
+        return answer
+
+    def _finish_in_flight(self, cache_key: str, task: asyncio.Task):
+        del self._in_flight[cache_key]
+        if not task.cancelled():
+            # Marks a failure retrieved even when every caller stopped waiting
+            task.exception()
+
+    async def aanalyze_loan_application(self, application_data: Dict, context: str = "") -> str:
+        """Async analyze_loan_application"""
+        self.counters['requests'] += 1
+        try:
+            if self.model_available:
+                return await self._acall_model(self._build_analysis_prompt(application_data), context)
+        except Exception as e:
+            logger.error(f"Error in loan analysis: {e}")
+        self.counters['fallbacks'] += 1
+        metrics.inc('loan_model_fallbacks_total')
+        return self._get_fallback_analysis(application_data, context)
+
+    async def aclose(self):
+        """Close the pooled HTTP connections"""
+        await self.async_client.close()
@@ -0,0 +1,311 @@
+"""Resumable batch analysis of queued loan applications.
+
+Applications are read from a CSV or JSONL file and analyzed through a
+bounded thread pool. Each result is appended to a JSONL checkpoint as soon
+as it completes. A rerun with the same checkpoint skips the applications
+already recorded there, so an interrupted overnight run resumes where it
+stopped. Items fall back to the rule-based analysis while the model is
+unavailable; those are recorded with status `fallback` and sent to the
+model again on resume unless `retry_fallbacks` is off.
+
+    python -m modules.batch_analysis queued.csv analyses.jsonl --workers 4
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, Optional, Set, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+# Applications queued per worker; keeps memory flat however large the input is
+QUEUE_PER_WORKER = 2
+PROGRESS_INTERVAL = 10.0
+CSV_CHUNK_ROWS = 10_000
+
+OK = 'ok'
+# Answered by the rule-based analysis; retried on resume by default
+FALLBACK = 'fallback'
+ERROR = 'error'
+
+# Input fields may use the form keys or the loan_data.csv column names
+FIELD_ALIASES = {
+    'income': ('income', 'Income'),
+    'credit_score': ('credit_score', 'Credit_Score'),
+    'loan_amount': ('loan_amount', 'Loan_Amount'),
+    'dti_ratio': ('dti_ratio', 'DTI_Ratio'),
+    'employment_status': ('employment_status', 'Employment_Status'),
+    'purpose': ('purpose', 'Text'),
+}
+ID_FIELDS = ('id', 'application_id', 'Application_ID')
+
+
+def normalize_application(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Form-style application dict (income, credit_score, ...) from a CSV row or JSON object"""
+    application = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            value = record.get(alias)
+            if value is not None and not (isinstance(value, float) and value != value):
+                application[field] = value
+                break
+    return application
+
+
+def _record_id(record: Dict[str, Any], position: int) -> str:
+    for field in ID_FIELDS:
+        if record.get(field) is not None:
+            return str(record[field])
+    return str(position)
+
+
+def read_applications(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(id, application) pairs from a .jsonl or .csv file; ids default to the 1-based row number"""
+    if path.endswith(('.jsonl', '.ndjson')):
+        with open(path, 'r', encoding='utf-8') as f:
+            position = 0
+            for line in f:
+                if line.strip():
+                    position += 1
+                    record = json.loads(line)
+                    yield _record_id(record, position), normalize_application(record)
+        return
+
+    position = 0
+    with pd.read_csv(path, chunksize=CSV_CHUNK_ROWS) as reader:
+        for chunk in reader:
+            for record in chunk.to_dict('records'):
+                position += 1
+                yield _record_id(record, position), normalize_application(record)
+
+
+def count_applications(path: str) -> int:
+    """Number of applications in the input, for progress and ETA"""
+    with open(path, 'rb') as f:
+        lines = sum(1 for line in f if line.strip())
+    return lines if path.endswith(('.jsonl', '.ndjson')) else max(lines - 1, 0)
+
+
+def load_checkpoint(path: str, retry_fallbacks: bool = True) -> Set[str]:
+    """Ids already analyzed in a checkpoint; a partial last line from a crash is cut off.
+
+    With `retry_fallbacks`, ids only answered by the rule-based fallback
+    are left out so a resumed run asks the model again.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            logger.warning(f"Discarding {len(data) - end} bytes of an incomplete record at the end of {path}")
+            f.truncate(end)
+    for line in data[:end].splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            logger.warning(f"Skipping unreadable checkpoint line in {path}")
+            continue
+        status = record.get('status')
+        # Older checkpoints recorded fallback answers as ok with a fallback source
+        if status == OK and record.get('source') == 'fallback':
+            status = FALLBACK
+        if status == OK or (status == FALLBACK and not retry_fallbacks):
+            done.add(str(record['id']))
+    return done
+
+
+class BatchProgress:
+    """Counts, throughput and ETA of a batch run"""
+
+    def __init__(self, total: Optional[int] = None, skipped: int = 0):
+        self.total = total
+        self.skipped = skipped
+        self.completed = 0
+        self.fallbacks = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def throughput(self) -> float:
+        """Applications analyzed per second in this run"""
+        return self.completed / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def remaining(self) -> Optional[int]:
+        """Applications this run has yet to finish, successfully or not"""
+        if self.total is None:
+            return None
+        return max(self.total - self.skipped - self.completed - self.errors, 0)
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Seconds left at the current throughput"""
+        if self.remaining is None or not self.throughput:
+            return None
+        return self.remaining / self.throughput
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'total': self.total,
+            'skipped': self.skipped,
+            'completed': self.completed,
+            'fallbacks': self.fallbacks,
+            'errors': self.errors,
+            'elapsed_s': self.elapsed,
+            'throughput': self.throughput,
+            'eta_s': self.eta,
+        }
+
+    def __str__(self) -> str:
+        done = self.skipped + self.completed
+        total = f"/{self.total:,}" if self.total is not None else ""
+        eta = f", ETA {self.eta:.0f}s" if self.eta is not None else ""
+        return (f"{done:,}{total} analyzed ({self.skipped:,} from checkpoint, {self.fallbacks:,} fallback, "
+                f"{self.errors:,} errors), {self.throughput:.2f}/s{eta}")
+
+
+class BatchAnalyzer:
+    """Analyze applications through a bounded worker pool into an append-only JSONL checkpoint"""
+
+    def __init__(self, model_handler, workers: int = DEFAULT_WORKERS,
+                 context_builder: Optional[Callable[[Dict[str, Any]], str]] = None,
+                 progress_interval: float = PROGRESS_INTERVAL,
+                 on_progress: Optional[Callable[[BatchProgress], None]] = None, fsync: bool = False,
+                 retry_fallbacks: bool = True):
+        self.model_handler = model_handler
+        self.workers = max(1, workers)
+        # Optional extra prompt context per application, e.g. similar historical cases
+        self.context_builder = context_builder
+        self.progress_interval = progress_interval
+        self.on_progress = on_progress or (lambda progress: logger.info(f"Batch analysis: {progress}"))
+        self.fsync = fsync
+        self.retry_fallbacks = retry_fallbacks
+
+    def analyze(self, application_id: str, application: Dict[str, Any]) -> Dict[str, Any]:
+        """One checkpoint record; errors are recorded rather than raised"""
+        start = time.perf_counter()
+        record = {'id': application_id, 'application': application}
+        try:
+            context = self.context_builder(application) if self.context_builder else ""
+            analysis, source = self.model_handler.analyze_with_source(application, context)
+            record.update({'status': OK if source == 'model' else FALLBACK, 'source': source, 'analysis': analysis})
+        except Exception as e:
+            logger.error(f"Error analyzing application {application_id}: {e}")
+            record.update({'status': ERROR, 'error': str(e)})
+        record['seconds'] = round(time.perf_counter() - start, 4)
+        record['completed_at'] = datetime.now(timezone.utc).isoformat()
+        return record
+
+    def run(self, input_path: str, checkpoint_path: str, limit: Optional[int] = None) -> BatchProgress:
+        """Analyze every application not yet in the checkpoint (at most `limit` of them)"""
+        done = load_checkpoint(checkpoint_path, self.retry_fallbacks)
+        total = count_applications(input_path)
+        if limit is not None:
+            total = min(total, len(done) + limit)
+        progress = BatchProgress(total=total, skipped=len(done))
+        last_report = time.perf_counter()
+
+        with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint, \
+                ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='batch-analysis') as executor:
+
+            def write(record: Dict[str, Any]):
+                checkpoint.write(json.dumps(record, default=str) + "\n")
+                checkpoint.flush()
+                if self.fsync:
+                    os.fsync(checkpoint.fileno())
+                if record['status'] in (OK, FALLBACK):
+                    progress.completed += 1
+                    progress.fallbacks += record['status'] == FALLBACK
+                else:
+                    progress.errors += 1
+
+            def drain(pending, block_until: int):
+                nonlocal last_report
+                while len(pending) > block_until:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        pending.remove(future)
+                        write(future.result())
+                    if time.perf_counter() - last_report >= self.progress_interval:
+                        last_report = time.perf_counter()
+                        self.on_progress(progress)
+
+            pending = set()
+            submitted = 0
+            try:
+                for application_id, application in read_applications(input_path):
+                    if application_id in done:
+                        continue
+                    if limit is not None and submitted >= limit:
+                        break
+                    pending.add(executor.submit(self.analyze, application_id, application))
+                    submitted += 1
+                    drain(pending, self.workers * QUEUE_PER_WORKER)
+                drain(pending, 0)
+            except KeyboardInterrupt:
+                # Finished items are already in the checkpoint; queued ones are redone on resume
+                for future in pending:
+                    future.cancel()
+                logger.warning(f"Batch analysis interrupted: {progress}")
+                raise
+
+        self.on_progress(progress)
+        return progress
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze queued loan applications with the model, resumably")
+    parser.add_argument('input', help="CSV or JSONL of applications (form keys or loan_data.csv columns)")
+    parser.add_argument('checkpoint', help="JSONL file results are appended to; rerun with it to resume")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="concurrent model requests")
+    parser.add_argument('--model', default='llama2')
+    parser.add_argument('--host', help="Ollama server (default: OLLAMA_HOST or the local server)")
+    parser.add_argument('--data', default='loan_data.csv', help="historical data for similar-case context")
+    parser.add_argument('--no-context', action='store_true', help="skip the similar-applications context")
+    parser.add_argument('--limit', type=int, help="analyze at most this many applications in this run")
+    parser.add_argument('--progress-interval', type=float, default=PROGRESS_INTERVAL)
+    parser.add_argument('--fsync', action='store_true', help="fsync the checkpoint after every record")
+    parser.add_argument('--keep-fallbacks', action='store_true',
+                        help="treat rule-based fallback analyses in the checkpoint as done instead of retrying them")
+    args = parser.parse_args(argv)
+
+    from modules.data_loader import LoanDataLoader
+    from modules.fallback import FallbackResponder
+    from modules.model_handler import LoanApprovalModel
+    from modules.neighbors import format_similar_context, load_or_build_neighbor_index
+
+    context_builder = None
+    fallback = None
+    if not args.no_context and os.path.exists(args.data):
+        loader = LoanDataLoader(args.data)
+        fallback = FallbackResponder.from_data(loader.load_data(), loader.get_approval_stats())
+        neighbor_index = load_or_build_neighbor_index(loader)
+        if neighbor_index is not None:
+            context_builder = lambda application: format_similar_context(neighbor_index.query(application))
+
+    model = LoanApprovalModel(args.model, host=args.host, fallback=fallback)
+    # Give the first health probe a moment so a reachable server is used from the first item
+    model.health.probe()
+    analyzer = BatchAnalyzer(model, workers=args.workers, context_builder=context_builder,
+                             progress_interval=args.progress_interval,
+                             on_progress=lambda progress: print(progress, file=sys.stderr, flush=True),
+                             fsync=args.fsync, retry_fallbacks=not args.keep_fallbacks)
+    progress = analyzer.run(args.input, args.checkpoint, limit=args.limit)
+    return 1 if progress.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
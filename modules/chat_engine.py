@@ -1,10 +1,45 @@
 import logging
-from typing import List, Dict, Any
-from modules.model_handler import LoanApprovalModel
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, Optional
+from modules import metrics
 from modules.data_loader import LoanDataLoader
+from modules.fallback import FallbackResponder
+from modules.scoring import score_application, get_recommendation
+from modules.classifier import load_or_train_classifier
+from modules.context_window import ChatPrompt, ConversationWindow, estimate_tokens
+from modules.neighbors import format_similar_context, load_or_build_neighbor_index
+from modules.retrieval import format_retrieval_context, load_or_build_retrieval_index
+from modules.router import build_model_handler
+from modules.segment_cube import format_segment_context, load_or_build_segment_cube
 
 logger = logging.getLogger(__name__)
 
+# Messages kept for display; what reaches the prompt is governed by ConversationWindow
+MAX_HISTORY_MESSAGES = 10
+
+def build_data_context(stats: Dict, segment_cube=None) -> str:
+    """Format dataset statistics (and segment approval rates, given the cube) as the prompt context block"""
+    context = f"""
+            LOAN APPROVAL DATASET INSIGHTS:
+            - Total Applications: {stats['total_applications']}
+            - Approved: {stats['approved']} ({stats['approval_rate']:.1f}%)
+            - Rejected: {stats['rejected']}
+            - Average Income (Approved): ${stats['avg_income_approved']:,.2f}
+            - Average Income (Rejected): ${stats['avg_income_rejected']:,.2f}
+            - Average Credit Score (Approved): {stats['avg_credit_score_approved']:.1f}
+            - Average Credit Score (Rejected): {stats['avg_credit_score_rejected']:.1f}
+            
+            KEY PATTERNS:
+            1. Higher income and credit scores correlate with approval
+            2. Lower DTI ratios improve approval chances
+            3. Employment status significantly impacts decisions
+            4. Business and education loans have varying approval rates
+            """
+    if segment_cube is not None:
+        context += format_segment_context(segment_cube) + "\n"
+    return context
+
 class ChatMessage:
     """Simple message class to replace LangChain messages"""
     def __init__(self, content: str, role: str):
@@ -12,47 +47,89 @@ class ChatMessage:
         self.role = role
 
 class LoanApprovalChatEngine:
-    def __init__(self, data_file_path: str, model_name: str = "llama2"):
+    def __init__(self, data_file_path: str, model_name: str = "llama2", shared=None):
+        self.conversation_history: Deque[ChatMessage] = deque(maxlen=MAX_HISTORY_MESSAGES)
+        self.context_window = ConversationWindow()
+        self.last_prompt_report: Dict[str, Any] = {}
+        self.shared = shared
+        self._data_context: Optional[str] = None
+        self._segment_cube = None
+        
+        # Reuse the process-wide dataset, model handler and context when given
+        if shared is not None:
+            self.data_loader = shared.data_loader
+            self.model_handler = shared.model_handler
+            self.classifier = shared.classifier
+            self.neighbor_index = shared.neighbor_index
+            self.text_index = shared.text_index
+            return
+        
         self.data_loader = LoanDataLoader(data_file_path)
-        self.conversation_history: List[ChatMessage] = []
         self.data_context = ""
+        self.segment_cube = None
         
         # Initialize model with error handling
         try:
-            self.model_handler = LoanApprovalModel(model_name)
+            self.model_handler = build_model_handler(model_name)
         except Exception as e:
             logger.error(f"Error initializing model handler: {e}")
             # Model handler will use fallbacks automatically
         
         self.initialize_data_context()
+        self.classifier = load_or_train_classifier(self.data_loader)
+        self.neighbor_index = load_or_build_neighbor_index(self.data_loader)
+        self.text_index = load_or_build_retrieval_index(self.data_loader)
         
+    @property
+    def data_context(self) -> str:
+        """This engine's data context, or the shared one as last published by SharedResources.ingest"""
+        if self._data_context is None and self.shared is not None:
+            return self.shared.data_context
+        return self._data_context or ""
+    
+    @data_context.setter
+    def data_context(self, value: str):
+        self._data_context = value
+    
+    @property
+    def segment_cube(self):
+        """This engine's segment cube, or the shared one as last published by SharedResources.ingest"""
+        if self._segment_cube is None and self.shared is not None:
+            return self.shared.segment_cube
+        return self._segment_cube
+    
+    @segment_cube.setter
+    def segment_cube(self, cube):
+        self._segment_cube = cube
+    
     def initialize_data_context(self):
         """Initialize the data context for the chatbot"""
         try:
-            self.data_loader.load_data()
+            df = self.data_loader.load_data()
             stats = self.data_loader.get_approval_stats()
+            self.segment_cube = load_or_build_segment_cube(self.data_loader)
             
-            self.data_context = f"""
-            LOAN APPROVAL DATASET INSIGHTS:
-            - Total Applications: {stats['total_applications']}
-            - Approved: {stats['approved']} ({stats['approval_rate']:.1f}%)
-            - Rejected: {stats['rejected']}
-            - Average Income (Approved): ${stats['avg_income_approved']:,.2f}
-            - Average Income (Rejected): ${stats['avg_income_rejected']:,.2f}
-            - Average Credit Score (Approved): {stats['avg_credit_score_approved']:.1f}
-            - Average Credit Score (Rejected): {stats['avg_credit_score_rejected']:.1f}
-            
-            KEY PATTERNS:
-            1. Higher income and credit scores correlate with approval
-            2. Lower DTI ratios improve approval chances
-            3. Employment status significantly impacts decisions
-            4. Business and education loans have varying approval rates
-            """
+            self.data_context = build_data_context(stats, self.segment_cube)
+            if hasattr(self, 'model_handler'):
+                self.model_handler.fallback = FallbackResponder.from_data(df, stats, self.segment_cube)
             
         except Exception as e:
             logger.error(f"Error initializing data context: {e}")
             self.data_context = "Data context unavailable due to loading error."
     
+    @metrics.timed('loan_chat_build_context_seconds')
+    def build_context(self, user_message: str) -> ChatPrompt:
+        """Data context, relevant historical applications and the conversation so far, within the token budget"""
+        retrieved = format_retrieval_context(self.text_index.search(user_message)) if self.text_index is not None else ""
+        context, report = self.context_window.build_prompt(self.data_context, retrieved)
+        messages = self.model_handler._build_messages(user_message, context)
+        report['prompt_tokens'] = estimate_tokens("\n".join(message['content'] for message in messages))
+        self.last_prompt_report = report
+        logger.info(f"Prompt size: {report['prompt_tokens']} tokens ({report['turns_included']} recent turns, "
+                    f"{report['turns_summarized']} summarized)")
+        return context
+    
+    @metrics.timed('loan_chat_process_message_seconds')
     def process_message(self, user_message: str) -> str:
         """Process user message and generate response"""
         try:
@@ -62,15 +139,12 @@ class LoanApprovalChatEngine:
             # Generate response
             bot_response = self.model_handler.generate_response(
                 prompt=user_message,
-                context=self.data_context
+                context=self.build_context(user_message)
             )
             
             # Add bot response to history
             self.conversation_history.append(ChatMessage(content=bot_response, role="assistant"))
-            
-            # Limit conversation history to prevent memory issues
-            if len(self.conversation_history) > 10:
-                self.conversation_history = self.conversation_history[-10:]
+            self.context_window.add_turn(user_message, bot_response)
                 
             return bot_response
             
@@ -78,69 +152,66 @@ class LoanApprovalChatEngine:
             logger.error(f"Error processing message: {e}")
             return "I apologize, but I encountered an error processing your message. Please try again."
     
+    def process_message_stream(self, user_message: str) -> Iterator[str]:
+        """Like process_message, but yields the response as it is generated.
+
+        The full response is recorded in the conversation history once the
+        stream finishes (or whatever was produced, if the consumer stops early).
+        """
+        self.conversation_history.append(ChatMessage(content=user_message, role="user"))
+        parts = []
+        start = time.perf_counter()
+        try:
+            for chunk in self.model_handler.generate_response_stream(
+                prompt=user_message,
+                context=self.build_context(user_message)
+            ):
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            logger.error(f"Error streaming message: {e}")
+            if not parts:
+                error_message = "I apologize, but I encountered an error processing your message. Please try again."
+                parts.append(error_message)
+                yield error_message
+        finally:
+            response = ''.join(parts).strip()
+            self.conversation_history.append(ChatMessage(content=response, role="assistant"))
+            self.context_window.add_turn(user_message, response)
+            metrics.observe('loan_chat_process_message_seconds', time.perf_counter() - start)
+    
     def get_approval_analysis(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """Get detailed approval analysis for user data"""
         try:
-            analysis = self.model_handler.analyze_loan_application(user_data)
-            
-            # Basic scoring based on common criteria
-            score = 0
-            factors = []
-            
-            # Income scoring
-            income = user_data.get('income', 0)
-            if income > 75000:
-                score += 25
-                factors.append("Good income level")
-            elif income > 50000:
-                score += 15
-                factors.append("Moderate income level")
-            else:
-                factors.append("Low income level - consider increasing income")
+            # Most similar historical applications, shown to the user and the model
+            similar = self.neighbor_index.query(user_data) if self.neighbor_index is not None else None
+            similar_context = format_similar_context(similar) if similar else ""
             
-            # Credit score scoring
-            credit_score = user_data.get('credit_score', 0)
-            if credit_score > 750:
-                score += 30
-                factors.append("Excellent credit score")
-            elif credit_score > 700:
-                score += 20
-                factors.append("Good credit score")
-            elif credit_score > 650:
-                score += 10
-                factors.append("Fair credit score - consider improvement")
-            else:
-                factors.append("Poor credit score - significant improvement needed")
+            analysis = self.model_handler.analyze_loan_application(user_data, similar_context)
             
-            # DTI ratio scoring
-            dti_ratio = user_data.get('dti_ratio', 0)
-            if dti_ratio < 20:
-                score += 25
-                factors.append("Excellent DTI ratio")
-            elif dti_ratio < 35:
-                score += 15
-                factors.append("Good DTI ratio")
-            elif dti_ratio < 50:
-                score += 5
-                factors.append("High DTI ratio - consider reduction")
-            else:
-                factors.append("Very high DTI ratio - significant reduction needed")
+            # Basic scoring based on common criteria (rule tables in modules/scoring.py)
+            score, factors = score_application(user_data)
             
-            # Employment status
-            employment_status = user_data.get('employment_status', '')
-            if employment_status.lower() == 'employed':
-                score += 20
-                factors.append("Employed - positive factor")
-            else:
-                factors.append("Unemployed - consider securing employment")
-            
-            return {
+            result = {
                 'analysis': analysis,
                 'score': min(score, 100),
                 'factors': factors,
                 'recommendation': self._get_recommendation(score)
             }
             
+            # Probability from the trained classifier, when one is available
+            if self.classifier is not None:
+                result['approval_probability'] = self.classifier.predict_proba_one(user_data)
+            
+            if similar:
+                result['similar_applications'] = similar
+            
+            # Approval rate of the applicant's segment, from the precomputed cube
+            if self.segment_cube is not None:
+                result['segment'] = self.segment_cube.segment_for_application(user_data)
+            
+            return result
+            
         except Exception as e:
             logger.error(f"Error in approval analysis: {e}")
             return {
@@ -152,15 +223,9 @@ class LoanApprovalChatEngine:
     
     def _get_recommendation(self, score: int) -> str:
         """Get recommendation based on score"""
-        if score >= 80:
-            return "Strong candidate for loan approval"
-        elif score >= 60:
-            return "Good candidate, minor improvements possible"
-        elif score >= 40:
-            return "Moderate candidate, significant improvements needed"
-        else:
-            return "Weak candidate, major improvements required"
+        return get_recommendation(score)
     
     def clear_history(self):
         """Clear conversation history"""
-        self.conversation_history = []
\ No newline at end of file
+        self.conversation_history.clear()
+        self.context_window.clear()
\ No newline at end of file
@@ -0,0 +1,177 @@
+import logging
+import re
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, NamedTuple, Tuple
+
+from modules.retrieval import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Token budgets are estimates (about 4 characters per token for English text)
+DEFAULT_PROMPT_BUDGET = 1536
+DEFAULT_HISTORY_BUDGET = 640
+DEFAULT_SUMMARY_BUDGET = 192
+DEFAULT_RETRIEVAL_SHARE = 0.25
+SUMMARY_SENTENCE_TOKENS = 32
+SUMMARY_TOPICS = 8
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+# Question words carry no topic; retrieval's STOP_WORDS covers the rest
+QUESTION_WORDS = frozenset("does how question should tell which why will would".split())
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate; no tokenizer is needed to keep budgets in check"""
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return text[:max(0, max_tokens * 4 - 3)].rstrip() + "..."
+
+
+def first_sentence(text: str, max_tokens: int = SUMMARY_SENTENCE_TOKENS) -> str:
+    """Leading sentence of a message, trimmed to `max_tokens`"""
+    for sentence in _SENTENCE_END.split(text.strip()):
+        sentence = sentence.strip(" •*-")
+        if sentence:
+            return truncate_to_tokens(sentence, max_tokens)
+    return ""
+
+
+class ChatPrompt(NamedTuple):
+    """Prompt context split for prefix reuse: parts that stay the same come first, what changes each turn last"""
+    # Identical across turns and sessions until the data changes; goes in the system message
+    data_context: str = ""
+    summary: str = ""
+    # Recent (user message, answer) exchanges, oldest first
+    turns: Tuple[Tuple[str, str], ...] = ()
+    # Facts retrieved for the current message only
+    retrieved: str = ""
+
+    def history(self) -> str:
+        if not self.turns:
+            return ""
+        return "RECENT CONVERSATION:\n" + "\n".join(format_turn(user, answer) for user, answer in self.turns)
+
+    def text(self) -> str:
+        """All parts as one context block"""
+        return "\n".join(part for part in (self.data_context, self.retrieved, self.summary, self.history()) if part)
+
+
+def format_turn(user_message: str, response: str) -> str:
+    return f"User: {user_message}\nAssistant: {response}"
+
+
+class ConversationWindow:
+    """Conversation memory for prompts, kept within fixed token budgets.
+
+    Recent turns (user message + answer) live in a deque limited to
+    `history_budget` tokens. A turn pushed out of it is condensed once into a
+    one-line extractive summary; summary lines beyond `summary_budget` are in
+    turn folded into a list of earlier topics. `build` assembles data context,
+    retrieved facts, summary and recent turns so the result never exceeds
+    `prompt_budget`, however long the session runs.
+    """
+
+    def __init__(self, prompt_budget: int = DEFAULT_PROMPT_BUDGET, history_budget: int = DEFAULT_HISTORY_BUDGET,
+                 summary_budget: int = DEFAULT_SUMMARY_BUDGET, retrieval_share: float = DEFAULT_RETRIEVAL_SHARE):
+        self.prompt_budget = prompt_budget
+        self.history_budget = history_budget
+        self.summary_budget = summary_budget
+        self.retrieval_share = retrieval_share
+        self.turns: Deque[Tuple[str, str, int]] = deque()
+        self.history_tokens = 0
+        self.summary_lines: Deque[Tuple[str, int, List[str]]] = deque()
+        self.summary_tokens = 0
+        self.topics: Counter = Counter()
+        self.turns_summarized = 0
+
+    def add_turn(self, user_message: str, response: str):
+        """Record a finished exchange, summarizing whatever no longer fits"""
+        text = format_turn(user_message, response)
+        tokens = estimate_tokens(text)
+        self.turns.append((user_message, response, tokens))
+        self.history_tokens += tokens
+        # Always keep the latest turn, even if it alone is over budget (it is truncated in build)
+        while self.history_tokens > self.history_budget and len(self.turns) > 1:
+            old_user, old_response, old_tokens = self.turns.popleft()
+            self.history_tokens -= old_tokens
+            self._summarize(old_user, old_response)
+
+    def _summarize(self, user_message: str, response: str):
+        line = f"- User asked: {first_sentence(user_message)} | Answer: {first_sentence(response)}"
+        tokens = estimate_tokens(line)
+        topics = [token for token in tokenize(user_message) if token not in QUESTION_WORDS and not token.isdigit()]
+        self.summary_lines.append((line, tokens, topics))
+        self.summary_tokens += tokens
+        self.turns_summarized += 1
+        while self.summary_tokens > self.summary_budget and len(self.summary_lines) > 1:
+            _, old_tokens, topics = self.summary_lines.popleft()
+            self.summary_tokens -= old_tokens
+            self.topics.update(topics)
+
+    def summary(self) -> str:
+        lines = []
+        if self.topics:
+            lines.append("Earlier topics: " + ", ".join(topic for topic, _ in self.topics.most_common(SUMMARY_TOPICS)))
+        lines.extend(line for line, _, _ in self.summary_lines)
+        return "\n".join(lines)
+
+    def build_prompt(self, data_context: str, retrieved: str = "") -> Tuple[ChatPrompt, Dict[str, Any]]:
+        """Prompt parts within `prompt_budget`, plus a report of where the tokens went"""
+        # One token of slack per joined part keeps the estimate of the whole under budget
+        remaining = self.prompt_budget - 4
+        data_context = truncate_to_tokens(data_context, remaining)
+        remaining -= estimate_tokens(data_context)
+
+        retrieved = truncate_to_tokens(retrieved, min(remaining, int(self.prompt_budget * self.retrieval_share)))
+        remaining -= estimate_tokens(retrieved) if retrieved else 0
+
+        summary = self.summary()
+        if summary:
+            summary = truncate_to_tokens(f"CONVERSATION SUMMARY:\n{summary}", min(remaining, self.summary_budget + 16))
+            remaining -= estimate_tokens(summary)
+
+        # Newest turns first, as many as fit
+        recent: List[Tuple[str, str]] = []
+        header_tokens = estimate_tokens("RECENT CONVERSATION:\n")
+        remaining -= header_tokens
+        for user_message, response, tokens in reversed(self.turns):
+            if tokens + 1 > remaining:
+                if not recent and remaining > 1:
+                    # Trim the latest turn itself: a quarter for the question, the rest for the answer
+                    available = remaining - 1 - estimate_tokens(format_turn("", ""))
+                    user_message = truncate_to_tokens(user_message, max(1, available // 4))
+                    response = truncate_to_tokens(response, max(0, available - estimate_tokens(user_message) - 1))
+                    recent.append((user_message, response))
+                break
+            recent.append((user_message, response))
+            remaining -= tokens + 1
+
+        prompt = ChatPrompt(data_context, summary, tuple(reversed(recent)), retrieved)
+        report = {
+            'context_tokens': estimate_tokens(prompt.text()),
+            'budget': self.prompt_budget,
+            'data_tokens': estimate_tokens(data_context),
+            'retrieved_tokens': estimate_tokens(retrieved),
+            'summary_tokens': estimate_tokens(summary),
+            'history_tokens': estimate_tokens(prompt.history()),
+            'turns_included': len(recent),
+            'turns_summarized': self.turns_summarized,
+        }
+        return prompt, report
+
+    def build(self, data_context: str, retrieved: str = "") -> Tuple[str, Dict[str, Any]]:
+        """build_prompt flattened into one context string"""
+        prompt, report = self.build_prompt(data_context, retrieved)
+        return prompt.text(), report
+
+    def clear(self):
+        self.turns.clear()
+        self.history_tokens = 0
+        self.summary_lines.clear()
+        self.summary_tokens = 0
+        self.topics.clear()
+        self.turns_summarized = 0
@@ -0,0 +1,245 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow.feather as feather
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# 2: frames are saved in the compact schema (dictionary-encoded labels, narrow numbers)
+CACHE_FORMAT_VERSION = 2
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_fingerprint(file_path: str, include_hash: bool = True) -> Dict:
+    """Return size, mtime and (optionally) a content hash for a file"""
+    stat = os.stat(file_path)
+    fingerprint = {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    }
+    if include_hash:
+        fingerprint['content_hash'] = content_hash(file_path)
+    return fingerprint
+
+
+def content_hash(file_path: str) -> str:
+    """Hash the file contents in fixed-size blocks"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sidecar_path(source_path: str, suffix: str, directory: Optional[str] = None) -> str:
+    """Path of a hidden derived file stored next to the source, e.g. .loan_data.csv.feather"""
+    directory = directory or os.path.dirname(os.path.abspath(source_path))
+    return os.path.join(directory, f".{os.path.basename(source_path)}.{suffix}")
+
+
+def fingerprint_matches(file_path: str, recorded: Optional[Dict]) -> Optional[Dict]:
+    """Compare a file with a recorded fingerprint.
+
+    Returns the current fingerprint when the contents are unchanged (size and
+    mtime match, or only the mtime moved and the content hash still matches),
+    otherwise None.
+    """
+    if not recorded:
+        return None
+    try:
+        current = file_fingerprint(file_path, include_hash=False)
+    except OSError:
+        return None
+
+    if current['size'] != recorded.get('size'):
+        return None
+    if current['mtime_ns'] == recorded.get('mtime_ns'):
+        current['content_hash'] = recorded.get('content_hash')
+        return current
+
+    current['content_hash'] = content_hash(file_path)
+    if current['content_hash'] != recorded.get('content_hash'):
+        return None
+    return current
+
+
+def atomic_write(path: str, write: Callable[[str], None]):
+    """Call write(tmp_path), then move the file into place so readers never see it half-written.
+
+    The temporary name keeps the extension, since np.savez appends .npz to
+    paths without one.
+    """
+    tmp_path = f"{path}.tmp{os.path.splitext(path)[1]}"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SidecarArtifact:
+    """An index, cube or model derived from a data file and saved next to it.
+
+    Handles the sidecar path, the data-fingerprint check on load and the
+    rebuild when the saved copy is missing, unreadable or stale. The
+    artifact's own module provides `read(path)` and `build(data_loader,
+    metadata)`. The artifact must keep that metadata (it carries the
+    'data_fingerprint') and implement `save(path)`, normally through
+    atomic_write. `can_build` reports whether optional dependencies for
+    building are installed.
+    """
+
+    def __init__(self, name: str, suffix: str, read: Callable[[str], Any], build: Callable[[Any, Dict], Any],
+                 can_build: Callable[[], bool] = lambda: True):
+        self.name = name
+        self.suffix = suffix
+        self.read = read
+        self._build = build
+        self.can_build = can_build
+
+    def path(self, data_file_path: str) -> str:
+        return sidecar_path(data_file_path, self.suffix)
+
+    def load(self, data_file_path: str) -> Optional[Any]:
+        """The saved artifact if it was built from the file's current contents, else None"""
+        path = self.path(data_file_path)
+        if not os.path.exists(path):
+            return None
+        try:
+            artifact = self.read(path)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable {self.name} {path}: {e}")
+            return None
+        if fingerprint_matches(data_file_path, artifact.metadata.get('data_fingerprint')) is None:
+            logger.info(f"Persisted {self.name} is stale for the current data")
+            return None
+        return artifact
+
+    def build(self, data_loader, save: bool = True) -> Any:
+        """Build from the loader's data and save it with the data fingerprint"""
+        fingerprint = file_fingerprint(data_loader.file_path)
+        if data_loader.df is None:
+            data_loader.load_data()
+        artifact = self._build(data_loader, {'data_fingerprint': fingerprint})
+        if save:
+            artifact.save(self.path(data_loader.file_path))
+        return artifact
+
+    def load_or_build(self, data_loader) -> Optional[Any]:
+        """Saved artifact, rebuilt when missing or stale; None if unavailable"""
+        try:
+            artifact = self.load(data_loader.file_path)
+            if artifact is None and self.can_build():
+                artifact = self.build(data_loader)
+            return artifact
+        except Exception as e:
+            logger.warning(f"{self.name[0].upper()}{self.name[1:]} unavailable: {e}")
+            return None
+
+
+class ColumnarCache:
+    """Binary Arrow/Feather copy of a CSV, kept next to the source file.
+
+    The cache is valid while the CSV's size and mtime match the recorded
+    fingerprint. If only the mtime moved (e.g. the file was touched or
+    re-copied), the content hash decides and the fingerprint is refreshed.
+    """
+
+    def __init__(self, source_path: str, cache_dir: Optional[str] = None):
+        self.source_path = source_path
+        self.cache_path = sidecar_path(source_path, 'feather', cache_dir)
+        self.meta_path = sidecar_path(source_path, 'cache.json', cache_dir)
+
+    @property
+    def available(self) -> bool:
+        return PYARROW_AVAILABLE
+
+    def _read_meta(self) -> Optional[Dict]:
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, meta: Dict):
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def is_valid(self) -> bool:
+        """Check the recorded fingerprint against the current source file"""
+        if not self.available or not os.path.exists(self.cache_path):
+            return False
+
+        meta = self._read_meta()
+        if not meta or meta.get('format_version') != CACHE_FORMAT_VERSION:
+            return False
+
+        recorded = meta.get('fingerprint', {})
+        current = fingerprint_matches(self.source_path, recorded)
+        if current is None:
+            return False
+        if current['mtime_ns'] == recorded.get('mtime_ns'):
+            return True
+
+        # Contents unchanged but the mtime moved: record the new fingerprint
+        meta['fingerprint'] = current
+        try:
+            self._write_meta(meta)
+        except OSError as e:
+            logger.warning(f"Could not refresh cache fingerprint: {e}")
+        return True
+
+    def fingerprint(self) -> Optional[Dict]:
+        """Fingerprint of the source file the cache was built from"""
+        meta = self._read_meta()
+        return meta.get('fingerprint') if meta else None
+
+    def load(self) -> Optional[pd.DataFrame]:
+        """Load the cached frame, or None when missing or stale"""
+        try:
+            if not self.is_valid():
+                return None
+            table = feather.read_table(self.cache_path, memory_map=True)
+            return table.to_pandas()
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable data cache {self.cache_path}: {e}")
+            return None
+
+    def save(self, df: pd.DataFrame):
+        """Write the frame and its source fingerprint; failures are non-fatal"""
+        if not self.available:
+            return
+        try:
+            fingerprint = file_fingerprint(self.source_path)
+            tmp_path = f"{self.cache_path}.tmp"
+            feather.write_feather(df.reset_index(drop=True), tmp_path, compression='uncompressed')
+            os.replace(tmp_path, self.cache_path)
+            self._write_meta({
+                'format_version': CACHE_FORMAT_VERSION,
+                'fingerprint': fingerprint,
+                'rows': len(df),
+            })
+            logger.info(f"Columnar data cache written to {self.cache_path}")
+        except Exception as e:
+            logger.warning(f"Could not write data cache: {e}")
+
+    def invalidate(self):
+        """Remove the cache files"""
+        for path in (self.cache_path, self.meta_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
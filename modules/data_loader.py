@@ -1,73 +1,308 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Tuple
 import logging
+from modules import metrics
+from modules.data_cache import ColumnarCache, file_fingerprint
+from modules.features import FEATURE_COLUMNS, TARGET_COLUMN, FeaturePipeline
+from modules.stats_engine import ApprovalStatsEngine, DEFAULT_STAT_COLUMNS
 
 logger = logging.getLogger(__name__)
 
+# Streaming chunk sizing: parsed rows cost more than their in-frame size while
+# pandas builds them, and feature batches add derived columns on top
+STREAM_MEMORY_OVERHEAD = 3.0
+STREAM_PROBE_ROWS = 1000
+STREAM_MIN_CHUNK_ROWS = 1000
+DEFAULT_STREAM_CHUNK_ROWS = 100_000
+
+# Compact in-memory schema. Label and purpose columns repeat a few dozen
+# distinct strings, so categoricals store each once plus small integer codes;
+# numbers are narrowed when every value fits (see apply_compact_schema)
+CATEGORY_COLUMNS = ['Text', 'Employment_Status', 'Approval']
+COMPACT_NUMERIC_DTYPES = {
+    'Income': np.int32,
+    'Credit_Score': np.int16,
+    'Loan_Amount': np.int32,
+    'DTI_Ratio': np.float32,
+}
+# DTI is a percentage with two decimals; float32 keeps it well within this
+FLOAT32_TOLERANCE = 1e-4
+
+def _narrow(values: pd.Series, dtype) -> pd.Series:
+    """values cast to dtype, or unchanged when that would alter any value"""
+    if values.dtype == dtype or not pd.api.types.is_numeric_dtype(values) or values.isna().any():
+        return values
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        if (values % 1 != 0).any() or values.min() < info.min or values.max() >= info.max:
+            return values
+        return values.astype(dtype)
+    narrowed = values.astype(dtype)
+    if (narrowed.astype(np.float64) - values).abs().max() > FLOAT32_TOLERANCE:
+        return values
+    return narrowed
+
+
+def apply_compact_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast the known loan columns to the compact schema in place (idempotent)"""
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    for column, dtype in COMPACT_NUMERIC_DTYPES.items():
+        if column in df.columns:
+            df[column] = _narrow(df[column], dtype)
+    return df
+
+
 class LoanDataLoader:
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, use_cache: bool = True, memory_limit_mb: Optional[float] = None,
+                 compact: bool = True):
         self.file_path = file_path
+        self.memory_limit_mb = memory_limit_mb
+        # Keep the loaded frame in the compact schema (categoricals, narrow numbers)
+        self.compact = compact
         self.df = None
         self.features = None
         self.target = None
+        self.cache = ColumnarCache(file_path) if use_cache else None
+        self.stats_engine = ApprovalStatsEngine()
+        self._data_version = 0
+        self._stats_memo: Dict = {}
+        self._pipeline: Optional[FeaturePipeline] = None
+        # Fingerprint of the source file behind self.df (see data_key)
+        self.fingerprint: Optional[Dict] = None
         
+    @metrics.timed('loan_data_load_seconds')
     def load_data(self) -> pd.DataFrame:
         """Load and preprocess the loan data"""
         try:
-            self.df = pd.read_csv(self.file_path)
+            if self.cache is not None:
+                cached_df = self.cache.load()
+                if cached_df is not None:
+                    self._set_data(apply_compact_schema(cached_df) if self.compact else cached_df)
+                    self.fingerprint = self.cache.fingerprint()
+                    logger.info(f"Data loaded from columnar cache. Shape: {self.df.shape}")
+                    return self.df
+            
+            if self.compact:
+                # Parse label columns straight into categoricals, never holding one Python string per row
+                df = pd.read_csv(self.file_path, dtype={column: 'category' for column in CATEGORY_COLUMNS})
+                self._set_data(apply_compact_schema(df))
+            else:
+                self._set_data(pd.read_csv(self.file_path))
             logger.info(f"Data loaded successfully. Shape: {self.df.shape}")
+            
+            if self.cache is not None:
+                self.cache.save(self.df)
+                self.fingerprint = self.cache.fingerprint()
+            if self.fingerprint is None:
+                self.fingerprint = file_fingerprint(self.file_path, include_hash=False)
             return self.df
         except Exception as e:
             logger.error(f"Error loading data: {e}")
             raise
             
-    def preprocess_data(self) -> Tuple[pd.DataFrame, pd.Series]:
-        """Preprocess the data for analysis"""
+    def memory_report(self) -> Dict:
+        """Resident size of the loaded frame, per column (deep: string storage included)"""
         if self.df is None:
             self.load_data()
+        usage = self.df.memory_usage(deep=True)
+        total = int(usage.sum())
+        return {
+            'rows': len(self.df),
+            'total_bytes': total,
+            'bytes_per_row': total / len(self.df) if len(self.df) else 0.0,
+            'columns': {column: {'dtype': str(self.df[column].dtype), 'bytes': int(usage[column])}
+                        for column in self.df.columns},
+        }
+    
+    def _set_data(self, df: pd.DataFrame):
+        """Replace the loaded frame and drop results derived from the old one"""
+        self.df = df
+        self._data_version += 1
+        self._stats_memo = {}
+        self._pipeline = None
+    
+    def data_key(self) -> Tuple:
+        """Hashable identity of the loaded data, for caching results derived from it"""
+        fingerprint = self.fingerprint or {}
+        source = fingerprint.get('content_hash') or (fingerprint.get('size'), fingerprint.get('mtime_ns'))
+        return (self.file_path, source, self._data_version)
+    
+    def _memoized(self, key: Tuple, compute):
+        # Keyed on the frame identity too, so direct assignments to self.df invalidate
+        memo_key = (self._data_version, id(self.df)) + key
+        if memo_key not in self._stats_memo:
+            self._stats_memo[memo_key] = compute()
+        return self._stats_memo[memo_key]
             
-        # Create a copy for preprocessing
-        df_processed = self.df.copy()
-        
-        # Convert Approval to binary
-        df_processed['Approval_Binary'] = df_processed['Approval'].map({'Approved': 1, 'Rejected': 0})
-        
-        # Handle employment status
-        df_processed['Employment_Status_Binary'] = df_processed['Employment_Status'].map({'employed': 1, 'unemployed': 0})
+    def feature_pipeline(self) -> FeaturePipeline:
+        """Lazily computed, cached derived features over self.df (rebuilt when self.df is replaced)"""
+        if self.df is None:
+            self.load_data()
+        if self._pipeline is None or self._pipeline.df is not self.df:
+            self._pipeline = FeaturePipeline(self.df)
+        return self._pipeline
+    
+    def feature_matrix(self, columns: Sequence[str] = FEATURE_COLUMNS, dtype=np.float64) -> np.ndarray:
+        """Contiguous, read-only (rows, columns) model input"""
+        return self.feature_pipeline().matrix(columns, dtype)
+            
+    def preprocess_data(self) -> Tuple[pd.DataFrame, pd.Series]:
+        """Preprocess the data for analysis"""
+        pipeline = self.feature_pipeline()
         
-        # Basic feature engineering
-        df_processed['Loan_to_Income_Ratio'] = df_processed['Loan_Amount'] / (df_processed['Income'] + 1)
-        df_processed['Credit_Score_Group'] = pd.cut(df_processed['Credit_Score'], 
-                                                 bins=[0, 580, 670, 740, 800, 850], 
-                                                 labels=['Poor', 'Fair', 'Good', 'Very Good', 'Excellent'])
+        # Base columns are shared with self.df; derived ones come from the pipeline cache
+        df_processed = pipeline.frame()
         
-        self.features = df_processed[['Income', 'Credit_Score', 'Loan_Amount', 'DTI_Ratio', 
-                                    'Employment_Status_Binary', 'Loan_to_Income_Ratio']]
-        self.target = df_processed['Approval_Binary']
+        self.features = df_processed[FEATURE_COLUMNS]
+        self.target = pipeline.column(TARGET_COLUMN)
         
         return df_processed, self.target
     
+    def _approval_partials(self) -> Dict:
+        """Mergeable partial aggregates behind get_approval_stats (see append_rows)"""
+        return self._memoized(('approval_partials',),
+                              lambda: self.stats_engine.partial_aggregates(self.df, DEFAULT_STAT_COLUMNS))
+    
+    @metrics.timed('loan_approval_stats_seconds')
     def get_approval_stats(self) -> Dict:
         """Get approval statistics"""
         if self.df is None:
             self.load_data()
             
-        stats = {
-            'total_applications': len(self.df),
-            'approved': len(self.df[self.df['Approval'] == 'Approved']),
-            'rejected': len(self.df[self.df['Approval'] == 'Rejected']),
-            'approval_rate': len(self.df[self.df['Approval'] == 'Approved']) / len(self.df) * 100,
-            'avg_income_approved': self.df[self.df['Approval'] == 'Approved']['Income'].mean(),
-            'avg_income_rejected': self.df[self.df['Approval'] == 'Rejected']['Income'].mean(),
-            'avg_credit_score_approved': self.df[self.df['Approval'] == 'Approved']['Credit_Score'].mean(),
-            'avg_credit_score_rejected': self.df[self.df['Approval'] == 'Rejected']['Credit_Score'].mean()
-        }
+        stats = self._memoized(('approval_stats',),
+                               lambda: self.stats_engine.stats_from_partials(self._approval_partials()))
+        return dict(stats)
+    
+    def prepare_rows(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """New applications in self.df's columns and schema, as append_rows and the segment cube take them.
+        
+        Missing columns become missing values. Raises ValueError for a
+        non-numeric value in a numeric column or a row without an approval
+        label, naming the column.
+        """
+        if self.df is None:
+            self.load_data()
+        rows = rows.reindex(columns=self.df.columns)
+        for column in self.df.columns:
+            if pd.api.types.is_numeric_dtype(self.df[column]):
+                values = pd.to_numeric(rows[column], errors='coerce')
+                if (values.isna() & rows[column].notna()).any():
+                    raise ValueError(f"Non-numeric {column} in new rows")
+                rows[column] = values
+        if 'Approval' in rows.columns and rows['Approval'].isna().any():
+            raise ValueError("New rows without an Approval label")
+        if self.compact:
+            rows = apply_compact_schema(rows)
+        return rows
+    
+    def stage_rows(self, rows: pd.DataFrame) -> Tuple[pd.DataFrame, Dict]:
+        """(merged frame, merged approval partials) for rows from prepare_rows, leaving the loader unchanged"""
+        base = self.df
+        rows = rows.copy()
+        for column in base.columns:
+            if isinstance(base[column].dtype, pd.CategoricalDtype):
+                # Same categories on both sides keeps the merged column categorical
+                categories = base[column].cat.categories.union(pd.Index(rows[column].dropna().unique()), sort=False)
+                if len(categories) != len(base[column].cat.categories):
+                    base = base.assign(**{column: base[column].cat.set_categories(categories)})
+                rows[column] = pd.Categorical(rows[column], categories=base[column].cat.categories)
+        
+        partials = self.stats_engine.merge(
+            self._approval_partials(), self.stats_engine.partial_aggregates(rows, DEFAULT_STAT_COLUMNS))
+        return pd.concat([base, rows], ignore_index=True), partials
+    
+    def commit_rows(self, df: pd.DataFrame, partials: Dict):
+        """Publish a frame and partials from stage_rows"""
+        self._set_data(df)
+        self._stats_memo[(self._data_version, id(self.df), 'approval_partials')] = partials
+    
+    @metrics.timed('loan_data_append_seconds')
+    def append_rows(self, rows: pd.DataFrame) -> int:
+        """Merge newly decided applications into self.df without re-reading the file.
+        
+        Approval stats are updated by merging the partial aggregates of the new
+        rows into the running ones, so their cost is O(new rows); every other
+        memoized result is recomputed on next use. Nothing changes when the
+        rows are rejected (see prepare_rows).
+        """
+        if self.df is None:
+            self.load_data()
+        if rows.empty:
+            return 0
         
-        return stats
+        rows = self.prepare_rows(rows)
+        self.commit_rows(*self.stage_rows(rows))
+        logger.info(f"Appended {len(rows)} rows. Shape: {self.df.shape}")
+        return len(rows)
+    
+    def get_grouped_stats(self, columns: Sequence[str] = DEFAULT_STAT_COLUMNS,
+                          aggregates: Iterable[str] = ('count', 'mean'),
+                          quantiles: Sequence[float] = ()) -> Dict:
+        """Approval-split aggregates (count/mean/std/min/max/sum, quantiles) for numeric columns"""
+        if self.df is None:
+            self.load_data()
+            
+        key = ('grouped', tuple(columns), tuple(aggregates), tuple(quantiles))
+        return self._memoized(key, lambda: self.stats_engine.aggregate(self.df, columns, aggregates, quantiles))
     
     def get_sample_data(self, n: int = 5) -> pd.DataFrame:
         """Get sample data for display"""
         if self.df is None:
             self.load_data()
-        return self.df.head(n)
\ No newline at end of file
+        return self.df.head(n)
+    
+    def stream_chunk_size(self, memory_limit_mb: Optional[float] = None) -> int:
+        """Rows per streamed chunk that keep one chunk under the memory ceiling"""
+        memory_limit_mb = memory_limit_mb or self.memory_limit_mb
+        if not memory_limit_mb:
+            return DEFAULT_STREAM_CHUNK_ROWS
+        
+        probe = pd.read_csv(self.file_path, nrows=STREAM_PROBE_ROWS)
+        bytes_per_row = probe.memory_usage(deep=True).sum() / max(len(probe), 1)
+        rows = int(memory_limit_mb * 1024 * 1024 / (bytes_per_row * STREAM_MEMORY_OVERHEAD))
+        return max(rows, STREAM_MIN_CHUNK_ROWS)
+    
+    def iter_chunks(self, chunksize: Optional[int] = None, memory_limit_mb: Optional[float] = None) -> Iterator[pd.DataFrame]:
+        """Read the CSV in bounded chunks without loading it into self.df"""
+        chunksize = chunksize or self.stream_chunk_size(memory_limit_mb)
+        logger.info(f"Streaming {self.file_path} in chunks of {chunksize} rows")
+        with pd.read_csv(self.file_path, chunksize=chunksize) as reader:
+            for chunk in reader:
+                yield chunk
+    
+    def stream_approval_stats(self, chunksize: Optional[int] = None, memory_limit_mb: Optional[float] = None) -> Dict:
+        """get_approval_stats() computed chunk by chunk"""
+        partials = None
+        for chunk in self.iter_chunks(chunksize, memory_limit_mb):
+            chunk_partials = self.stats_engine.partial_aggregates(chunk)
+            partials = chunk_partials if partials is None else self.stats_engine.merge(partials, chunk_partials)
+        if partials is None:
+            partials = {'total': 0, 'groups': {}}
+        return self.stats_engine.stats_from_partials(partials)
+    
+    def iter_feature_batches(self, chunksize: Optional[int] = None,
+                             memory_limit_mb: Optional[float] = None) -> Iterator[Tuple[pd.DataFrame, pd.Series]]:
+        """Yield (features, target) per chunk, preprocessed like preprocess_data()"""
+        for chunk in self.iter_chunks(chunksize, memory_limit_mb):
+            pipeline = FeaturePipeline(chunk)
+            yield pipeline.frame(FEATURE_COLUMNS), pipeline.column(TARGET_COLUMN)
+    
+    def stream_sample_data(self, n: int = 5, random_state: Optional[int] = None,
+                           chunksize: Optional[int] = None, memory_limit_mb: Optional[float] = None) -> pd.DataFrame:
+        """Sample rows without loading the file: the first n rows, or a uniform
+        random sample (reservoir of the n smallest random keys) when random_state is set"""
+        if random_state is None:
+            return pd.read_csv(self.file_path, nrows=n)
+        
+        rng = np.random.default_rng(random_state)
+        reservoir = None
+        for chunk in self.iter_chunks(chunksize, memory_limit_mb):
+            chunk = chunk.assign(_sample_key=rng.random(len(chunk)))
+            candidates = chunk if reservoir is None else pd.concat([reservoir, chunk])
+            reservoir = candidates.nsmallest(n, '_sample_key')
+        if reservoir is None:
+            return pd.read_csv(self.file_path, nrows=0)
+        return reservoir.sort_index().drop(columns='_sample_key')
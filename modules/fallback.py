@@ -0,0 +1,207 @@
+import logging
+from collections import deque
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from modules.segment_cube import format_rates
+
+logger = logging.getLogger(__name__)
+
+
+class Intent(NamedTuple):
+    """One fallback topic: any keyword selects it, earlier intents win ties"""
+    name: str
+    keywords: Tuple[str, ...]
+    template: str
+    # Match only whole words, so e.g. 'hi' does not fire inside 'this'
+    whole_word: bool = False
+
+
+# Figures quoted when no dataset is loaded (the previously hardcoded values)
+DEFAULT_FIGURES = {
+    'avg_income_approved': 85000.0,
+    'avg_credit_score_approved': 720.0,
+    'business_approval_rate': 42.0,
+    # Per-bucket approval rates from the segment cube, appended when available
+    'credit_score_rates': "",
+    'dti_rates': "",
+}
+
+DEFAULT_INTENTS: Tuple[Intent, ...] = (
+    Intent('greeting', ('hello', 'hi', 'hey'),
+           "Hello! I'm Uniccon Loan Approval Bot. I can help you with loan applications, approval criteria, and financial guidance. How can I assist you today?",
+           whole_word=True),
+    Intent('approval_criteria', ('loan approval', 'approval criteria'), """Based on our loan dataset analysis, key approval factors include:
+• **Credit Score**: Aim for 700+ for better chances
+• **Income**: Stable income demonstrating repayment ability
+• **DTI Ratio**: Keep below 36% for optimal approval
+• **Employment**: Stable employment history
+• **Loan Amount**: Reasonable relative to income
+
+Would you like me to analyze a specific application?"""),
+    Intent('credit_score', ('credit score', 'credit'), """Credit scores significantly impact loan approval:
+• **Excellent (750+)**: High approval likelihood
+• **Good (700-749)**: Good approval chances
+• **Fair (650-699)**: May need stronger other factors
+• **Poor (<650)**: Consider credit improvement first
+
+Our data shows approved applicants average {avg_credit_score_approved:.0f} credit scores.{credit_score_rates}"""),
+    Intent('income', ('income', 'salary'), """Income requirements depend on loan amount:
+• Generally, your monthly loan payment should be ≤28% of gross monthly income
+• Total debt payments should be ≤36% of monthly income
+• Higher income relative to loan amount improves approval chances
+
+Our approved applicants average ${avg_income_approved:,.0f} annual income."""),
+    Intent('dti', ('dti', 'debt to income'), """Debt-to-Income (DTI) Ratio Guidelines:
+• **Excellent**: <20% - Very high approval likelihood
+• **Good**: 20-35% - Good approval chances
+• **High**: 36-49% - May need stronger application
+• **Very High**: 50%+ - Significant improvement needed
+
+Lower DTI ratios demonstrate better repayment capacity.{dti_rates}"""),
+    Intent('business', ('business loan', 'business'), """Business loan considerations:
+• Business plan and financial projections
+• Time in business (2+ years preferred)
+• Business revenue and profitability
+• Personal credit score of business owner
+• Collateral availability
+
+Business loans in our dataset have a {business_approval_rate:.0f}% approval rate."""),
+    Intent('help', ('help', 'what can you do'), """I can help you with:
+• Loan approval criteria and requirements
+• Credit score analysis and improvement
+• Income and DTI ratio guidance
+• Business and personal loan information
+• Application analysis and recommendations
+• Historical approval patterns from our dataset
+
+Try the 'Loan Application Analysis' section for personalized assessment!"""),
+)
+
+DEFAULT_RESPONSE = """I specialize in loan approval guidance and financial advice.
+
+I can help you understand:
+• Loan approval criteria and requirements
+• Credit score impact on applications
+• Income and debt-to-income ratios
+• Business vs personal loan differences
+• Application improvement strategies
+
+Try asking about specific loan topics, or use the 'Loan Application Analysis' section for a personalized assessment!"""
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over every intent keyword.
+
+    One pass over the text finds all keyword occurrences, so matching cost
+    depends on the prompt length, not on how many intents are registered.
+    `best_match` returns the lowest (highest-priority) intent index found.
+    """
+
+    def __init__(self, keywords: Iterable[Tuple[str, int, bool]]):
+        # keywords: (keyword, intent index, whole_word)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._outputs: List[List[Tuple[int, int, bool]]] = [[]]
+        for keyword, priority, whole_word in keywords:
+            state = 0
+            for char in keyword.lower():
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._outputs.append([])
+                state = next_state
+            self._outputs[state].append((priority, len(keyword), whole_word))
+        self._fail = [0] * len(self._goto)
+        self._link_failures()
+
+    def _link_failures(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                # Inherit the keywords that end at the suffix state, best priority first
+                self._outputs[child] = sorted(self._outputs[child] + self._outputs[self._fail[child]])
+
+    def best_match(self, text: str) -> Optional[int]:
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        best = None
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for priority, length, whole_word in outputs[state]:
+                if best is not None and priority >= best:
+                    break
+                if whole_word and not _is_whole_word(text, end - length, end):
+                    continue
+                best = priority
+                break
+            if best == 0:
+                break
+        return best
+
+
+def _is_whole_word(text: str, start: int, end: int) -> bool:
+    return (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum())
+
+
+def fallback_figures(df: Optional[pd.DataFrame] = None, stats: Optional[Mapping] = None,
+                     segment_cube=None) -> Dict[str, Any]:
+    """Figures quoted by the fallback answers, taken from the dataset where available"""
+    figures = dict(DEFAULT_FIGURES)
+    if stats:
+        for key in ('avg_income_approved', 'avg_credit_score_approved'):
+            if pd.notna(stats.get(key)):
+                figures[key] = float(stats[key])
+    if df is not None and {'Text', 'Approval'}.issubset(df.columns):
+        business = df['Text'].str.contains('business', case=False, regex=False, na=False)
+        if business.any():
+            figures['business_approval_rate'] = float((df.loc[business, 'Approval'] == 'Approved').mean() * 100)
+    if segment_cube is not None:
+        figures['credit_score_rates'] = f"\nApproval rate by credit score group: {format_rates(segment_cube, 'credit_score')}"
+        figures['dti_rates'] = f"\nApproval rate by DTI ratio: {format_rates(segment_cube, 'dti_ratio')}"
+    return figures
+
+
+class FallbackResponder:
+    """Rule-based answers used when the model is unavailable.
+
+    Templates are rendered once from `figures` at construction; answering is
+    a single automaton pass plus a list lookup.
+    """
+
+    def __init__(self, figures: Optional[Mapping] = None, intents: Sequence[Intent] = DEFAULT_INTENTS,
+                 default_response: str = DEFAULT_RESPONSE):
+        values = dict(DEFAULT_FIGURES)
+        values.update(figures or {})
+        self.intents = tuple(intents)
+        self.responses = [intent.template.format_map(values) for intent in self.intents]
+        self.default_response = default_response
+        self.matcher = KeywordMatcher(
+            (keyword, index, intent.whole_word)
+            for index, intent in enumerate(self.intents)
+            for keyword in intent.keywords
+        )
+
+    @classmethod
+    def from_data(cls, df: Optional[pd.DataFrame] = None, stats: Optional[Mapping] = None, segment_cube=None,
+                  **kwargs) -> 'FallbackResponder':
+        return cls(fallback_figures(df, stats, segment_cube), **kwargs)
+
+    def match(self, prompt: str) -> Optional[str]:
+        """Name of the intent selected for `prompt`, or None"""
+        index = self.matcher.best_match(prompt.lower())
+        return None if index is None else self.intents[index].name
+
+    def respond(self, prompt: str) -> str:
+        index = self.matcher.best_match(prompt.lower())
+        return self.default_response if index is None else self.responses[index]
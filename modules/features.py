@@ -0,0 +1,192 @@
+"""Derived loan features, declared once and computed lazily.
+
+Each derived column names the source columns it reads. A FeaturePipeline
+wraps a base frame without copying it. A derived column is computed on
+first access and cached. It is recomputed only when one of its sources is
+replaced (a new array behind the column), and model inputs come out as one
+contiguous NumPy matrix that is cached the same way.
+"""
+import logging
+from typing import Callable, Dict, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FEATURE_COLUMNS = ['Income', 'Credit_Score', 'Loan_Amount', 'DTI_Ratio',
+                   'Employment_Status_Binary', 'Loan_to_Income_Ratio']
+TARGET_COLUMN = 'Approval_Binary'
+
+# Credit_Score_Group bins, (a, b] as in pd.cut; shared with the segment cube
+CREDIT_SCORE_BINS = [0, 580, 670, 740, 800, 850]
+CREDIT_SCORE_LABELS = ['Poor', 'Fair', 'Good', 'Very Good', 'Excellent']
+# Integer columns spanning at most this many values are binned through a lookup table
+CUT_TABLE_MAX = 1 << 16
+
+
+def map_labels(values: pd.Series, mapping: Dict) -> pd.Series:
+    """Series.map that yields a plain numeric column for categorical input too"""
+    mapped = values.map(mapping)
+    if isinstance(mapped.dtype, pd.CategoricalDtype):
+        mapped = mapped.astype(np.float64 if mapped.isna().any() else mapped.cat.categories.dtype)
+    return mapped
+
+
+def binary_flag(values: pd.Series, mapping: Dict) -> pd.Series:
+    """0/1 column as int8 (one byte per row); float with NaN when a label is unmapped"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = values.cat.categories
+        if all(category in mapping for category in categories):
+            # Translate the small category table, then index it with the codes
+            table = np.array([mapping[category] for category in categories] + [0], dtype=np.int8)
+            codes = values.cat.codes.to_numpy()
+            if not (codes < 0).any():
+                return pd.Series(table[codes], index=values.index)
+    mapped = map_labels(values, mapping)
+    return mapped if mapped.isna().any() else mapped.astype(np.int8)
+
+
+def _bin_codes(values: np.ndarray, bins: Sequence[float]) -> np.ndarray:
+    edges = np.asarray(bins, dtype=np.float64)
+    codes = np.searchsorted(edges, values, side='left') - 1
+    codes[(values <= edges[0]) | (values > edges[-1]) | np.isnan(values)] = -1
+    return codes.astype(np.int8)
+
+
+def cut_categories(values: pd.Series, bins: Sequence[float], labels: Sequence[str]) -> pd.Series:
+    """pd.cut(values, bins, labels) with (a, b] bins, without its full-size float temporaries"""
+    array = values.to_numpy()
+    if np.issubdtype(array.dtype, np.integer) and len(array) and int(array.max()) - int(array.min()) <= CUT_TABLE_MAX:
+        # Integer scores span a few hundred values: bin each distinct value once, then look codes up
+        low = int(array.min())
+        table = _bin_codes(np.arange(low, int(array.max()) + 1, dtype=np.float64), bins)
+        codes = table[array - array.dtype.type(low)]
+    else:
+        codes = _bin_codes(array.astype(np.float64, copy=False), bins)
+    return pd.Series(pd.Categorical.from_codes(codes, categories=pd.Index(labels), ordered=True), index=values.index)
+
+
+class DerivedFeature(NamedTuple):
+    """A column computed from `sources`; `compute` receives them by name"""
+    name: str
+    sources: Tuple[str, ...]
+    compute: Callable[[Mapping[str, pd.Series]], pd.Series]
+
+
+DERIVED_FEATURES: Tuple[DerivedFeature, ...] = (
+    DerivedFeature('Approval_Binary', ('Approval',),
+                   lambda c: binary_flag(c['Approval'], {'Approved': 1, 'Rejected': 0})),
+    DerivedFeature('Employment_Status_Binary', ('Employment_Status',),
+                   lambda c: binary_flag(c['Employment_Status'], {'employed': 1, 'unemployed': 0})),
+    DerivedFeature('Loan_to_Income_Ratio', ('Loan_Amount', 'Income'),
+                   lambda c: c['Loan_Amount'] / (c['Income'] + 1)),
+    DerivedFeature('Credit_Score_Group', ('Credit_Score',),
+                   lambda c: cut_categories(c['Credit_Score'], CREDIT_SCORE_BINS, CREDIT_SCORE_LABELS)),
+)
+
+
+def _column_data(values: pd.Series):
+    """(identity, buffer) of the data behind a column; the identity changes when the column is replaced"""
+    array = values.array
+    if isinstance(array, pd.Categorical):
+        buffer = array.codes
+    elif isinstance(array, pd.arrays.NumpyExtensionArray):
+        buffer = array.to_numpy()
+    else:
+        # Other extension arrays: fall back to hashing the values
+        return ('hash', int(pd.util.hash_pandas_object(values, index=False).sum())), None
+    return (buffer.__array_interface__['data'][0], len(buffer)), buffer
+
+
+class FeaturePipeline:
+    """Lazy, cached derived columns and model matrices over a base frame.
+
+    The base frame is never copied or modified. Derived columns live in the
+    pipeline and are checked against the identity of their source columns
+    on each access. Edits made in place inside a source column keep its
+    identity, so call `invalidate(column)` after them.
+    """
+
+    def __init__(self, df: pd.DataFrame, features: Sequence[DerivedFeature] = DERIVED_FEATURES):
+        self.df = df
+        self.features = {feature.name: feature for feature in features}
+        self._columns: Dict[str, Tuple[Tuple, list, pd.Series]] = {}
+        self._matrices: Dict[Tuple, Tuple[Tuple, list, np.ndarray]] = {}
+        self.computed = 0
+
+    def _sources(self, name: str) -> Tuple[str, ...]:
+        """Base columns a column depends on, following derived-on-derived features"""
+        feature = self.features.get(name)
+        if feature is None:
+            return (name,)
+        sources = []
+        for source in feature.sources:
+            sources.extend(self._sources(source))
+        return tuple(dict.fromkeys(sources))
+
+    def _token(self, names: Sequence[str]) -> Tuple[Tuple, list]:
+        """Identities of the source columns, plus their buffers: holding those keeps an address from
+        being reused by a replacement column while a cached result still refers to it"""
+        data = [_column_data(self.df[source]) for name in names for source in self._sources(name)]
+        return tuple(identity for identity, _ in data), [buffer for _, buffer in data]
+
+    def column(self, name: str) -> pd.Series:
+        """A base or derived column; derived ones are computed once per version of their sources"""
+        feature = self.features.get(name)
+        if feature is None:
+            return self.df[name]
+        token, buffers = self._token([name])
+        cached = self._columns.get(name)
+        if cached is not None and cached[0] == token:
+            return cached[2]
+        values = feature.compute({source: self.column(source) for source in feature.sources})
+        values = pd.Series(values, index=self.df.index, name=name)
+        self._columns[name] = (token, buffers, values)
+        self.computed += 1
+        return values
+
+    __getitem__ = column
+
+    def frame(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Base columns plus derived ones; base data is shared, not copied"""
+        if columns is None:
+            columns = list(self.df.columns) + [name for name in self.features if name not in self.df.columns]
+        return pd.DataFrame({name: self.column(name) for name in columns}, index=self.df.index, copy=False)
+
+    def matrix(self, columns: Sequence[str] = FEATURE_COLUMNS, dtype=np.float64) -> np.ndarray:
+        """C-contiguous (rows, columns) array, cached until a source column changes"""
+        key = (tuple(columns), np.dtype(dtype).str)
+        token, buffers = self._token(columns)
+        cached = self._matrices.get(key)
+        if cached is not None and cached[0] == token:
+            return cached[2]
+        matrix = np.empty((len(self.df), len(columns)), dtype=dtype)
+        for position, name in enumerate(columns):
+            matrix[:, position] = self.column(name).to_numpy(dtype=dtype)
+        matrix.flags.writeable = False
+        self._matrices[key] = (token, buffers, matrix)
+        return matrix
+
+    def target(self, dtype=np.int64) -> np.ndarray:
+        return self.matrix([TARGET_COLUMN], dtype)[:, 0]
+
+    def invalidate(self, *columns: str):
+        """Drop cached results that read any of `columns` (everything when none are given)"""
+        if not columns:
+            self._columns.clear()
+            self._matrices.clear()
+            return
+        changed = set(columns)
+        for name in [name for name in self._columns if changed & set(self._sources(name))]:
+            del self._columns[name]
+        for key in [key for key in self._matrices if any(changed & set(self._sources(name)) for name in key[0])]:
+            del self._matrices[key]
+
+
+def add_derived_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Add the derived feature columns to df in place"""
+    pipeline = FeaturePipeline(df)
+    for name in pipeline.features:
+        df[name] = pipeline.column(name)
+    return df
@@ -0,0 +1,190 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import ollama
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_RESET_TIMEOUT = 30.0
+DEFAULT_PROBE_INTERVAL = 15.0
+DEFAULT_PROBE_TIMEOUT = 2.0
+
+
+class CircuitOpenError(Exception):
+    """A model call was refused because the circuit is open or its half-open trial is taken"""
+
+
+class CircuitBreaker:
+    """Stops calling a failing dependency until it has had time to recover.
+
+    CLOSED lets requests through and counts consecutive failures; reaching
+    `failure_threshold` opens the circuit. OPEN rejects requests until
+    `reset_timeout` has passed, then reads as HALF_OPEN: one trial request
+    is let through and the rest are still rejected. Its success closes the
+    circuit and its failure re-opens it. A trial that never reports back
+    frees its slot after another `reset_timeout`.
+    """
+
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout: float = DEFAULT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        # When the half-open trial request was let through, while it is outstanding
+        self.trial_started_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def allow_request(self) -> bool:
+        """Whether a request may go out now; in HALF_OPEN this claims the single trial slot"""
+        with self._lock:
+            state = self._state()
+            if state != HALF_OPEN:
+                return state == CLOSED
+            now = time.monotonic()
+            if self.trial_started_at is not None and now - self.trial_started_at < self.reset_timeout:
+                return False
+            self.trial_started_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info("Circuit closed - Ollama reachable again")
+            self.failures = 0
+            self.opened_at = None
+            self.trial_started_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_started_at = None
+            if self._state() == HALF_OPEN or self.failures >= self.failure_threshold:
+                self._open(f"after {self.failures} failures")
+
+    def trip(self):
+        """Open the circuit immediately, e.g. after a failed health probe"""
+        with self._lock:
+            self.failures = max(self.failures, self.failure_threshold)
+            self.trial_started_at = None
+            self._open("by failed health check")
+
+    def _open(self, reason: str):
+        if self.opened_at is None:
+            logger.warning(f"Circuit opened {reason} - using fallback responses")
+        self.opened_at = time.monotonic()
+
+
+class OllamaHealthMonitor:
+    """Probes an Ollama server in a background thread and owns its circuit breaker.
+
+    Model handlers read `reachable` to skip straight to a fallback, call
+    `try_acquire()` right before each request to the server (no network
+    round-trip) and report call outcomes back. A failed probe opens the
+    circuit at once; a successful probe closes it, so service resumes on
+    its own when the server returns. Until the first probe finishes the
+    server is assumed to be up.
+    """
+
+    def __init__(self, host: Optional[str] = None, interval: float = DEFAULT_PROBE_INTERVAL,
+                 probe_timeout: float = DEFAULT_PROBE_TIMEOUT, breaker: Optional[CircuitBreaker] = None):
+        self.host = host
+        self.interval = interval
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.client = ollama.Client(host=host, timeout=probe_timeout)
+        self.last_probe: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def reachable(self) -> bool:
+        """Circuit not open; a read that never claims the half-open trial"""
+        return self.breaker.state != OPEN
+
+    def try_acquire(self) -> bool:
+        """Whether a request may go to the server now; while half-open this claims the trial.
+        Call it only right before the request, whose outcome must then be recorded."""
+        return self.breaker.allow_request()
+
+    def record_success(self):
+        self.breaker.record_success()
+
+    def record_failure(self):
+        self.breaker.record_failure()
+
+    def probe(self) -> bool:
+        """Check the server once and update the circuit"""
+        start = time.perf_counter()
+        try:
+            self.client.list()
+            ok = True
+        except Exception as e:
+            logger.debug(f"Ollama health probe failed: {e}")
+            ok = False
+        self.last_probe = {'ok': ok, 'latency': time.perf_counter() - start, 'at': time.time()}
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.trip()
+        return ok
+
+    def start(self) -> 'OllamaHealthMonitor':
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="ollama-health", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def _run(self):
+        self.probe()
+        while not self._stop.wait(self.interval):
+            self.probe()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'host': self.host,
+            'state': self.breaker.state,
+            'consecutive_failures': self.breaker.failures,
+            'last_probe': self.last_probe,
+        }
+
+
+_monitors: Dict[str, OllamaHealthMonitor] = {}
+_monitors_lock = threading.Lock()
+
+
+def get_health_monitor(host: Optional[str] = None) -> OllamaHealthMonitor:
+    """Started monitor shared by every model handler talking to `host`"""
+    key = host or os.environ.get('OLLAMA_HOST') or 'default'
+    with _monitors_lock:
+        monitor = _monitors.get(key)
+        if monitor is None:
+            monitor = _monitors[key] = OllamaHealthMonitor(host=host)
+    return monitor.start()
@@ -0,0 +1,179 @@
+"""Incremental ingestion of newly decided applications.
+
+A DeltaWatcher polls one of two sources for rows it has not seen yet:
+
+- an append-only CSV or JSONL file (loan_data.csv itself included). Only
+  bytes past the last offset are read, and only up to the last complete
+  line, so a writer caught mid-append is picked up on the next poll.
+- a directory of delta files (*.csv, *.jsonl). Each file is read once, in
+  name order. Writers should create the file under a dot-prefixed or .tmp
+  name and rename it into place when it is complete.
+
+New rows are handed to a callback, normally `SharedResources.ingest`. The
+watcher only moves past a batch (file offset or delta file) once the
+callback has accepted it, so a batch it rejects is retried on the next poll.
+
+    python -m modules.ingest loan_data.csv deltas/ --interval 5
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import threading
+from typing import Any, Callable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 5.0
+DELTA_SUFFIXES = ('.csv', '.jsonl', '.ndjson')
+
+
+def _is_jsonl(path: str) -> bool:
+    return path.endswith(('.jsonl', '.ndjson'))
+
+
+def parse_rows(data: bytes, jsonl: bool, header: bytes = b"") -> pd.DataFrame:
+    """Rows from complete CSV lines (with their header line) or JSON lines"""
+    if not data.strip():
+        return pd.DataFrame()
+    if jsonl:
+        return pd.DataFrame([json.loads(line) for line in data.splitlines() if line.strip()])
+    return pd.read_csv(io.BytesIO(header + data))
+
+
+class DeltaWatcher:
+    """Polls an append-only file or a delta directory and passes new rows to `on_rows`"""
+
+    def __init__(self, path: str, on_rows: Callable[[pd.DataFrame], Any],
+                 interval: float = DEFAULT_POLL_INTERVAL, start_offset: int = 0):
+        self.path = path
+        self.on_rows = on_rows
+        self.interval = interval
+        # Append-only file: bytes already consumed (the loaded size when watching the data file itself)
+        self.offset = start_offset
+        # Delta directory: files already ingested
+        self.seen_files: Set[str] = set()
+        self.rows_ingested = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def poll(self) -> int:
+        """Ingest whatever has arrived since the last poll; returns the number of new rows"""
+        with self._lock:
+            if os.path.isdir(self.path):
+                frames = self._read_directory()
+            elif os.path.exists(self.path):
+                frames = self._read_appended()
+            else:
+                return 0
+            added = 0
+            try:
+                for rows, consumed in frames:
+                    if not rows.empty:
+                        self.on_rows(rows)
+                        added += len(rows)
+                    consumed()
+            finally:
+                self.rows_ingested += added
+            return added
+
+    def _read_appended(self) -> List[Tuple[pd.DataFrame, Callable[[], None]]]:
+        size = os.path.getsize(self.path)
+        if size < self.offset:
+            logger.warning(f"{self.path} shrank below the ingested offset; reading it again from the start")
+            self.offset = 0
+        if size == self.offset:
+            return []
+        jsonl = _is_jsonl(self.path)
+        with open(self.path, 'rb') as f:
+            header = b"" if jsonl else f.readline()
+            start = max(self.offset, len(header))
+            f.seek(start)
+            data = f.read(size - start)
+        # A writer may be part-way through the last line; leave it for the next poll
+        end = data.rfind(b'\n') + 1
+        if not end:
+            return []
+
+        def consumed():
+            self.offset = start + end
+
+        return [(parse_rows(data[:end], jsonl, header), consumed)]
+
+    def _read_directory(self) -> List[Tuple[pd.DataFrame, Callable[[], None]]]:
+        frames = []
+        for name in sorted(os.listdir(self.path)):
+            if name in self.seen_files or name.startswith('.') or not name.endswith(DELTA_SUFFIXES):
+                continue
+            with open(os.path.join(self.path, name), 'rb') as f:
+                data = f.read()
+            try:
+                rows = parse_rows(data, _is_jsonl(name))
+            except Exception as e:
+                # Retrying cannot fix a file that does not parse
+                logger.error(f"Skipping unreadable delta file {name}: {e}")
+                rows = pd.DataFrame()
+            frames.append((rows, lambda name=name: self.seen_files.add(name)))
+        return frames
+
+    def start(self) -> 'DeltaWatcher':
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="delta-watcher", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                added = self.poll()
+                if added:
+                    logger.info(f"Ingested {added} new applications from {self.path}")
+            except Exception as e:
+                logger.error(f"Error ingesting from {self.path}: {e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Follow new applications and print the refreshed approval stats")
+    parser.add_argument('data', help="loaded dataset (CSV)")
+    parser.add_argument('deltas', nargs='?', help="append-only file or delta directory (default: the dataset itself)")
+    parser.add_argument('--interval', type=float, default=DEFAULT_POLL_INTERVAL)
+    parser.add_argument('--once', action='store_true', help="poll once and exit")
+    args = parser.parse_args(argv)
+
+    from modules.data_loader import LoanDataLoader
+
+    loader = LoanDataLoader(args.data)
+    loader.load_data()
+    source = args.deltas or args.data
+    start_offset = loader.fingerprint.get('size', 0) if source == args.data else 0
+
+    def report(rows: pd.DataFrame):
+        loader.append_rows(rows)
+        print(json.dumps(loader.get_approval_stats()), flush=True)
+
+    watcher = DeltaWatcher(source, report, interval=args.interval, start_offset=start_offset)
+    if args.once:
+        watcher.poll()
+        return 0
+    watcher.start()
+    try:
+        watcher._stop.wait()
+    except KeyboardInterrupt:
+        watcher.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
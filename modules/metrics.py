@@ -0,0 +1,260 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 40, 80, 160, 320)
+
+COUNTER = 'counter'
+HISTOGRAM = 'histogram'
+
+# Every metric the app records: name -> (type, help, buckets)
+METRICS = {
+    'loan_data_load_seconds': (HISTOGRAM, "LoanDataLoader.load_data duration", LATENCY_BUCKETS),
+    'loan_approval_stats_seconds': (HISTOGRAM, "LoanDataLoader.get_approval_stats duration", LATENCY_BUCKETS),
+    'loan_model_generate_seconds': (HISTOGRAM, "Model response duration, streamed or not", LATENCY_BUCKETS),
+    'loan_model_first_token_seconds': (HISTOGRAM, "Time to the first streamed chunk", LATENCY_BUCKETS),
+    'loan_model_analyze_seconds': (HISTOGRAM, "LoanApprovalModel.analyze_loan_application duration", LATENCY_BUCKETS),
+    'loan_model_prompt_tokens': (HISTOGRAM, "Prompt tokens evaluated by Ollama", TOKEN_BUCKETS),
+    'loan_model_load_seconds': (HISTOGRAM, "Ollama model load time per request (0 while the model stays loaded)", LATENCY_BUCKETS),
+    'loan_model_prompt_eval_seconds': (HISTOGRAM, "Ollama prompt evaluation (prefill) time", LATENCY_BUCKETS),
+    'loan_model_decode_seconds': (HISTOGRAM, "Ollama token generation (decode) time", LATENCY_BUCKETS),
+    'loan_model_generated_tokens': (HISTOGRAM, "Tokens generated by Ollama", TOKEN_BUCKETS),
+    'loan_model_tokens_per_second': (HISTOGRAM, "Ollama generation speed", RATE_BUCKETS),
+    'loan_model_cache_hits_total': (COUNTER, "Answers served from the response cache", None),
+    'loan_model_fallbacks_total': (COUNTER, "Answers served by the rule-based fallback", None),
+    'loan_chat_build_context_seconds': (HISTOGRAM, "Prompt context assembly duration", LATENCY_BUCKETS),
+    'loan_chat_process_message_seconds': (HISTOGRAM, "LoanApprovalChatEngine message handling duration", LATENCY_BUCKETS),
+    'loan_router_rules_seconds': (HISTOGRAM, "Rule-based answer duration on the router's rules tier", LATENCY_BUCKETS),
+    'loan_router_small_seconds': (HISTOGRAM, "Small-model attempt duration, including ones that lost a hedge", LATENCY_BUCKETS),
+    'loan_router_large_seconds': (HISTOGRAM, "Large-model attempt duration, including ones that lost a hedge", LATENCY_BUCKETS),
+    'loan_router_hedges_total': (COUNTER, "Routed requests that also asked a cheaper tier", None),
+    'loan_router_cutovers_total': (COUNTER, "Routed requests served by a cheaper tier than planned", None),
+    'loan_router_slo_misses_total': (COUNTER, "Routed requests slower than their route's SLO", None),
+    'loan_server_request_seconds': (HISTOGRAM, "API server request duration, streamed responses included", LATENCY_BUCKETS),
+    'loan_server_rejected_total': (COUNTER, "API requests refused with 429 because the worker queue was full", None),
+    'loan_server_timeouts_total': (COUNTER, "API requests answered with 504 after the request timeout", None),
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram with Prometheus semantics (cumulative `le` buckets)"""
+
+    def __init__(self, name: str, help_text: str = "", buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.bounds = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate by linear interpolation inside the bucket holding the q-th observation"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                if index == len(self.bounds):
+                    return lower
+                return lower + (self.bounds[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            cumulative, total = {}, 0
+            for bound, count in zip(self.bounds, self.counts):
+                total += count
+                cumulative[str(bound)] = total
+            cumulative['+Inf'] = self.count
+            return {
+                'type': HISTOGRAM,
+                'count': self.count,
+                'sum': self.sum,
+                'mean': self.sum / self.count if self.count else None,
+                'p50': self.quantile(0.5),
+                'p95': self.quantile(0.95),
+                'p99': self.quantile(0.99),
+                'buckets': cumulative,
+            }
+
+    def prometheus_lines(self) -> List[str]:
+        snapshot = self.snapshot()
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        lines += [f'{self.name}_bucket{{le="{bound}"}} {count}' for bound, count in snapshot['buckets'].items()]
+        lines += [f"{self.name}_sum {snapshot['sum']}", f"{self.name}_count {snapshot['count']}"]
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str = ""):
+        self.name = name
+        self.help = help_text
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'type': COUNTER, 'value': self.value}
+
+    def prometheus_lines(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter", f"{self.name} {self.value}"]
+
+
+class MetricsRegistry:
+    """Named counters and histograms, exported as Prometheus text or JSON.
+
+    While `enabled` is False the recording helpers return after one
+    attribute check, so instrumented code pays next to nothing.
+    """
+
+    def __init__(self, enabled: bool = False, definitions: Mapping = METRICS):
+        self.enabled = enabled
+        self.definitions = definitions
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    kind, help_text, buckets = self.definitions.get(name, (HISTOGRAM, "", LATENCY_BUCKETS))
+                    metric = Counter(name, help_text) if kind == COUNTER else Histogram(name, help_text, buckets)
+                    self._metrics[name] = metric
+        return metric
+
+    def observe(self, name: str, value: float):
+        if self.enabled:
+            self._get(name).observe(value)
+
+    def inc(self, name: str, amount: float = 1.0):
+        if self.enabled:
+            self._get(name).inc(amount)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._get(name).observe(time.perf_counter() - start)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._metrics)
+        return {'timestamp': time.time(), 'metrics': {name: metrics[name].snapshot() for name in sorted(metrics)}}
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            metrics = dict(self._metrics)
+        lines = []
+        for name in sorted(metrics):
+            lines.extend(metrics[name].prometheus_lines())
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Write a JSON snapshot (.json) or Prometheus text (any other extension)"""
+        payload = json.dumps(self.snapshot(), indent=2) if path.endswith('.json') else self.render_prometheus()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(payload)
+
+    def reset(self):
+        with self._lock:
+            self._metrics.clear()
+
+
+# Set LOAN_METRICS=1 to record from startup, or call REGISTRY.enabled = True
+REGISTRY = MetricsRegistry(enabled=os.environ.get('LOAN_METRICS', '').lower() in ('1', 'true', 'yes'))
+
+
+def observe(name: str, value: float):
+    REGISTRY.observe(name, value)
+
+
+def inc(name: str, amount: float = 1.0):
+    REGISTRY.inc(name, amount)
+
+
+def timer(name: str):
+    return REGISTRY.timer(name)
+
+
+def timed(name: str):
+    """Decorator recording each call's duration in histogram `name`"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not REGISTRY.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                REGISTRY._get(name).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def generation_timing(response: Mapping) -> Dict[str, Any]:
+    """Load, prefill and decode breakdown of a final Ollama response, in seconds and tokens"""
+    def seconds(key: str) -> float:
+        return (response.get(key) or 0) / 1e9
+
+    return {
+        'load_seconds': seconds('load_duration'),
+        'prompt_tokens': response.get('prompt_eval_count') or 0,
+        'prefill_seconds': seconds('prompt_eval_duration'),
+        'generated_tokens': response.get('eval_count') or 0,
+        'decode_seconds': seconds('eval_duration'),
+        'total_seconds': seconds('total_duration'),
+    }
+
+
+def record_generation(response: Mapping):
+    """Model load, prompt size, prefill, output size, decode and speed from a final Ollama response or stream chunk"""
+    if not REGISTRY.enabled:
+        return
+    load_ns = response.get('load_duration')
+    prompt_tokens = response.get('prompt_eval_count')
+    prompt_eval_ns = response.get('prompt_eval_duration')
+    eval_count = response.get('eval_count')
+    eval_ns = response.get('eval_duration')
+    if load_ns is not None:
+        REGISTRY.observe('loan_model_load_seconds', load_ns / 1e9)
+    if prompt_tokens is not None:
+        REGISTRY.observe('loan_model_prompt_tokens', prompt_tokens)
+    if prompt_eval_ns:
+        REGISTRY.observe('loan_model_prompt_eval_seconds', prompt_eval_ns / 1e9)
+    if eval_count is not None:
+        REGISTRY.observe('loan_model_generated_tokens', eval_count)
+        if eval_ns:
+            REGISTRY.observe('loan_model_decode_seconds', eval_ns / 1e9)
+            REGISTRY.observe('loan_model_tokens_per_second', eval_count / (eval_ns / 1e9))
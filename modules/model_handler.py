@@ -1,157 +1,227 @@
 import ollama
+import json
 import logging
-from typing import Any, Dict
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from modules.context_window import ChatPrompt
+from modules.fallback import FallbackResponder
+from modules.health import CircuitOpenError, OllamaHealthMonitor, get_health_monitor
+from modules import metrics
+from modules.response_cache import ResponseCache, make_cache_key
 
 logger = logging.getLogger(__name__)
 
+GENERATION_OPTIONS = {
+    'temperature': 0.1,
+    'num_predict': 800,
+}
+# How long Ollama keeps the model loaded after a request ('30m', seconds, or -1 for always)
+DEFAULT_KEEP_ALIVE = '30m'
+
+# Sent first in every request and never varies, so the server can reuse its prefill
+SYSTEM_PROMPT = """You are Uniccon Loan Approval Bot, an AI assistant specialized in loan approval analysis and financial guidance.
+Please provide a helpful, accurate response based on the loan data context and financial best practices.
+Be professional but friendly in your tone.
+Focus on loan approval criteria, credit scores, income requirements, debt-to-income ratios, and financial advice."""
+
+PromptContext = Union[str, ChatPrompt]
+
+
+def build_messages(prompt: str, context: PromptContext = "") -> List[Dict[str, str]]:
+    """Chat messages for a query, ordered for prefix reuse.
+
+    The system prompt and data context come first and are the same for every
+    turn. Then come the session's summary and recent turns, which only grow
+    between turns. What is new for this message comes last. A plain string
+    context is sent with the query in the final user message.
+    """
+    if not isinstance(context, ChatPrompt):
+        query = f"CONTEXT FOR ANALYSIS:\n{context}\n\nUSER QUERY: {prompt}" if context else prompt
+        return [{'role': 'system', 'content': SYSTEM_PROMPT}, {'role': 'user', 'content': query}]
+
+    system = SYSTEM_PROMPT
+    if context.data_context:
+        system += f"\n\nCONTEXT FOR ANALYSIS:\n{context.data_context.strip()}"
+    messages = [{'role': 'system', 'content': system}]
+    if context.summary:
+        messages.append({'role': 'system', 'content': context.summary})
+    for user_message, answer in context.turns:
+        messages.append({'role': 'user', 'content': user_message})
+        messages.append({'role': 'assistant', 'content': answer})
+    query = f"{context.retrieved}\n\nUSER QUERY: {prompt}" if context.retrieved else prompt
+    messages.append({'role': 'user', 'content': query})
+    return messages
+
+
+def context_key(context: PromptContext) -> str:
+    """Stable text form of a prompt context, for response cache keys"""
+    return context if isinstance(context, str) else json.dumps(context, ensure_ascii=False)
+
+
 class LoanApprovalModel:
-    def __init__(self, model_name: str = "llama2"):
+    def __init__(self, model_name: str = "llama2", response_cache: Optional[ResponseCache] = None,
+                 host: Optional[str] = None, health_monitor: Optional[OllamaHealthMonitor] = None,
+                 fallback: Optional[FallbackResponder] = None, keep_alive: Union[str, float, None] = None):
         self.model_name = model_name
-        self.model_available = False
+        # host=None uses OLLAMA_HOST or the default local server
+        self.client = ollama.Client(host=host)
+        # Keep the model resident between turns so no request pays for reloading it
+        self.keep_alive = keep_alive if keep_alive is not None else os.environ.get('OLLAMA_KEEP_ALIVE', DEFAULT_KEEP_ALIVE)
+        # Load / prefill / decode breakdown of the latest generation (see metrics.generation_timing)
+        self.last_timing: Optional[Dict[str, Any]] = None
+        self.response_cache = response_cache if response_cache is not None else ResponseCache()
+        # Rule-based answers; quotes the dataset's figures once one is attached
+        self.fallback = fallback if fallback is not None else FallbackResponder()
+        self.health = health_monitor if health_monitor is not None else get_health_monitor(host)
         self.initialize_model()
+    
+    @property
+    def model_available(self) -> bool:
+        """Whether the shared circuit is not open - no network call, and no half-open trial claimed"""
+        return self.health.reachable
         
     def initialize_model(self):
-        """Initialize the Ollama model with robust error handling"""
-        try:
-            logger.info("Initializing Ollama model...")
-            
-            # Try to list models to check availability
-            try:
-                models_response = ollama.list()
-                logger.info(f"Ollama response received")
-                
-                # Simple check - if we get a response, assume it's working
-                self.model_available = True
-                logger.info("Ollama model system initialized successfully")
-                
-            except Exception as list_error:
-                logger.warning(f"Could not list Ollama models: {list_error}")
-                self.model_available = False
-                
-        except Exception as e:
-            logger.error(f"Error during model initialization: {e}")
-            self.model_available = False
-            
-        if not self.model_available:
+        """Start background health probing; never blocks on the network"""
+        logger.info("Initializing Ollama model...")
+        self.health.start()
+        if not self.health.reachable:
             logger.warning("Ollama model not available - using fallback responses")
     
-    def generate_response(self, prompt: str, context: str = "") -> str:
+    @metrics.timed('loan_model_generate_seconds')
+    def generate_response(self, prompt: str, context: PromptContext = "") -> str:
         """Generate response using the LLM or fallback"""
         try:
             if not self.model_available:
+                metrics.inc('loan_model_fallbacks_total')
                 return self._get_fallback_response(prompt)
             
-            full_prompt = f"""
-            You are Uniccon Loan Approval Bot, an AI assistant specialized in loan approval analysis and financial guidance.
-            
-            CONTEXT FOR ANALYSIS:
-            {context}
-            
-            USER QUERY: {prompt}
-            
-            Please provide a helpful, accurate response based on the loan data context and financial best practices.
-            Be professional but friendly in your tone.
-            Focus on loan approval criteria, credit scores, income requirements, debt-to-income ratios, and financial advice.
-            """
-            
-            response = ollama.generate(
-                model=self.model_name,
-                prompt=full_prompt,
-                options={
-                    'temperature': 0.1,
-                    'num_predict': 800,
-                }
-            )
-            return response['response'].strip()
+            return self._call_model(prompt, context)
             
         except Exception as e:
             logger.error(f"Error generating AI response: {e}")
+            metrics.inc('loan_model_fallbacks_total')
             return self._get_fallback_response(prompt)
     
-    def _get_fallback_response(self, prompt: str) -> str:
-        """Provide intelligent fallback responses when Ollama is unavailable"""
-        prompt_lower = prompt.lower()
-        
-        # Common loan-related queries with pre-defined responses
-        if any(word in prompt_lower for word in ['hello', 'hi', 'hey']):
-            return "Hello! I'm Uniccon Loan Approval Bot. I can help you with loan applications, approval criteria, and financial guidance. How can I assist you today?"
+    def _call_model(self, prompt: str, context: PromptContext) -> str:
+        """One cached model call; failures are recorded with the health monitor and raised"""
+        cache_key = make_cache_key(self.model_name, prompt, context_key(context), GENERATION_OPTIONS)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            metrics.inc('loan_model_cache_hits_total')
+            return cached
         
-        elif any(word in prompt_lower for word in ['loan approval', 'approval criteria']):
-            return """Based on our loan dataset analysis, key approval factors include:
-• **Credit Score**: Aim for 700+ for better chances
-• **Income**: Stable income demonstrating repayment ability  
-• **DTI Ratio**: Keep below 36% for optimal approval
-• **Employment**: Stable employment history
-• **Loan Amount**: Reasonable relative to income
-
-Would you like me to analyze a specific application?"""
-        
-        elif any(word in prompt_lower for word in ['credit score', 'credit']):
-            return """Credit scores significantly impact loan approval:
-• **Excellent (750+)**: High approval likelihood
-• **Good (700-749)**: Good approval chances
-• **Fair (650-699)**: May need stronger other factors
-• **Poor (<650)**: Consider credit improvement first
+        if not self.health.try_acquire():
+            raise CircuitOpenError("Ollama circuit open - half-open trial already in flight")
+        try:
+            response = self.client.chat(
+                model=self.model_name,
+                messages=self._build_messages(prompt, context),
+                options=GENERATION_OPTIONS,
+                keep_alive=self.keep_alive
+            )
+        except Exception:
+            self.health.record_failure()
+            raise
+        self.health.record_success()
+        self._record_timing(response)
+        answer = response['message']['content'].strip()
+        self.response_cache.put(cache_key, answer)
+        return answer
+    
+    def _build_messages(self, prompt: str, context: PromptContext) -> List[Dict[str, str]]:
+        """Chat messages sent to the model for a user query"""
+        return build_messages(prompt, context)
+    
+    def _record_timing(self, response):
+        """Metrics and last_timing from a final chat response"""
+        metrics.record_generation(response)
+        self.last_timing = metrics.generation_timing(response)
+        logger.info(f"Generation: {self.last_timing['prompt_tokens']} prompt tokens prefilled in "
+                    f"{self.last_timing['prefill_seconds']:.3f}s, {self.last_timing['generated_tokens']} tokens "
+                    f"decoded in {self.last_timing['decode_seconds']:.3f}s "
+                    f"(model load {self.last_timing['load_seconds']:.3f}s)")
+    
+    def generate_response_stream(self, prompt: str, context: PromptContext = "") -> Iterator[str]:
+        """Yield the response in chunks as the model produces them.
 
-Our data shows approved applicants average 720+ credit scores."""
+        Fallback and cached answers are yielded whole. If the model fails
+        before producing anything, the fallback response is yielded instead.
+        """
+        if not self.model_available:
+            metrics.inc('loan_model_fallbacks_total')
+            yield self._get_fallback_response(prompt)
+            return
         
-        elif any(word in prompt_lower for word in ['income', 'salary']):
-            return """Income requirements depend on loan amount:
-• Generally, your monthly loan payment should be ≤28% of gross monthly income
-• Total debt payments should be ≤36% of monthly income
-• Higher income relative to loan amount improves approval chances
-
-Our approved applicants average $85,000+ annual income."""
+        cache_key = make_cache_key(self.model_name, prompt, context_key(context), GENERATION_OPTIONS)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            metrics.inc('loan_model_cache_hits_total')
+            yield cached
+            return
         
-        elif any(word in prompt_lower for word in ['dti', 'debt to income']):
-            return """Debt-to-Income (DTI) Ratio Guidelines:
-• **Excellent**: <20% - Very high approval likelihood
-• **Good**: 20-35% - Good approval chances  
-• **High**: 36-49% - May need stronger application
-• **Very High**: 50%+ - Significant improvement needed
-
-Lower DTI ratios demonstrate better repayment capacity."""
+        if not self.health.try_acquire():
+            metrics.inc('loan_model_fallbacks_total')
+            yield self._get_fallback_response(prompt)
+            return
         
-        elif any(word in prompt_lower for word in ['business loan', 'business']):
-            return """Business loan considerations:
-• Business plan and financial projections
-• Time in business (2+ years preferred)
-• Business revenue and profitability
-• Personal credit score of business owner
-• Collateral availability
-
-Business loans in our dataset have a 42% approval rate."""
+        parts = []
+        start = time.perf_counter()
+        try:
+            for chunk in self.client.chat(
+                model=self.model_name,
+                messages=self._build_messages(prompt, context),
+                options=GENERATION_OPTIONS,
+                keep_alive=self.keep_alive,
+                stream=True
+            ):
+                text = chunk['message']['content']
+                if not parts:
+                    text = text.lstrip()
+                if text:
+                    if not parts:
+                        metrics.observe('loan_model_first_token_seconds', time.perf_counter() - start)
+                    parts.append(text)
+                    yield text
+                if chunk.get('done'):
+                    self._record_timing(chunk)
+        except Exception as e:
+            logger.error(f"Error streaming AI response: {e}")
+            self.health.record_failure()
+            if not parts:
+                metrics.inc('loan_model_fallbacks_total')
+                yield self._get_fallback_response(prompt)
+            return
         
-        elif any(word in prompt_lower for word in ['help', 'what can you do']):
-            return """I can help you with:
-• Loan approval criteria and requirements
-• Credit score analysis and improvement
-• Income and DTI ratio guidance  
-• Business and personal loan information
-• Application analysis and recommendations
-• Historical approval patterns from our dataset
-
-Try the 'Loan Application Analysis' section for personalized assessment!"""
+        metrics.observe('loan_model_generate_seconds', time.perf_counter() - start)
         
-        else:
-            return """I specialize in loan approval guidance and financial advice. 
-
-I can help you understand:
-• Loan approval criteria and requirements
-• Credit score impact on applications  
-• Income and debt-to-income ratios
-• Business vs personal loan differences
-• Application improvement strategies
-
-Try asking about specific loan topics, or use the 'Loan Application Analysis' section for a personalized assessment!"""
+        self.health.record_success()
+        answer = ''.join(parts).strip()
+        if answer:
+            self.response_cache.put(cache_key, answer)
+    
+    def _get_fallback_response(self, prompt: str) -> str:
+        """Provide intelligent fallback responses when Ollama is unavailable"""
+        return self.fallback.respond(prompt)
     
-    def analyze_loan_application(self, application_data: Dict) -> str:
-        """Analyze a specific loan application"""
+    @metrics.timed('loan_model_analyze_seconds')
+    def analyze_loan_application(self, application_data: Dict, context: str = "") -> str:
+        """Analyze a specific loan application, optionally with similar historical cases as context"""
+        return self.analyze_with_source(application_data, context)[0]
+    
+    def analyze_with_source(self, application_data: Dict, context: str = "") -> Tuple[str, str]:
+        """analyze_loan_application plus where the text came from: 'model' or 'fallback'"""
         try:
-            if not self.model_available:
-                return self._get_fallback_analysis(application_data)
-            
-            analysis_prompt = f"""
+            if self.model_available:
+                return self._call_model(self._build_analysis_prompt(application_data), context), 'model'
+        except Exception as e:
+            logger.error(f"Error in loan analysis: {e}")
+        metrics.inc('loan_model_fallbacks_total')
+        return self._get_fallback_analysis(application_data, context), 'fallback'
+    
+    def _build_analysis_prompt(self, application_data: Dict) -> str:
+        """Prompt asking the model to analyze one application"""
+        return f"""
             Analyze this loan application and provide recommendations:
             
             Application Details:
@@ -163,15 +233,10 @@ Try asking about specific loan topics, or use the 'Loan Application Analysis' se
             - Loan Purpose: {application_data.get('purpose', 'Not specified')}
             
             Provide specific analysis and improvement recommendations.
+            Compare the application with the similar historical applications in the context, if any.
             """
-            
-            return self.generate_response(analysis_prompt)
-            
-        except Exception as e:
-            logger.error(f"Error in loan analysis: {e}")
-            return self._get_fallback_analysis(application_data)
     
-    def _get_fallback_analysis(self, application_data: Dict) -> str:
+    def _get_fallback_analysis(self, application_data: Dict, context: str = "") -> str:
         """Fallback analysis when AI is unavailable"""
         income = application_data.get('income', 0)
         credit_score = application_data.get('credit_score', 0)
@@ -186,5 +251,7 @@ Try asking about specific loan topics, or use the 'Loan Application Analysis' se
         analysis += f"• DTI Ratio: {dti_ratio}% - {'Excellent' if dti_ratio < 20 else 'Good' if dti_ratio < 35 else 'Needs reduction'}\n"
         analysis += f"• Employment: {employment} - {'Positive factor' if employment == 'employed' else 'Consider securing employment'}\n\n"
         analysis += "Based on our dataset patterns, focus on improving weaker areas for better approval chances."
+        if context:
+            analysis += f"\n\n{context}"
         
         return analysis
\ No newline at end of file
@@ -0,0 +1,144 @@
+import logging
+import os
+import threading
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+import pandas as pd
+
+from modules.chat_engine import LoanApprovalChatEngine, build_data_context
+from modules.classifier import load_or_train_classifier
+from modules.data_loader import LoanDataLoader
+from modules.fallback import FallbackResponder
+from modules.ingest import DEFAULT_POLL_INTERVAL, DeltaWatcher
+from modules.neighbors import load_or_build_neighbor_index
+from modules.response_cache import ResponseCache
+from modules.retrieval import load_or_build_retrieval_index
+from modules.router import build_model_handler
+from modules.segment_cube import load_or_build_segment_cube
+
+logger = logging.getLogger(__name__)
+
+
+class SharedResources:
+    """Dataset, stats, data context, classifier, search indexes, segment cube and model handler shared by every session.
+
+    Everything here is read-only by convention: sessions must not mutate the
+    DataFrame in place. Per-session state (conversation history) lives on
+    the LoanApprovalChatEngine built by `create_session_engine`.
+
+    New applications are merged by `ingest` (or a `watch`ed delta source).
+    Each refreshed value is built first and then published with a single
+    attribute assignment, so requests in flight keep the values they
+    already read and are never blocked.
+    """
+
+    def __init__(self, data_file_path: str, model_name: str = "llama2"):
+        self.data_file_path = data_file_path
+        self.model_name = model_name
+        self.data_loader = LoanDataLoader(data_file_path)
+        self.df: Optional[pd.DataFrame] = None
+        self.stats: Optional[Mapping] = None
+        self.model_handler = None
+        self.classifier = None
+        self.neighbor_index = None
+        self.text_index = None
+        self.segment_cube = None
+        self.delta_watcher: Optional[DeltaWatcher] = None
+        self._ingest_lock = threading.Lock()
+
+        try:
+            self.df = self.data_loader.load_data()
+            self.stats = MappingProxyType(self.data_loader.get_approval_stats())
+            self.segment_cube = load_or_build_segment_cube(self.data_loader)
+            self.data_context = build_data_context(self.stats, self.segment_cube)
+            self.classifier = load_or_train_classifier(self.data_loader)
+            self.neighbor_index = load_or_build_neighbor_index(self.data_loader)
+            self.text_index = load_or_build_retrieval_index(self.data_loader)
+        except Exception as e:
+            logger.error(f"Error loading shared dataset: {e}")
+            self.data_context = "Data context unavailable due to loading error."
+
+        try:
+            # Set RESPONSE_CACHE_DB to share cached answers between processes
+            response_cache = ResponseCache(db_path=os.environ.get('RESPONSE_CACHE_DB'))
+            fallback = FallbackResponder.from_data(self.df, self.stats, self.segment_cube)
+            # Routes each request to the rules, LOAN_SMALL_MODEL (when set) or model_name
+            self.model_handler = build_model_handler(model_name, response_cache=response_cache, fallback=fallback)
+        except Exception as e:
+            logger.error(f"Error initializing shared model handler: {e}")
+
+        # Set LOAN_DELTA_PATH to follow new decisions (an append-only file or a delta directory)
+        delta_path = os.environ.get('LOAN_DELTA_PATH')
+        if delta_path and self.df is not None:
+            self.watch(delta_path)
+
+    def ingest(self, rows: pd.DataFrame) -> int:
+        """Merge newly decided applications and refresh stats, segment cube, fallback figures and data context.
+
+        Everything is built before anything is published, so rows that fail
+        validation or counting leave every shared value as it was.
+        """
+        with self._ingest_lock:
+            if rows.empty:
+                return 0
+            rows = self.data_loader.prepare_rows(rows)
+            df, partials = self.data_loader.stage_rows(rows)
+            stats = MappingProxyType(self.data_loader.stats_engine.stats_from_partials(partials))
+            cube = self.segment_cube.with_rows(rows) if self.segment_cube is not None else None
+            data_context = build_data_context(stats, cube)
+            fallback = FallbackResponder.from_data(df, stats, cube)
+
+            self.data_loader.commit_rows(df, partials)
+            self.segment_cube = cube
+            self.df = df
+            self.stats = stats
+            self.data_context = data_context
+            if self.model_handler is not None:
+                self.model_handler.fallback = fallback
+            logger.info(f"Ingested {len(rows)} applications; {stats['total_applications']} in total")
+            return len(rows)
+
+    def watch(self, path: str, interval: float = DEFAULT_POLL_INTERVAL) -> DeltaWatcher:
+        """Poll `path` for new applications in the background and ingest them"""
+        if self.delta_watcher is not None:
+            self.delta_watcher.stop()
+        # Following the dataset itself: everything up to the loaded size is already in df
+        start_offset = 0
+        if os.path.abspath(path) == os.path.abspath(self.data_file_path):
+            start_offset = (self.data_loader.fingerprint or {}).get('size', 0)
+        self.delta_watcher = DeltaWatcher(path, self.ingest, interval=interval, start_offset=start_offset).start()
+        return self.delta_watcher
+
+
+_resources: Dict[Tuple[str, str], SharedResources] = {}
+_lock = threading.Lock()
+
+
+def get_shared_resources(data_file_path: str = 'loan_data.csv', model_name: str = "llama2") -> SharedResources:
+    """Return the process-wide resources for a dataset/model, building them once"""
+    key = (data_file_path, model_name)
+    resources = _resources.get(key)
+    if resources is not None:
+        return resources
+
+    with _lock:
+        if key not in _resources:
+            logger.info(f"Building shared resources for {data_file_path} ({model_name})")
+            _resources[key] = SharedResources(data_file_path, model_name)
+        return _resources[key]
+
+
+def create_session_engine(data_file_path: str = 'loan_data.csv', model_name: str = "llama2") -> LoanApprovalChatEngine:
+    """Chat engine with its own history on top of the shared resources"""
+    shared = get_shared_resources(data_file_path, model_name)
+    return LoanApprovalChatEngine(data_file_path, model_name, shared=shared)
+
+
+def clear_shared_resources():
+    """Drop all shared resources (tests, or after replacing the dataset)"""
+    with _lock:
+        for resources in _resources.values():
+            if resources.delta_watcher is not None:
+                resources.delta_watcher.stop()
+        _resources.clear()
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_SECONDS = 6 * 60 * 60
+DISK_PRUNE_INTERVAL = 100
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Fold case, whitespace and trailing punctuation so near-identical questions share a key"""
+    return _WHITESPACE.sub(" ", prompt.lower()).strip().rstrip("?!. ")
+
+
+@lru_cache(maxsize=64)
+def _context_digest(context: str) -> str:
+    # The same data_context string is hashed on every call; str objects cache their own hash
+    return hashlib.sha256(context.encode('utf-8')).hexdigest()
+
+
+def make_cache_key(model_name: str, prompt: str, context: str = "", options: Optional[Dict[str, Any]] = None) -> str:
+    """Key on model, normalized prompt, context hash and generation options"""
+    payload = json.dumps({
+        'model': model_name,
+        'prompt': normalize_prompt(prompt),
+        'context': _context_digest(context),
+        'options': options or {},
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL cache of model responses with an optional shared SQLite store.
+
+    The in-memory LRU answers repeat questions within a process; the SQLite
+    file (WAL mode) lets several processes share answers. Since the context
+    hash is part of the key, changing `data_context` misses automatically.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._puts_since_prune = 0
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path: str):
+        try:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL)")
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache database unavailable, using memory only: {e}")
+            self._db = None
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                response, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return response
+                del self._entries[key]
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT response, expires_at FROM responses WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning(f"Response cache read failed: {e}")
+                    row = None
+                if row is not None:
+                    self._store(key, row[0], row[1])
+                    self.hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def _store(self, key: str, response: str, expires_at: float):
+        self._entries[key] = (response, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def put(self, key: str, response: str):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store(key, response, expires_at)
+            if self._db is None:
+                return
+            try:
+                self._db.execute("INSERT OR REPLACE INTO responses (key, response, expires_at) VALUES (?, ?, ?)",
+                                 (key, response, expires_at))
+                self._puts_since_prune += 1
+                if self._puts_since_prune >= DISK_PRUNE_INTERVAL:
+                    self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+                    self._puts_since_prune = 0
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Response cache write failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            if self._db is not None:
+                try:
+                    self._db.execute("DELETE FROM responses")
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Response cache clear failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'persistent': self._db is not None,
+            }
@@ -0,0 +1,201 @@
+"""TF-IDF retrieval over the free-text Text (loan purpose) column.
+
+Rows are grouped by purpose text; each distinct text becomes one document
+carrying its application count and approval count. The index is an
+inverted file (term -> postings of document ids and TF-IDF weights) stored
+as flat NumPy arrays in an .npz next to the CSV, so a query only touches
+the postings of its own terms.
+
+    python -m modules.retrieval build loan_data.csv
+    python -m modules.retrieval search "solar panels for my house"
+"""
+import argparse
+import json
+import logging
+import re
+import sys
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from modules.data_cache import SidecarArtifact, atomic_write
+from modules.data_loader import LoanDataLoader
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 1
+DEFAULT_RESULTS = 5
+MIN_SCORE = 0.1
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset("""
+a about an and are as at be buy by can cover do for from get have help i in into is it like loan loans
+make me money my need of on or our pay so some that the this to up us want we what with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS and len(token) > 1]
+
+
+class PurposeIndex:
+    """Inverted TF-IDF index over distinct loan purpose texts"""
+
+    def __init__(self, terms: np.ndarray, idf: np.ndarray, indptr: np.ndarray, doc_ids: np.ndarray,
+                 weights: np.ndarray, texts: np.ndarray, counts: np.ndarray, approved: np.ndarray,
+                 metadata: Optional[Dict] = None):
+        self.terms = terms
+        self.idf = idf
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.texts = texts
+        self.counts = counts
+        self.approved = approved
+        self.metadata = metadata or {}
+        self.vocabulary = {term: i for i, term in enumerate(terms.tolist())}
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, text_column: str = 'Text', metadata: Optional[Dict] = None) -> 'PurposeIndex':
+        grouped = (df['Approval'] == 'Approved').groupby(df[text_column], sort=True, observed=True)
+        documents = grouped.size()
+        approved = grouped.sum()
+        texts = np.array([str(text) for text in documents.index], dtype=str)
+
+        tokenized = [Counter(tokenize(text)) for text in texts]
+        terms = sorted({term for tokens in tokenized for term in tokens})
+        vocabulary = {term: i for i, term in enumerate(terms)}
+        document_frequency = np.zeros(len(terms))
+        for tokens in tokenized:
+            for term in tokens:
+                document_frequency[vocabulary[term]] += 1
+        idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1
+
+        # Postings per term, with l2-normalized tf-idf weights per document
+        postings: List[List] = [[] for _ in terms]
+        for doc_id, tokens in enumerate(tokenized):
+            weights = {vocabulary[term]: (1 + np.log(tf)) * idf[vocabulary[term]] for term, tf in tokens.items()}
+            norm = np.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for term_id, weight in weights.items():
+                postings[term_id].append((doc_id, weight / norm))
+
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(p) for p in postings])
+        doc_ids = np.array([doc_id for p in postings for doc_id, _ in p], dtype=np.int32)
+        weights = np.array([weight for p in postings for _, weight in p], dtype=np.float32)
+
+        metadata = dict(metadata or {})
+        metadata.update({'format_version': INDEX_FORMAT_VERSION, 'documents': len(texts), 'rows': len(df)})
+        return cls(np.array(terms), idf.astype(np.float32), indptr, doc_ids, weights, texts,
+                   documents.to_numpy(dtype=np.int64), approved.to_numpy(dtype=np.int64), metadata)
+
+    def search(self, query: str, k: int = DEFAULT_RESULTS, min_score: float = MIN_SCORE) -> Dict:
+        """Most relevant purposes for a query, with their approval statistics"""
+        query_terms = Counter(term for term in tokenize(query) if term in self.vocabulary)
+        if not query_terms:
+            return {'results': [], 'applications': 0, 'approval_rate': None}
+
+        term_ids = [self.vocabulary[term] for term in query_terms]
+        query_weights = np.array([(1 + np.log(query_terms[term])) * self.idf[self.vocabulary[term]] for term in query_terms])
+        query_weights /= np.linalg.norm(query_weights)
+
+        # Only the postings of the query terms are touched
+        docs = np.concatenate([self.doc_ids[self.indptr[t]:self.indptr[t + 1]] for t in term_ids])
+        weights = np.concatenate([self.weights[self.indptr[t]:self.indptr[t + 1]] * w
+                                  for t, w in zip(term_ids, query_weights)])
+        candidates, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights)
+
+        keep = scores >= min_score
+        candidates, scores = candidates[keep], scores[keep]
+        top = np.argsort(-scores, kind='stable')[:k]
+
+        results = []
+        for position in top:
+            doc = candidates[position]
+            count = int(self.counts[doc])
+            results.append({
+                'text': str(self.texts[doc]),
+                'score': float(scores[position]),
+                'applications': count,
+                'approved': int(self.approved[doc]),
+                'approval_rate': float(self.approved[doc]) / count * 100 if count else 0.0,
+            })
+
+        applications = sum(r['applications'] for r in results)
+        approved = sum(r['approved'] for r in results)
+        return {
+            'results': results,
+            'applications': applications,
+            'approval_rate': approved / applications * 100 if applications else None,
+        }
+
+    def save(self, path: str):
+        atomic_write(path, lambda tmp_path: np.savez(
+            tmp_path, terms=self.terms, idf=self.idf, indptr=self.indptr, doc_ids=self.doc_ids,
+            weights=self.weights, texts=self.texts, counts=self.counts, approved=self.approved,
+            metadata=np.array(json.dumps(self.metadata))))
+        logger.info(f"Purpose retrieval index saved to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> 'PurposeIndex':
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data['metadata']))
+            if metadata.get('format_version') != INDEX_FORMAT_VERSION:
+                raise ValueError(f"Unsupported retrieval index in {path}")
+            return cls(data['terms'], data['idf'], data['indptr'], data['doc_ids'], data['weights'],
+                       data['texts'], data['counts'], data['approved'], metadata)
+
+
+def format_retrieval_context(result: Dict) -> str:
+    """Summarize search results for the LLM prompt"""
+    if not result['results']:
+        return ""
+    lines = [f"RELEVANT HISTORICAL APPLICATIONS BY PURPOSE ({result['applications']} applications, "
+             f"{result['approval_rate']:.1f}% approved):"]
+    for r in result['results']:
+        lines.append(f"- \"{r['text']}\": {r['applications']} applications, {r['approval_rate']:.1f}% approved")
+    return "\n".join(lines)
+
+
+RETRIEVAL_INDEX = SidecarArtifact('retrieval index', 'retrieval.npz', PurposeIndex.load,
+                                  lambda data_loader, metadata: PurposeIndex.build(data_loader.df, metadata=metadata))
+
+
+def retrieval_index_path(data_file_path: str) -> str:
+    return RETRIEVAL_INDEX.path(data_file_path)
+
+
+def build_retrieval_index(data_loader: LoanDataLoader, save: bool = True) -> PurposeIndex:
+    return RETRIEVAL_INDEX.build(data_loader, save)
+
+
+def load_or_build_retrieval_index(data_loader: LoanDataLoader) -> Optional[PurposeIndex]:
+    return RETRIEVAL_INDEX.load_or_build(data_loader)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the loan purpose retrieval index")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build')
+    build_parser.add_argument('data', nargs='?', default='loan_data.csv')
+    search_parser = subparsers.add_parser('search')
+    search_parser.add_argument('query')
+    search_parser.add_argument('--data', default='loan_data.csv')
+    search_parser.add_argument('-k', type=int, default=DEFAULT_RESULTS)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        index = build_retrieval_index(LoanDataLoader(args.data))
+        print(f"Indexed {index.metadata['documents']:,} purposes from {index.metadata['rows']:,} rows "
+              f"-> {retrieval_index_path(args.data)}")
+        return
+
+    index = load_or_build_retrieval_index(LoanDataLoader(args.data))
+    print(format_retrieval_context(index.search(args.query, args.k)) or "No matching purposes")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,368 @@
+"""Latency-aware routing between the rule-based answers, a small model and a large model.
+
+Each request is classified by cost into a route. A route names the tier it
+tries first and a latency SLO for the whole answer:
+
+- instant: short greetings and help requests, answered by the rules
+- quick: short questions on a known topic, sent to the small model
+- chat: everything else, sent to the large model
+- analysis: application analyses, sent to the large model
+
+When the first tier has not answered after `hedge_after` seconds, the next
+cheaper model is asked as well and the first answer wins. A tier that fails
+hands over to the next one at once. At the SLO deadline the rules answer.
+
+A route whose tier is not configured (no small model) takes the SLO and
+hedge of the route that normally uses the serving tier. With a single model
+there is nothing cheaper to hand over to, so the router waits past the SLO
+for it, up to `model_timeout`, and only falls back to the rules when it
+fails. Attempts left running after a hedge or deadline count against
+`max_workers`; once it is reached, requests go to the rules instead of
+queueing behind them.
+Every decision and every tier's latency is kept for tuning (see
+`ModelRouter.summary`).
+
+    router = build_model_handler('llama2', small_model_name='llama3.2:1b')
+    router.generate_response("What credit score do I need?", context)
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+from modules import metrics
+from modules.fallback import FallbackResponder
+from modules.model_handler import LoanApprovalModel, PromptContext
+from modules.response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+RULES = 'rules'
+SMALL = 'small'
+LARGE = 'large'
+# Cheapest first
+TIERS = (RULES, SMALL, LARGE)
+
+# Prompts up to these lengths count as greetings / quick questions
+INSTANT_MAX_WORDS = 8
+QUICK_MAX_WORDS = 20
+INSTANT_INTENTS = ('greeting', 'help')
+
+# Time kept back from the SLO for the rules to answer once the models have run out of it
+RULES_RESERVE_SECONDS = 0.005
+DEFAULT_ROUTER_WORKERS = 16
+# How long a lone model is waited for past the SLO before the rules answer
+DEFAULT_MODEL_TIMEOUT = 300.0
+DECISION_HISTORY = 1000
+
+
+class Route(NamedTuple):
+    """Where one kind of request goes first and how long its answer may take"""
+    name: str
+    tier: str
+    slo_seconds: float
+    # Also ask the next cheaper model once the first has run this long; None waits for the SLO
+    hedge_after: Optional[float] = None
+
+
+DEFAULT_ROUTES: Dict[str, Route] = {route.name: route for route in (
+    Route('instant', RULES, 0.1),
+    Route('quick', SMALL, 5.0),
+    Route('chat', LARGE, 30.0, hedge_after=10.0),
+    Route('analysis', LARGE, 60.0, hedge_after=20.0),
+)}
+
+
+class RoutingDecision(NamedTuple):
+    """How one request was served"""
+    route: str
+    planned: str
+    served: str
+    hedged: bool
+    seconds: float
+    slo_seconds: float
+    error: Optional[str] = None
+
+    @property
+    def slo_met(self) -> bool:
+        return self.seconds <= self.slo_seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = self._asdict()
+        record['slo_met'] = self.slo_met
+        return record
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class ModelRouter:
+    """Routes each request to the rules, a small model or a large model within a per-route latency SLO.
+
+    Offers the LoanApprovalModel methods the chat engine and batch analysis
+    use, so it can stand in as their `model_handler`. Slow attempts that
+    lose a hedge or pass their deadline run on in the background, up to
+    `max_workers` at a time. Their answers still land in the response cache.
+    """
+
+    def __init__(self, large: LoanApprovalModel, small: Optional[LoanApprovalModel] = None,
+                 routes: Mapping[str, Route] = DEFAULT_ROUTES, max_workers: int = DEFAULT_ROUTER_WORKERS,
+                 history: int = DECISION_HISTORY, decision_log: Optional[str] = None,
+                 model_timeout: float = DEFAULT_MODEL_TIMEOUT):
+        self.models: Dict[str, LoanApprovalModel] = {LARGE: large}
+        if small is not None:
+            self.models[SMALL] = small
+        self.routes = dict(routes)
+        self.max_workers = max_workers
+        self.model_timeout = model_timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='model-router')
+        # Model attempts submitted and not finished, abandoned ones included
+        self._running = 0
+        self.decisions: Deque[RoutingDecision] = deque(maxlen=history)
+        self.tier_latencies: Dict[str, Deque[float]] = {tier: deque(maxlen=history) for tier in TIERS}
+        # Optional JSONL file every decision is appended to, for offline tuning
+        self.decision_log = decision_log
+        # Load / prefill / decode breakdown of the latest answer a model served
+        self.last_timing: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    # LoanApprovalModel interface, answered by the large model
+    @property
+    def model_name(self) -> str:
+        return self.models[LARGE].model_name
+
+    @property
+    def health(self):
+        return self.models[LARGE].health
+
+    @property
+    def response_cache(self) -> ResponseCache:
+        return self.models[LARGE].response_cache
+
+    @property
+    def model_available(self) -> bool:
+        return any(model.model_available for model in self.models.values())
+
+    @property
+    def fallback(self) -> FallbackResponder:
+        return self.models[LARGE].fallback
+
+    @fallback.setter
+    def fallback(self, responder: FallbackResponder):
+        for model in self.models.values():
+            model.fallback = responder
+
+    def _build_messages(self, prompt: str, context: PromptContext) -> List[Dict[str, str]]:
+        return self.models[LARGE]._build_messages(prompt, context)
+
+    def _get_fallback_response(self, prompt: str) -> str:
+        return self.models[LARGE]._get_fallback_response(prompt)
+
+    def _get_fallback_analysis(self, application_data: Dict, context: str = "") -> str:
+        return self.models[LARGE]._get_fallback_analysis(application_data, context)
+
+    def classify(self, prompt: str) -> Route:
+        """Route for a chat prompt, by length and fallback intent"""
+        words = len(prompt.split())
+        intent = self.fallback.match(prompt)
+        if intent in INSTANT_INTENTS and words <= INSTANT_MAX_WORDS:
+            return self.routes['instant']
+        if intent is not None and words <= QUICK_MAX_WORDS:
+            return self.routes['quick']
+        return self.routes['chat']
+
+    def _plan(self, route: Route) -> Tuple[Route, str, List[str]]:
+        """The route as served, the tier it starts on (large when no small model is configured)
+        and the available model tiers to try, first choice first, then cheaper ones.
+
+        A route moved to another tier takes the SLO and hedge of the route
+        that normally starts there, so a quick question sent to the large
+        model is not held to the small model's deadline.
+        """
+        planned = route.tier if route.tier == RULES or route.tier in self.models else LARGE
+        if planned == RULES:
+            return route, planned, []
+        if planned != route.tier:
+            serving = next((r for r in self.routes.values() if r.tier == planned), None)
+            if serving is not None:
+                route = route._replace(slo_seconds=serving.slo_seconds, hedge_after=serving.hedge_after)
+        cheaper = [tier for tier in reversed(TIERS[1:TIERS.index(planned)]) if tier in self.models]
+        return route, planned, [tier for tier in [planned] + cheaper if self.models[tier].model_available]
+
+    def _submit(self, tier: str, call: Callable[[LoanApprovalModel], str]) -> Optional[Future]:
+        """Start a model attempt, or None when `max_workers` attempts are still running"""
+        with self._lock:
+            if self._running >= self.max_workers:
+                return None
+            self._running += 1
+        start = time.perf_counter()
+        future = self.executor.submit(call, self.models[tier])
+
+        def record(done: Future):
+            with self._lock:
+                self._running -= 1
+            if not done.cancelled() and done.exception() is None:
+                self._record_latency(tier, time.perf_counter() - start)
+
+        future.add_done_callback(record)
+        return future
+
+    def _record_latency(self, tier: str, seconds: float):
+        with self._lock:
+            self.tier_latencies[tier].append(seconds)
+        metrics.observe(f'loan_router_{tier}_seconds', seconds)
+
+    def _serve(self, route: Route, call: Callable[[LoanApprovalModel], str],
+               rules: Callable[[], str]) -> Tuple[str, str]:
+        """(answer, tier that produced it) within the route's SLO"""
+        start = time.perf_counter()
+        route, planned, tiers = self._plan(route)
+        deadline = start + route.slo_seconds - RULES_RESERVE_SECONDS
+        if len(self.models) == 1:
+            # Nothing cheaper to hand over to: a slow answer from the only model beats the rules
+            deadline = max(deadline, start + self.model_timeout)
+        hedge_at = start + route.hedge_after if route.hedge_after is not None else None
+        pending: Dict[Future, str] = {}
+        hedged = False
+        error = None
+
+        def submit_next() -> bool:
+            nonlocal error
+            while tiers:
+                tier = tiers.pop(0)
+                future = self._submit(tier, call)
+                if future is not None:
+                    pending[future] = tier
+                    return True
+                logger.warning(f"Router busy: {self.max_workers} model attempts still running, skipping {tier}")
+                error = f"{tier}: router busy"
+            return False
+
+        submit_next()
+        while pending:
+            wake = min(deadline, hedge_at) if tiers and hedge_at is not None else deadline
+            done, _ = wait(pending, timeout=max(wake - time.perf_counter(), 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                tier = pending.pop(future)
+                try:
+                    answer = future.result()
+                except Exception as e:
+                    logger.warning(f"{tier} model failed on a {route.name} request: {e}")
+                    error = f"{tier}: {e}"
+                    continue
+                for other in pending:
+                    other.cancel()
+                return answer, self._decide(route, planned, tier, hedged, start, error)
+            now = time.perf_counter()
+            if now >= deadline:
+                error = error or f"no answer within {deadline - start + RULES_RESERVE_SECONDS:g}s"
+                break
+            if tiers and (not pending or (hedge_at is not None and now >= hedge_at)):
+                # Hedge a slow tier, or cut over from a failed one
+                slow = bool(pending)
+                if submit_next() and slow:
+                    hedged = True
+                hedge_at = None
+
+        for future in pending:
+            future.cancel()
+        rules_start = time.perf_counter()
+        answer = rules()
+        self._record_latency(RULES, time.perf_counter() - rules_start)
+        if planned != RULES:
+            metrics.inc('loan_model_fallbacks_total')
+        return answer, self._decide(route, planned, RULES, hedged, start, error)
+
+    def _decide(self, route: Route, planned: str, served: str, hedged: bool, start: float,
+                error: Optional[str]) -> str:
+        decision = RoutingDecision(route.name, planned, served, hedged, time.perf_counter() - start,
+                                   route.slo_seconds, error)
+        if served != RULES:
+            self.last_timing = self.models[served].last_timing
+        with self._lock:
+            self.decisions.append(decision)
+            if self.decision_log:
+                with open(self.decision_log, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(decision.to_dict()) + "\n")
+        if hedged:
+            metrics.inc('loan_router_hedges_total')
+        if served != planned:
+            metrics.inc('loan_router_cutovers_total')
+        if not decision.slo_met:
+            metrics.inc('loan_router_slo_misses_total')
+        logger.debug(f"Routed {route.name} request: {planned} -> {served} in {decision.seconds:.3f}s")
+        return served
+
+    @metrics.timed('loan_model_generate_seconds')
+    def generate_response(self, prompt: str, context: PromptContext = "") -> str:
+        """Answer a chat prompt on the tier its route calls for"""
+        return self._serve(self.classify(prompt),
+                           lambda model: model._call_model(prompt, context),
+                           lambda: self._get_fallback_response(prompt))[0]
+
+    def generate_response_stream(self, prompt: str, context: PromptContext = "") -> Iterator[str]:
+        """Stream from the route's first available tier; streams are not hedged, since
+        the first chunk arrives long before the SLO"""
+        route, planned, tiers = self._plan(self.classify(prompt))
+        served = tiers[0] if tiers else RULES
+        start = time.perf_counter()
+        try:
+            if served == RULES:
+                yield self._get_fallback_response(prompt)
+            else:
+                yield from self.models[served].generate_response_stream(prompt, context)
+        finally:
+            self._record_latency(served, time.perf_counter() - start)
+            self._decide(route, planned, served, False, start, None)
+
+    @metrics.timed('loan_model_analyze_seconds')
+    def analyze_loan_application(self, application_data: Dict, context: str = "") -> str:
+        return self.analyze_with_source(application_data, context)[0]
+
+    def analyze_with_source(self, application_data: Dict, context: str = "") -> Tuple[str, str]:
+        """Analysis on the analysis route, plus 'model' or 'fallback' like LoanApprovalModel"""
+        answer, tier = self._serve(
+            self.routes['analysis'],
+            lambda model: model._call_model(model._build_analysis_prompt(application_data), context),
+            lambda: self._get_fallback_analysis(application_data, context))
+        return answer, 'fallback' if tier == RULES else 'model'
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-route SLO attainment and tier mix, and per-tier latency, over the recent decisions"""
+        with self._lock:
+            decisions = list(self.decisions)
+            latencies = {tier: list(values) for tier, values in self.tier_latencies.items()}
+        routes: Dict[str, Dict[str, Any]] = {}
+        for decision in decisions:
+            entry = routes.setdefault(decision.route, {'requests': 0, 'slo_met': 0, 'hedged': 0, 'served': {}})
+            entry['requests'] += 1
+            entry['slo_met'] += decision.slo_met
+            entry['hedged'] += decision.hedged
+            entry['served'][decision.served] = entry['served'].get(decision.served, 0) + 1
+        for entry in routes.values():
+            entry['slo_attainment'] = entry['slo_met'] / entry['requests']
+        tiers = {tier: {'count': len(values), 'p50': _percentile(values, 0.5), 'p95': _percentile(values, 0.95)}
+                 for tier, values in latencies.items() if values}
+        return {'routes': routes, 'tiers': tiers}
+
+
+def build_model_handler(model_name: str = "llama2", small_model_name: Optional[str] = None,
+                        response_cache: Optional[ResponseCache] = None, host: Optional[str] = None,
+                        fallback: Optional[FallbackResponder] = None) -> ModelRouter:
+    """Router over `model_name` plus, when given or set in LOAN_SMALL_MODEL, a small fast model"""
+    small_model_name = small_model_name or os.environ.get('LOAN_SMALL_MODEL')
+    response_cache = response_cache if response_cache is not None else ResponseCache()
+    large = LoanApprovalModel(model_name, response_cache=response_cache, host=host, fallback=fallback)
+    small = None
+    if small_model_name:
+        small = LoanApprovalModel(small_model_name, response_cache=response_cache, host=host,
+                                  health_monitor=large.health, fallback=fallback)
+    return ModelRouter(large, small, decision_log=os.environ.get('LOAN_ROUTER_LOG'))
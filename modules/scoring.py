@@ -0,0 +1,213 @@
+"""Rule-based approval score, per application and vectorized over batches.
+
+Both paths read the same rule tables, so the batch scorer returns exactly
+what LoanApprovalChatEngine.get_approval_analysis computes row by row.
+
+Command-line batch scoring:
+
+    python -m modules.scoring applications.csv scored.csv --chunksize 200000 --workers 4
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Mapping, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# (threshold, points, factor) checked in order; the first match wins
+INCOME_RULES = [
+    (75000, 25, "Good income level"),
+    (50000, 15, "Moderate income level"),
+]
+INCOME_DEFAULT = "Low income level - consider increasing income"
+
+CREDIT_SCORE_RULES = [
+    (750, 30, "Excellent credit score"),
+    (700, 20, "Good credit score"),
+    (650, 10, "Fair credit score - consider improvement"),
+]
+CREDIT_SCORE_DEFAULT = "Poor credit score - significant improvement needed"
+
+DTI_RULES = [
+    (20, 25, "Excellent DTI ratio"),
+    (35, 15, "Good DTI ratio"),
+    (50, 5, "High DTI ratio - consider reduction"),
+]
+DTI_DEFAULT = "Very high DTI ratio - significant reduction needed"
+
+EMPLOYED_POINTS = 20
+EMPLOYED_FACTOR = "Employed - positive factor"
+UNEMPLOYED_FACTOR = "Unemployed - consider securing employment"
+
+RECOMMENDATION_BANDS = [
+    (80, "Strong candidate for loan approval"),
+    (60, "Good candidate, minor improvements possible"),
+    (40, "Moderate candidate, significant improvements needed"),
+]
+RECOMMENDATION_DEFAULT = "Weak candidate, major improvements required"
+
+# Batch inputs may use the form keys or the loan_data.csv column names
+COLUMN_ALIASES = {
+    'income': ('income', 'Income'),
+    'credit_score': ('credit_score', 'Credit_Score'),
+    'dti_ratio': ('dti_ratio', 'DTI_Ratio'),
+    'employment_status': ('employment_status', 'Employment_Status'),
+}
+
+FACTOR_COLUMNS = ['income_factor', 'credit_factor', 'dti_factor', 'employment_factor']
+
+
+def _score_above(value, rules, default) -> Tuple[int, str]:
+    for threshold, points, factor in rules:
+        if value > threshold:
+            return points, factor
+    return 0, default
+
+
+def _score_below(value, rules, default) -> Tuple[int, str]:
+    for threshold, points, factor in rules:
+        if value < threshold:
+            return points, factor
+    return 0, default
+
+
+def score_application(user_data: Dict[str, Any]) -> Tuple[int, List[str]]:
+    """Score one application; returns the raw score and its factors"""
+    income_points, income_factor = _score_above(user_data.get('income', 0), INCOME_RULES, INCOME_DEFAULT)
+    credit_points, credit_factor = _score_above(user_data.get('credit_score', 0), CREDIT_SCORE_RULES, CREDIT_SCORE_DEFAULT)
+    dti_points, dti_factor = _score_below(user_data.get('dti_ratio', 0), DTI_RULES, DTI_DEFAULT)
+
+    if user_data.get('employment_status', '').lower() == 'employed':
+        employment_points, employment_factor = EMPLOYED_POINTS, EMPLOYED_FACTOR
+    else:
+        employment_points, employment_factor = 0, UNEMPLOYED_FACTOR
+
+    score = income_points + credit_points + dti_points + employment_points
+    return score, [income_factor, credit_factor, dti_factor, employment_factor]
+
+
+def get_recommendation(score: int) -> str:
+    """Recommendation band for a score"""
+    for threshold, recommendation in RECOMMENDATION_BANDS:
+        if score >= threshold:
+            return recommendation
+    return RECOMMENDATION_DEFAULT
+
+
+def _resolve_column(data: Union[pd.DataFrame, Mapping[str, Any]], name: str, default, n_rows: int) -> np.ndarray:
+    for alias in COLUMN_ALIASES[name]:
+        if alias in data:
+            return np.asarray(data[alias])
+    return np.full(n_rows, default)
+
+
+def _select_rules(values: np.ndarray, rules, default, above: bool) -> Tuple[np.ndarray, pd.Categorical]:
+    """Vectorized first-match over a rule table: points and factor per row"""
+    values = values.astype(np.float64, copy=False)
+    conditions = [values > threshold if above else values < threshold for threshold, _, _ in rules]
+    points = np.select(conditions, [points for _, points, _ in rules], default=0)
+    codes = np.select(conditions, list(range(len(rules))), default=len(rules))
+    labels = [factor for _, _, factor in rules] + [default]
+    return points, pd.Categorical.from_codes(codes, categories=labels)
+
+
+def score_applications(data: Union[pd.DataFrame, Mapping[str, Any]]) -> pd.DataFrame:
+    """Score a batch of applications in vectorized form.
+
+    `data` is a DataFrame or a mapping of equal-length arrays keyed by the
+    form names (income, credit_score, dti_ratio, employment_status) or the
+    CSV column names. Returns one row per application with the capped score,
+    the four factor texts and the recommendation band.
+    """
+    n_rows = len(data) if isinstance(data, pd.DataFrame) else len(np.asarray(next(iter(data.values()))))
+
+    income = _resolve_column(data, 'income', 0, n_rows)
+    credit_score = _resolve_column(data, 'credit_score', 0, n_rows)
+    dti_ratio = _resolve_column(data, 'dti_ratio', 0, n_rows)
+    employment = _resolve_column(data, 'employment_status', '', n_rows)
+
+    income_points, income_factor = _select_rules(income, INCOME_RULES, INCOME_DEFAULT, above=True)
+    credit_points, credit_factor = _select_rules(credit_score, CREDIT_SCORE_RULES, CREDIT_SCORE_DEFAULT, above=True)
+    dti_points, dti_factor = _select_rules(dti_ratio, DTI_RULES, DTI_DEFAULT, above=False)
+
+    # Lowercase each distinct status once rather than every row
+    codes, statuses = pd.factorize(employment)
+    employed_status = np.array([isinstance(status, str) and status.lower() == 'employed' for status in statuses] + [False])
+    employed = employed_status[codes]
+    employment_points = np.where(employed, EMPLOYED_POINTS, 0)
+    employment_factor = pd.Categorical.from_codes(employed.astype(np.int8) ^ 1,
+                                                  categories=[EMPLOYED_FACTOR, UNEMPLOYED_FACTOR])
+
+    score = income_points + credit_points + dti_points + employment_points
+    band_conditions = [score >= threshold for threshold, _ in RECOMMENDATION_BANDS]
+    band_codes = np.select(band_conditions, list(range(len(RECOMMENDATION_BANDS))), default=len(RECOMMENDATION_BANDS))
+    recommendation = pd.Categorical.from_codes(
+        band_codes, categories=[label for _, label in RECOMMENDATION_BANDS] + [RECOMMENDATION_DEFAULT])
+
+    index = data.index if isinstance(data, pd.DataFrame) else None
+    return pd.DataFrame({
+        'score': np.minimum(score, 100),
+        'income_factor': income_factor,
+        'credit_factor': credit_factor,
+        'dti_factor': dti_factor,
+        'employment_factor': employment_factor,
+        'recommendation': recommendation,
+    }, index=index)
+
+
+def _score_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    return pd.concat([chunk, score_applications(chunk)], axis=1)
+
+
+def score_csv(input_path: str, output_path: str, chunksize: int = 200_000, workers: int = 1) -> int:
+    """Score a CSV in chunks, optionally across processes; returns rows written"""
+    rows = 0
+    first_chunk = True
+
+    def write(scored: pd.DataFrame):
+        nonlocal rows, first_chunk
+        scored.to_csv(output_path, mode='w' if first_chunk else 'a', header=first_chunk, index=False)
+        first_chunk = False
+        rows += len(scored)
+
+    chunks = pd.read_csv(input_path, chunksize=chunksize)
+    if workers <= 1:
+        for chunk in chunks:
+            write(_score_chunk(chunk))
+        return rows
+
+    # Keep a bounded window of chunks in flight so memory stays flat and output stays ordered
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_score_chunk, chunk))
+            if len(pending) >= workers * 2:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score loan applications with the rule-based approval score")
+    parser.add_argument('input', help="CSV with Income, Credit_Score, DTI_Ratio, Employment_Status columns")
+    parser.add_argument('output', help="CSV to write the input columns plus scores to")
+    parser.add_argument('--chunksize', type=int, default=200_000)
+    parser.add_argument('--workers', type=int, default=1, help=f"processes to use (this machine has {os.cpu_count()})")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    rows = score_csv(args.input, args.output, args.chunksize, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows:,} applications in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+"""Precomputed approval-rate cube over applicant segments.
+
+Applications are counted once per cell of credit score group x DTI bucket x
+income decile x employment status x loan-to-income bucket, and the counts
+and approvals are saved as dense arrays in an .npz next to the CSV. A
+segment question ("approval rate for 670-740 credit with DTI under 35%")
+is then a sum over a handful of cells instead of a scan of every row.
+
+Rows with a missing number or an unrecognised employment status have no
+cell and are not counted, so cube totals can be lower than the dataset's
+row count; metadata['unassigned'] records how many rows were left out.
+
+    python -m modules.segment_cube build loan_data.csv
+    python -m modules.segment_cube query --credit-score 670:740 --dti-ratio :35
+"""
+import argparse
+import json
+import logging
+import sys
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from modules.data_cache import SidecarArtifact, atomic_write
+from modules.data_loader import LoanDataLoader
+from modules.features import CREDIT_SCORE_BINS, CREDIT_SCORE_LABELS
+
+logger = logging.getLogger(__name__)
+
+CUBE_FORMAT_VERSION = 1
+INCOME_QUANTILES = 10
+# Segments smaller than this are rolled up before their rate is quoted
+MIN_SEGMENT_APPLICATIONS = 30
+# Dimensions dropped, in order, when an applicant's own cell is too small
+ROLLUP_ORDER = ('loan_to_income', 'income', 'dti_ratio', 'employment_status')
+
+DTI_BINS = [0, 20, 35, 43, 50, np.inf]
+DTI_LABELS = ['<20%', '20-35%', '35-43%', '43-50%', '50%+']
+LOAN_TO_INCOME_BINS = [0, 0.1, 0.2, 0.3, 0.5, np.inf]
+LOAN_TO_INCOME_LABELS = ['<0.1', '0.1-0.2', '0.2-0.3', '0.3-0.5', '0.5+']
+EMPLOYMENT_LABELS = ['employed', 'unemployed']
+
+
+class Dimension(NamedTuple):
+    """One cube axis: numeric bins (`edges`) or categories (`edges` is None)"""
+    name: str
+    column: str
+    labels: Tuple[str, ...]
+    edges: Optional[Tuple[float, ...]] = None
+    # Credit score groups follow pd.cut, (a, b]; the other bins are [a, b)
+    right_closed: bool = False
+
+    def assign(self, values) -> np.ndarray:
+        """Bucket index per value; -1 for unknown categories and missing values"""
+        if self.edges is None:
+            lowered = pd.Series(values, dtype=object).astype(str).str.lower()
+            return pd.Index(self.labels).get_indexer(lowered).astype(np.int64)
+        numbers = np.asarray(values, dtype=np.float64)
+        inner = np.asarray(self.edges[1:-1], dtype=np.float64)
+        side = 'left' if self.right_closed else 'right'
+        indices = np.searchsorted(inner, numbers, side=side).astype(np.int64)
+        indices[np.isnan(numbers)] = -1
+        return indices
+
+    def value_range(self, low: Optional[float], high: Optional[float]) -> Tuple[np.ndarray, bool]:
+        """Buckets covering low..high, and whether they cover exactly that range"""
+        if self.edges is None:
+            raise ValueError(f"{self.name} is categorical; select it by label")
+        edges = np.asarray(self.edges, dtype=np.float64)
+        start = 0 if low is None else max(int(np.searchsorted(edges, low, side='right')) - 1, 0)
+        stop = len(self.labels) if high is None else min(int(np.searchsorted(edges, high, side='left')), len(self.labels))
+        exact = (low is None or low in self.edges) and (high is None or high in self.edges)
+        return np.arange(start, max(start, stop)), exact
+
+    def describe(self, indices: Sequence[int]) -> str:
+        if len(indices) == len(self.labels):
+            return "any"
+        return ", ".join(self.labels[i] for i in indices)
+
+
+def _income_dimension(income: pd.Series) -> Dimension:
+    edges = np.unique(np.quantile(income.to_numpy(dtype=np.float64), np.linspace(0, 1, INCOME_QUANTILES + 1)))
+    if len(edges) < 2:
+        edges = np.array([edges[0], edges[0]])
+    labels = tuple(f"${low:,.0f}-${high:,.0f}" for low, high in zip(edges[:-1], edges[1:]))
+    return Dimension('income', 'Income', labels, tuple(float(e) for e in edges))
+
+
+def build_dimensions(df: pd.DataFrame) -> Tuple[Dimension, ...]:
+    """Cube axes; income deciles come from the data, the other bins are fixed"""
+    return (
+        Dimension('credit_score', 'Credit_Score', tuple(CREDIT_SCORE_LABELS),
+                  tuple(float(e) for e in CREDIT_SCORE_BINS), right_closed=True),
+        Dimension('dti_ratio', 'DTI_Ratio', tuple(DTI_LABELS), tuple(DTI_BINS)),
+        _income_dimension(df['Income']),
+        Dimension('employment_status', 'Employment_Status', tuple(EMPLOYMENT_LABELS)),
+        Dimension('loan_to_income', 'Loan_to_Income_Ratio', tuple(LOAN_TO_INCOME_LABELS), tuple(LOAN_TO_INCOME_BINS)),
+    )
+
+
+def _loan_to_income(loan_amount, income):
+    # Same definition as the derived Loan_to_Income_Ratio column
+    return np.asarray(loan_amount, dtype=np.float64) / (np.asarray(income, dtype=np.float64) + 1)
+
+
+def _cell_counts(df: pd.DataFrame, dimensions: Sequence[Dimension]) -> Tuple[np.ndarray, np.ndarray]:
+    """Applications and approvals per cell, in one pass over the rows"""
+    shape = tuple(len(dim.labels) for dim in dimensions)
+    columns = {
+        'Credit_Score': df['Credit_Score'],
+        'DTI_Ratio': df['DTI_Ratio'],
+        'Income': df['Income'],
+        'Employment_Status': df['Employment_Status'],
+        'Loan_to_Income_Ratio': _loan_to_income(df['Loan_Amount'], df['Income']),
+    }
+    indices = [dim.assign(columns[dim.column]) for dim in dimensions]
+    known = np.logical_and.reduce([index >= 0 for index in indices])
+    flat = np.ravel_multi_index([index[known] for index in indices], shape)
+    approved = (df['Approval'] == 'Approved').to_numpy()[known]
+
+    size = int(np.prod(shape))
+    counts = np.bincount(flat, minlength=size).reshape(shape)
+    approvals = np.bincount(flat[approved], minlength=size).reshape(shape)
+    return counts.astype(np.int64), approvals.astype(np.int64)
+
+
+class SegmentCube:
+    """Application and approval counts per segment cell, with O(cells) lookups"""
+
+    def __init__(self, dimensions: Sequence[Dimension], counts: np.ndarray, approved: np.ndarray,
+                 metadata: Optional[Dict] = None):
+        self.dimensions = tuple(dimensions)
+        self.counts = counts
+        self.approved = approved
+        self.metadata = metadata or {}
+        self._axes = {dim.name: axis for axis, dim in enumerate(self.dimensions)}
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, metadata: Optional[Dict] = None) -> 'SegmentCube':
+        dimensions = build_dimensions(df)
+        counts, approvals = _cell_counts(df, dimensions)
+        metadata = dict(metadata or {})
+        metadata.update({'format_version': CUBE_FORMAT_VERSION, 'rows': len(df), 'cells': counts.size,
+                         'unassigned': len(df) - int(counts.sum())})
+        return cls(dimensions, counts, approvals, metadata)
+
+    def with_rows(self, df: pd.DataFrame) -> 'SegmentCube':
+        """Copy of the cube with new applications counted in (income deciles keep their build-time edges)"""
+        counts, approvals = _cell_counts(df, self.dimensions)
+        metadata = dict(self.metadata)
+        metadata['rows'] = metadata.get('rows', 0) + len(df)
+        metadata['unassigned'] = metadata.get('unassigned', 0) + len(df) - int(counts.sum())
+        return SegmentCube(self.dimensions, self.counts + counts, self.approved + approvals, metadata)
+
+    def dimension(self, name: str) -> Dimension:
+        if name not in self._axes:
+            raise KeyError(f"Unknown segment dimension {name!r}; expected one of {list(self._axes)}")
+        return self.dimensions[self._axes[name]]
+
+    def _select(self, dim: Dimension, selector) -> Tuple[np.ndarray, bool]:
+        """Bucket indices for a selector: label, bucket index, (low, high) value range or a list of those"""
+        if selector is None:
+            return np.arange(len(dim.labels)), True
+        if isinstance(selector, tuple):
+            return dim.value_range(*selector)
+        if isinstance(selector, (str, int, np.integer)):
+            selector = [selector]
+        indices = []
+        lowered = [label.lower() for label in dim.labels]
+        for item in selector:
+            if isinstance(item, (int, np.integer)):
+                if not 0 <= item < len(dim.labels):
+                    raise IndexError(f"{dim.name} has no bucket {item}")
+                indices.append(int(item))
+            elif str(item).lower() in lowered:
+                indices.append(lowered.index(str(item).lower()))
+            else:
+                raise KeyError(f"{dim.name} has no bucket {item!r}; expected one of {list(dim.labels)}")
+        return np.array(sorted(set(indices)), dtype=np.int64), True
+
+    def query(self, **selection) -> Dict[str, Any]:
+        """Applications and approval rate of a segment.
+
+        Each keyword names a dimension and selects buckets by label, index,
+        list, or a (low, high) value range; omitted dimensions are summed over.
+        `exact` is False when a value range does not fall on bucket edges.
+        """
+        unknown = set(selection) - set(self._axes)
+        if unknown:
+            raise KeyError(f"Unknown segment dimensions {sorted(unknown)}; expected {list(self._axes)}")
+        indices, exact = [], True
+        for dim in self.dimensions:
+            index, dim_exact = self._select(dim, selection.get(dim.name))
+            indices.append(index)
+            exact = exact and dim_exact
+        cells = np.ix_(*indices)
+        applications = int(self.counts[cells].sum())
+        approved = int(self.approved[cells].sum())
+        return {
+            'applications': applications,
+            'approved': approved,
+            'approval_rate': approved / applications * 100 if applications else None,
+            'exact': exact,
+            'segment': {dim.name: dim.describe(index) for dim, index in zip(self.dimensions, indices)
+                        if len(index) != len(dim.labels)},
+        }
+
+    def cell_for(self, application: Dict[str, Any]) -> Dict[str, int]:
+        """Bucket index per dimension for an application dict (income, credit_score, ...)"""
+        income = float(application.get('income', 0))
+        values = {
+            'credit_score': float(application.get('credit_score', 0)),
+            'dti_ratio': float(application.get('dti_ratio', 0)),
+            'income': income,
+            'employment_status': str(application.get('employment_status', '')),
+            'loan_to_income': float(_loan_to_income(application.get('loan_amount', 0), income)),
+        }
+        cell = {}
+        for dim in self.dimensions:
+            index = int(dim.assign([values[dim.name]])[0])
+            if index >= 0:
+                cell[dim.name] = index
+        return cell
+
+    def segment_for_application(self, application: Dict[str, Any],
+                                min_applications: int = MIN_SEGMENT_APPLICATIONS) -> Dict[str, Any]:
+        """Approval rate of applicants in the same cell, rolled up until the segment is large enough"""
+        selection = self.cell_for(application)
+        rolled_up = []
+        result = self.query(**selection)
+        for name in ROLLUP_ORDER:
+            if result['applications'] >= min_applications:
+                break
+            if name in selection:
+                del selection[name]
+                rolled_up.append(name)
+                result = self.query(**selection)
+        result['rolled_up'] = rolled_up
+        return result
+
+    def rollup(self, *dimensions: str) -> pd.DataFrame:
+        """Applications and approval rate per bucket of the given dimensions, summed over the rest"""
+        for name in dimensions:
+            self.dimension(name)
+        axes = sorted(self._axes[name] for name in dimensions)
+        other = tuple(axis for axis in range(len(self.dimensions)) if axis not in axes)
+        counts = self.counts.sum(axis=other).ravel()
+        approved = self.approved.sum(axis=other).ravel()
+        index = pd.MultiIndex.from_product([list(self.dimensions[axis].labels) for axis in axes],
+                                           names=[self.dimensions[axis].name for axis in axes])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rate = np.where(counts > 0, approved / counts * 100, np.nan)
+        return pd.DataFrame({'Applications': counts, 'Approved': approved, 'Approval_Rate': rate},
+                            index=index).reset_index()
+
+    def save(self, path: str):
+        dimensions = [dim._asdict() for dim in self.dimensions]
+        atomic_write(path, lambda tmp_path: np.savez(
+            tmp_path, counts=self.counts, approved=self.approved,
+            metadata=np.array(json.dumps(dict(self.metadata, dimensions=dimensions)))))
+        logger.info(f"Segment cube saved to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> 'SegmentCube':
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data['metadata']))
+            if metadata.get('format_version') != CUBE_FORMAT_VERSION:
+                raise ValueError(f"Unsupported segment cube in {path}")
+            dimensions = [
+                Dimension(d['name'], d['column'], tuple(d['labels']),
+                          tuple(d['edges']) if d['edges'] is not None else None, d['right_closed'])
+                for d in metadata.pop('dimensions')
+            ]
+            return cls(dimensions, data['counts'], data['approved'], metadata)
+
+
+def format_rates(cube: SegmentCube, dimension: str) -> str:
+    """'label rate%' pairs for one dimension, e.g. for fallback answers"""
+    table = cube.rollup(dimension)
+    return ", ".join(f"{row[dimension]} {row.Approval_Rate:.1f}%" for _, row in table.iterrows()
+                     if row.Applications > 0)
+
+
+def format_segment_context(cube: SegmentCube) -> str:
+    """Approval rates per segment dimension for the LLM prompt"""
+    lines = ["APPROVAL RATE BY SEGMENT:"]
+    for name, title in (('credit_score', "Credit score group"), ('dti_ratio', "DTI ratio"),
+                        ('employment_status', "Employment"), ('loan_to_income', "Loan-to-income")):
+        lines.append(f"- {title}: {format_rates(cube, name)}")
+    return "\n".join(lines)
+
+
+SEGMENT_CUBE = SidecarArtifact('segment cube', 'segments.npz', SegmentCube.load,
+                               lambda data_loader, metadata: SegmentCube.build(data_loader.df, metadata=metadata))
+
+
+def segment_cube_path(data_file_path: str) -> str:
+    return SEGMENT_CUBE.path(data_file_path)
+
+
+def build_segment_cube(data_loader: LoanDataLoader, save: bool = True) -> SegmentCube:
+    return SEGMENT_CUBE.build(data_loader, save)
+
+
+def load_or_build_segment_cube(data_loader: LoanDataLoader) -> Optional[SegmentCube]:
+    return SEGMENT_CUBE.load_or_build(data_loader)
+
+
+def _parse_selector(text: Optional[str]):
+    """'670:740' or ':35' -> value range; anything else is a comma-separated label list"""
+    if text is None:
+        return None
+    if ':' in text:
+        low, high = text.split(':', 1)
+        return (float(low) if low else None, float(high) if high else None)
+    return [label.strip() for label in text.split(',')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the approval-rate segment cube")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build')
+    build_parser.add_argument('data', nargs='?', default='loan_data.csv')
+    query_parser = subparsers.add_parser('query', help="value ranges as LOW:HIGH, or comma-separated bucket labels")
+    query_parser.add_argument('--data', default='loan_data.csv')
+    for name in ('credit_score', 'dti_ratio', 'income', 'employment_status', 'loan_to_income'):
+        query_parser.add_argument(f"--{name.replace('_', '-')}", dest=name)
+    query_parser.add_argument('--rollup', help="dimension to break the result down by")
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        cube = build_segment_cube(LoanDataLoader(args.data))
+        print(f"Counted {cube.metadata['rows'] - cube.metadata['unassigned']:,} of {cube.metadata['rows']:,} rows "
+              f"into {cube.metadata['cells']:,} segments -> {segment_cube_path(args.data)}")
+        return
+
+    cube = load_or_build_segment_cube(LoanDataLoader(args.data))
+    if cube is None:
+        return 1
+    if args.rollup:
+        print(cube.rollup(args.rollup).to_string(index=False))
+        return
+    selection = {name: _parse_selector(getattr(args, name)) for name in cube._axes}
+    result = cube.query(**{name: value for name, value in selection.items() if value is not None})
+    rate = f"{result['approval_rate']:.1f}%" if result['approval_rate'] is not None else "n/a"
+    note = "" if result['exact'] else " (ranges widened to bucket edges)"
+    print(f"{result['applications']:,} applications, {result['approved']:,} approved, {rate}{note}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
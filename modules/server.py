@@ -0,0 +1,494 @@
+"""Headless HTTP/JSON API over the shared resources, independent of the Streamlit UI.
+
+One asyncio loop accepts connections and parses requests; the blocking
+engine calls run on a fixed pool of worker threads. At most `workers`
+requests run and `max_queue` more wait. Beyond that, requests get 429 with
+Retry-After straight away, so a load balancer can send them to another
+replica. A request that is not answered within `request_timeout` seconds
+gets 504.
+
+    GET  /health   liveness plus model circuit, queue and session figures (503 without data)
+    GET  /stats    dataset approval stats, kept current by SharedResources.ingest
+    GET  /metrics  Prometheus text (recorded with LOAN_METRICS=1)
+    POST /chat     {"message": ..., "session_id": ..., "stream": false}; NDJSON chunks when streaming
+    POST /analyze  form-style application, as LoanApprovalChatEngine.get_approval_analysis
+    POST /score    {"applications": [...]}: rule score, factors, recommendation and model probability
+
+Chat history is kept per `session_id` on top of one SharedResources
+instance. The least recently used sessions are dropped past `max_sessions`.
+
+    python -m modules.server --data loan_data.csv --port 8000 --workers 8 --max-queue 64
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from modules import metrics
+from modules.chat_engine import LoanApprovalChatEngine
+from modules.classifier import application_features
+from modules.scoring import score_applications
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_QUEUE = 64
+DEFAULT_REQUEST_TIMEOUT = 60.0
+DEFAULT_MAX_SESSIONS = 1000
+MAX_BODY_BYTES = 1 << 20
+MAX_BATCH_SIZE = 10_000
+RETRY_AFTER_SECONDS = 1
+# Application fields checked before analysis or scoring; the optional ones only when present
+REQUIRED_NUMBERS = ('income', 'credit_score', 'dti_ratio')
+OPTIONAL_NUMBERS = ('loan_amount',)
+OPTIONAL_STRINGS = ('employment_status', 'purpose')
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+           429: 'Too Many Requests', 500: 'Internal Server Error', 503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+
+class HttpError(Exception):
+    """Answered with `status` and a JSON {"error": message} body"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _is_finite(value: Any) -> bool:
+    """Finite as a float; JSON integers too large for one are not"""
+    try:
+        return math.isfinite(float(value))
+    except (OverflowError, TypeError, ValueError):
+        return False
+
+
+def _describe(value: Any) -> str:
+    """Short JSON form of a rejected value for an error message"""
+    text = json.dumps(value)
+    return text if len(text) <= 40 else text[:37] + "..."
+
+
+def validate_application(application: Any, where: str = "") -> Dict:
+    """The application if its fields are usable, else HttpError(400) naming the bad field"""
+    if not isinstance(application, dict):
+        raise HttpError(400, f"{where}expected a JSON object with the application fields")
+    for field in REQUIRED_NUMBERS + OPTIONAL_NUMBERS:
+        if field not in application:
+            if field in REQUIRED_NUMBERS:
+                raise HttpError(400, f"{where}'{field}' is required")
+            continue
+        value = application[field]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not _is_finite(value):
+            raise HttpError(400, f"{where}'{field}' must be a finite number, got {_describe(value)}")
+    for field in OPTIONAL_STRINGS:
+        if field in application and not isinstance(application[field], str):
+            raise HttpError(400, f"{where}'{field}' must be a string")
+    return application
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.DataFrame):
+        return value.to_dict(orient='records')
+    return str(value)
+
+
+def dumps(payload: Any) -> bytes:
+    return json.dumps(payload, default=_json_default).encode('utf-8')
+
+
+class _Session:
+    def __init__(self, engine: LoanApprovalChatEngine):
+        self.engine = engine
+        # One message at a time per conversation, so turns land in history in order
+        self.lock = threading.Lock()
+
+
+class LoanApiServer:
+    """asyncio HTTP server running chat, analysis and scoring on a bounded worker pool"""
+
+    def __init__(self, shared, host: str = '127.0.0.1', port: int = 8000, workers: int = DEFAULT_WORKERS,
+                 max_queue: int = DEFAULT_MAX_QUEUE, request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+                 max_sessions: int = DEFAULT_MAX_SESSIONS):
+        self.shared = shared
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_queue = max_queue
+        self.request_timeout = request_timeout
+        self.max_sessions = max_sessions
+        # Stateless calls (analysis) share one engine; chats get their own history via `session`
+        self.engine = LoanApprovalChatEngine(shared.data_file_path, shared.model_name, shared=shared)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='loan-api')
+        self.counters = {'requests': 0, 'rejected': 0, 'timeouts': 0, 'errors': 0}
+        self._sessions: 'OrderedDict[str, _Session]' = OrderedDict()
+        self._sessions_lock = threading.Lock()
+        # Jobs admitted and not yet finished on a worker (a timed-out job holds its slot until it ends)
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+        self.routes: Dict[Tuple[str, str], Callable] = {
+            ('GET', '/health'): self.handle_health,
+            ('GET', '/stats'): self.handle_stats,
+            ('GET', '/metrics'): self.handle_metrics,
+            ('POST', '/chat'): self.handle_chat,
+            ('POST', '/analyze'): self.handle_analyze,
+            ('POST', '/score'): self.handle_score,
+        }
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.max_queue
+
+    # Worker pool with admission control
+
+    def _admit(self):
+        with self._in_flight_lock:
+            if self._in_flight >= self.capacity:
+                self.counters['rejected'] += 1
+                metrics.inc('loan_server_rejected_total')
+                raise HttpError(429, f"server busy: {self._in_flight} requests in flight")
+            self._in_flight += 1
+
+    def _release(self, _future=None):
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    async def run_job(self, func: Callable, *args) -> Any:
+        """Run a blocking call on the pool; 429 when the queue is full, 504 past the request timeout"""
+        self._admit()
+        future = self.executor.submit(func, *args)
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.request_timeout)
+        except asyncio.TimeoutError:
+            # A job that already started cannot be interrupted; it finishes in the background
+            future.cancel()
+            self.counters['timeouts'] += 1
+            metrics.inc('loan_server_timeouts_total')
+            raise HttpError(504, f"request timed out after {self.request_timeout:g}s")
+
+    # Sessions
+
+    def session(self, session_id: str) -> _Session:
+        with self._sessions_lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                return session
+            engine = LoanApprovalChatEngine(self.shared.data_file_path, self.shared.model_name, shared=self.shared)
+            session = self._sessions[session_id] = _Session(engine)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
+
+    # Handlers: each returns (status, payload) or an async iterator of NDJSON lines
+
+    async def handle_health(self, body: Dict) -> Tuple[int, Dict]:
+        data_loaded = self.shared.df is not None
+        handler = self.shared.model_handler
+        model = handler.health.status() if handler is not None else {'state': 'unavailable'}
+        model_ok = handler is not None and handler.health.reachable
+        payload = {
+            'status': 'ok' if data_loaded and model_ok else ('degraded' if data_loaded else 'unavailable'),
+            'data_loaded': data_loaded,
+            'model': model,
+            'workers': self.workers,
+            'in_flight': self._in_flight,
+            'capacity': self.capacity,
+            'sessions': len(self._sessions),
+            **self.counters,
+        }
+        # Without a model the rule-based fallback still answers, so only missing data takes a replica out
+        return (200 if data_loaded else 503), payload
+
+    async def handle_stats(self, body: Dict) -> Tuple[int, Dict]:
+        if self.shared.stats is None:
+            raise HttpError(503, self.shared.data_context)
+        return 200, dict(self.shared.stats)
+
+    async def handle_metrics(self, body: Dict) -> Tuple[int, str]:
+        return 200, metrics.REGISTRY.render_prometheus()
+
+    async def handle_chat(self, body: Dict):
+        message = body.get('message')
+        if not isinstance(message, str) or not message.strip():
+            raise HttpError(400, "'message' must be a non-empty string")
+        session_id = str(body.get('session_id') or uuid.uuid4().hex)
+        session = self.session(session_id)
+
+        if not body.get('stream'):
+            def reply() -> str:
+                with session.lock:
+                    return session.engine.process_message(message)
+            response = await self.run_job(reply)
+            return 200, {'session_id': session_id, 'response': response}
+
+        def stream() -> Iterator[str]:
+            with session.lock:
+                yield from session.engine.process_message_stream(message)
+        return self.stream_job(stream, session_id)
+
+    async def handle_analyze(self, body: Dict) -> Tuple[int, Dict]:
+        return 200, await self.run_job(self.engine.get_approval_analysis, validate_application(body))
+
+    async def handle_score(self, body: Dict) -> Tuple[int, Dict]:
+        applications = body.get('applications')
+        if not isinstance(applications, list):
+            raise HttpError(400, "'applications' must be a list of objects")
+        if len(applications) > MAX_BATCH_SIZE:
+            raise HttpError(413, f"at most {MAX_BATCH_SIZE} applications per request")
+        for i, application in enumerate(applications):
+            validate_application(application, f"applications[{i}]: ")
+        return 200, {'results': await self.run_job(self.score, applications)}
+
+    def score(self, applications):
+        """Vectorized rule scores for a batch, with the classifier's approval probability when it is loaded"""
+        if not applications:
+            return []
+        scored = score_applications(pd.DataFrame(applications))
+        factor_columns = ['income_factor', 'credit_factor', 'dti_factor', 'employment_factor']
+        results = [{'score': int(row.score), 'factors': [getattr(row, c) for c in factor_columns],
+                    'recommendation': row.recommendation}
+                   for row in scored.itertuples(index=False)]
+        classifier = self.shared.classifier
+        if classifier is not None:
+            features = np.array([application_features(a) for a in applications], dtype=np.float64)
+            for result, probability in zip(results, classifier.predict_proba(features)):
+                result['approval_probability'] = float(probability)
+        return results
+
+    def stream_job(self, func: Callable[[], Iterator[str]], session_id: str):
+        """Admit a streaming call now and return the NDJSON lines a worker produces from `func()`"""
+        self._admit()
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def produce():
+            generator = func()
+            try:
+                for chunk in generator:
+                    loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+                    if stop.is_set():
+                        break
+            except Exception as e:
+                loop.call_soon_threadsafe(chunks.put_nowait, e)
+            finally:
+                generator.close()
+                loop.call_soon_threadsafe(chunks.put_nowait, done)
+
+        future = self.executor.submit(produce)
+        future.add_done_callback(self._release)
+        return self._stream_lines(chunks, done, stop, future, loop.time() + self.request_timeout, session_id)
+
+    async def _stream_lines(self, chunks: asyncio.Queue, done, stop: threading.Event, future, deadline: float,
+                            session_id: str):
+        """NDJSON lines from the worker's chunks; the deadline covers the whole stream"""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(chunks.get(), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    self.counters['timeouts'] += 1
+                    metrics.inc('loan_server_timeouts_total')
+                    yield {'error': f"request timed out after {self.request_timeout:g}s", 'done': True}
+                    return
+                if item is done:
+                    yield {'session_id': session_id, 'done': True}
+                    return
+                if isinstance(item, Exception):
+                    yield {'error': str(item), 'done': True}
+                    return
+                yield {'chunk': item, 'done': False}
+        finally:
+            # Ends the generator at its next chunk, which records the partial reply in history
+            stop.set()
+            future.cancel()
+
+    # HTTP/1.1 plumbing
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        try:
+            method, target, _version = request_line.decode('latin-1').split()
+        except ValueError:
+            raise HttpError(400, "malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            raise HttpError(400, "Content-Length is not an integer")
+        if length < 0:
+            raise HttpError(400, "Content-Length is negative")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, f"request body over {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target.split('?', 1)[0], headers, body
+
+    @staticmethod
+    def _head(status: int, content_type: str, extra: Dict[str, str]) -> bytes:
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {content_type}"]
+        lines += [f"{name}: {value}" for name, value in extra.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool):
+        if isinstance(payload, str):
+            body, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4'
+        else:
+            body, content_type = dumps(payload), 'application/json'
+        extra = {'Content-Length': str(len(body)), 'Connection': 'keep-alive' if keep_alive else 'close'}
+        if status == 429:
+            extra['Retry-After'] = str(RETRY_AFTER_SECONDS)
+        writer.write(self._head(status, content_type, extra) + body)
+        await writer.drain()
+
+    async def _respond_stream(self, writer: asyncio.StreamWriter, lines, keep_alive: bool):
+        extra = {'Transfer-Encoding': 'chunked', 'Connection': 'keep-alive' if keep_alive else 'close'}
+        writer.write(self._head(200, 'application/x-ndjson', extra))
+        try:
+            async for line in lines:
+                data = dumps(line) + b"\n"
+                writer.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+                await writer.drain()
+        finally:
+            await lines.aclose()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _dispatch(self, method: str, path: str, raw_body: bytes):
+        handler = self.routes.get((method, path))
+        if handler is None:
+            known = any(route_path == path for _, route_path in self.routes)
+            raise HttpError(405 if known else 404, f"{method} {path} not supported")
+        try:
+            body = json.loads(raw_body) if raw_body.strip() else {}
+        except ValueError:
+            raise HttpError(400, "request body is not valid JSON")
+        if not isinstance(body, dict):
+            raise HttpError(400, "request body must be a JSON object")
+        return await handler(body)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                keep_alive = False
+                start = time.perf_counter()
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, raw_body = request
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                    self.counters['requests'] += 1
+                    result = await self._dispatch(method, path, raw_body)
+                except HttpError as e:
+                    result = (e.status, {'error': str(e)})
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    logger.exception(f"Error handling request: {e}")
+                    self.counters['errors'] += 1
+                    result = (500, {'error': "internal error"})
+
+                if isinstance(result, tuple):
+                    await self._respond(writer, *result, keep_alive=keep_alive)
+                else:
+                    await self._respond_stream(writer, result, keep_alive=keep_alive)
+                metrics.observe('loan_server_request_seconds', time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    # Lifecycle
+
+    async def serve(self):
+        """Listen until cancelled (blocking use: asyncio.run(server.serve()))"""
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Loan API listening on {self.url} ({self.workers} workers, queue {self.max_queue})")
+        self._started.set()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start(self) -> 'LoanApiServer':
+        """Serve from a background thread (port 0 picks a free port, see `url`)"""
+        def run():
+            try:
+                asyncio.run(self.serve())
+            except asyncio.CancelledError:
+                pass
+        self._thread = threading.Thread(target=run, name='loan-api-server', daemon=True)
+        self._thread.start()
+        self._started.wait(10)
+        return self
+
+    def stop(self):
+        if self._loop is not None and self._server is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve chat, analysis, batch scoring and stats over HTTP/JSON")
+    parser.add_argument('--data', default='loan_data.csv', help="dataset (CSV)")
+    parser.add_argument('--model', default='llama2', help="Ollama model name")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE, help="requests waiting beyond the workers before 429")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_REQUEST_TIMEOUT, help="seconds before a request gets 504")
+    parser.add_argument('--max-sessions', type=int, default=DEFAULT_MAX_SESSIONS)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    from modules.registry import get_shared_resources
+
+    shared = get_shared_resources(args.data, args.model)
+    server = LoanApiServer(shared, host=args.host, port=args.port, workers=args.workers, max_queue=args.max_queue,
+                           request_timeout=args.timeout, max_sessions=args.max_sessions)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+import math
+from typing import Dict, Iterable, Sequence
+
+import pandas as pd
+
+APPROVED = 'Approved'
+REJECTED = 'Rejected'
+DEFAULT_STAT_COLUMNS = ('Income', 'Credit_Score')
+SUPPORTED_AGGREGATES = ('count', 'mean', 'std', 'min', 'max', 'sum')
+
+
+class ApprovalStatsEngine:
+    """Approval-split aggregates computed in one grouped pass.
+
+    `partial_aggregates` reduces a frame to per-group count/mean/M2/min/max,
+    which can be merged across chunks (Chan et al. parallel variance) and
+    turned into final statistics with `finalize`.
+    """
+
+    def __init__(self, group_column: str = 'Approval'):
+        self.group_column = group_column
+
+    def partial_aggregates(self, df: pd.DataFrame, columns: Sequence[str] = DEFAULT_STAT_COLUMNS) -> Dict:
+        """Reduce a frame to mergeable per-group partial aggregates"""
+        columns = list(columns)
+        grouped = df.groupby(self.group_column, sort=False, observed=True)
+        sizes = grouped.size()
+        aggregated = grouped[columns].agg(['count', 'mean', 'var', 'min', 'max'])
+
+        groups = {}
+        for label in sizes.index:
+            group_columns = {}
+            for column in columns:
+                count = int(aggregated.at[label, (column, 'count')])
+                var = aggregated.at[label, (column, 'var')]
+                group_columns[column] = {
+                    'count': count,
+                    'mean': float(aggregated.at[label, (column, 'mean')]),
+                    'm2': float(var) * (count - 1) if count > 1 else 0.0,
+                    'min': float(aggregated.at[label, (column, 'min')]),
+                    'max': float(aggregated.at[label, (column, 'max')]),
+                }
+            groups[label] = {'size': int(sizes[label]), 'columns': group_columns}
+
+        return {'total': len(df), 'groups': groups}
+
+    @staticmethod
+    def _merge_column(left: Dict, right: Dict) -> Dict:
+        if left['count'] == 0:
+            return dict(right)
+        if right['count'] == 0:
+            return dict(left)
+        count = left['count'] + right['count']
+        delta = right['mean'] - left['mean']
+        return {
+            'count': count,
+            'mean': left['mean'] + delta * right['count'] / count,
+            'm2': left['m2'] + right['m2'] + delta * delta * left['count'] * right['count'] / count,
+            'min': min(left['min'], right['min']),
+            'max': max(left['max'], right['max']),
+        }
+
+    def merge(self, left: Dict, right: Dict) -> Dict:
+        """Combine the partial aggregates of two disjoint sets of rows"""
+        groups = {label: {'size': group['size'], 'columns': dict(group['columns'])}
+                  for label, group in left['groups'].items()}
+        for label, group in right['groups'].items():
+            if label not in groups:
+                groups[label] = {'size': group['size'], 'columns': dict(group['columns'])}
+                continue
+            merged = groups[label]
+            merged['size'] += group['size']
+            for column, values in group['columns'].items():
+                if column in merged['columns']:
+                    merged['columns'][column] = self._merge_column(merged['columns'][column], values)
+                else:
+                    merged['columns'][column] = dict(values)
+        return {'total': left['total'] + right['total'], 'groups': groups}
+
+    @staticmethod
+    def finalize(partials: Dict, aggregates: Iterable[str] = ('count', 'mean')) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Turn partial aggregates into {label: {column: {aggregate: value}}}"""
+        aggregates = list(aggregates)
+        unknown = set(aggregates) - set(SUPPORTED_AGGREGATES)
+        if unknown:
+            raise ValueError(f"Unsupported aggregates: {sorted(unknown)}")
+
+        result = {}
+        for label, group in partials['groups'].items():
+            result[label] = {}
+            for column, values in group['columns'].items():
+                count = values['count']
+                computed = {
+                    'count': count,
+                    'mean': values['mean'] if count else math.nan,
+                    'std': math.sqrt(values['m2'] / (count - 1)) if count > 1 else math.nan,
+                    'min': values['min'] if count else math.nan,
+                    'max': values['max'] if count else math.nan,
+                    'sum': values['mean'] * count if count else 0.0,
+                }
+                result[label][column] = {name: computed[name] for name in aggregates}
+        return result
+
+    def quantiles(self, df: pd.DataFrame, columns: Sequence[str], q: Sequence[float]) -> Dict[str, Dict[str, Dict[float, float]]]:
+        """Per-group quantiles; these need the full data and are not mergeable"""
+        grouped = df.groupby(self.group_column, sort=False, observed=True)[list(columns)]
+        quantile_frame = grouped.quantile(list(q))
+        result = {}
+        for (label, quantile), row in quantile_frame.iterrows():
+            for column in columns:
+                result.setdefault(label, {}).setdefault(column, {})[quantile] = float(row[column])
+        return result
+
+    def aggregate(self, df: pd.DataFrame, columns: Sequence[str] = DEFAULT_STAT_COLUMNS,
+                  aggregates: Iterable[str] = ('count', 'mean'), quantiles: Sequence[float] = ()) -> Dict:
+        """Approval-split aggregates for any numeric columns"""
+        result = self.finalize(self.partial_aggregates(df, columns), aggregates)
+        if quantiles:
+            for label, column_quantiles in self.quantiles(df, columns, quantiles).items():
+                for column, values in column_quantiles.items():
+                    result[label][column].update({f"q{quantile:g}": value for quantile, value in values.items()})
+        return result
+
+    def approval_stats(self, df: pd.DataFrame) -> Dict:
+        """Dataset approval statistics in the get_approval_stats() shape"""
+        return self.stats_from_partials(self.partial_aggregates(df, DEFAULT_STAT_COLUMNS))
+
+    def stats_from_partials(self, partials: Dict) -> Dict:
+        """Build the get_approval_stats() dict from partial aggregates"""
+        finalized = self.finalize(partials, ('mean',))
+        groups = partials['groups']
+        total = partials['total']
+        approved = groups[APPROVED]['size'] if APPROVED in groups else 0
+        rejected = groups[REJECTED]['size'] if REJECTED in groups else 0
+
+        def group_mean(label: str, column: str) -> float:
+            return finalized.get(label, {}).get(column, {}).get('mean', math.nan)
+
+        return {
+            'total_applications': total,
+            'approved': approved,
+            'rejected': rejected,
+            'approval_rate': approved / total * 100 if total else 0.0,
+            'avg_income_approved': group_mean(APPROVED, 'Income'),
+            'avg_income_rejected': group_mean(REJECTED, 'Income'),
+            'avg_credit_score_approved': group_mean(APPROVED, 'Credit_Score'),
+            'avg_credit_score_rejected': group_mean(REJECTED, 'Credit_Score'),
+        }
@@ -1,10 +1,23 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from typing import Dict, Any
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Hashable, Optional
 import logging
 
+# Up to this many rows the scatter shows every application
+RAW_POINTS_LIMIT = 5000
+SAMPLE_POINT_BUDGET = 5000
+DENSITY_BINS = 60
+FIGURE_CACHE_SIZE = 16
+
+# Figures keyed by (chart, options, LoanDataLoader.data_key()), shared by all sessions
+_figure_cache: "OrderedDict[Hashable, go.Figure]" = OrderedDict()
+_figure_cache_lock = threading.Lock()
+
 def setup_logging():
     """Setup basic logging configuration"""
     logging.basicConfig(
@@ -28,26 +41,134 @@ def display_loan_stats(stats: Dict[str, Any]):
     with col4:
         st.metric("Approval Rate", f"{stats['approval_rate']:.1f}%")
 
-def create_approval_chart(df: pd.DataFrame):
-    """Create approval rate visualization"""
-    fig = px.pie(
+def _cached_figure(key: Optional[Hashable], build):
+    """Figure for `key` from the process-wide cache, building it on a miss"""
+    if key is None:
+        return build()
+    with _figure_cache_lock:
+        figure = _figure_cache.get(key)
+        if figure is not None:
+            _figure_cache.move_to_end(key)
+            return figure
+    # Built outside the lock so other sessions' cache hits never wait on a build
+    figure = build()
+    with _figure_cache_lock:
+        figure = _figure_cache.setdefault(key, figure)
+        _figure_cache.move_to_end(key)
+        while len(_figure_cache) > FIGURE_CACHE_SIZE:
+            _figure_cache.popitem(last=False)
+    return figure
+
+def build_approval_figure(df: pd.DataFrame) -> go.Figure:
+    """Pie of approved vs rejected applications"""
+    counts = df['Approval'].value_counts()
+    return px.pie(
         names=['Approved', 'Rejected'],
-        values=[len(df[df['Approval'] == 'Approved']), len(df[df['Approval'] == 'Rejected'])],
+        values=[int(counts.get('Approved', 0)), int(counts.get('Rejected', 0))],
         title='Loan Approval Distribution'
     )
-    st.plotly_chart(fig)
-
-def create_income_vs_credit_chart(df: pd.DataFrame):
-    """Create income vs credit score scatter plot"""
-    fig = px.scatter(
-        df, 
-        x='Income', 
-        y='Credit_Score', 
+
+def create_approval_chart(df: pd.DataFrame, cache_key: Optional[Hashable] = None):
+    """Create approval rate visualization"""
+    key = None if cache_key is None else ('approval', cache_key)
+    st.plotly_chart(_cached_figure(key, lambda: build_approval_figure(df)))
+
+def _bin_index(values: np.ndarray, bins: int):
+    """Uniform bin of each value and the bin centers (what np.histogram2d computes, in one pass)"""
+    low, high = np.nanmin(values), np.nanmax(values)
+    width = (high - low) / bins or 1.0
+    index = np.minimum(((values - low) / width).astype(np.intp), bins - 1)
+    return index, low + width * (np.arange(bins) + 0.5)
+
+def _bin_mean(cells: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    """Mean of `values` per cell, skipping missing values (NaN for a cell with none)"""
+    present = np.isfinite(values)
+    sums = np.bincount(cells[present], weights=values[present], minlength=size)
+    counts = np.bincount(cells[present], minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / counts
+
+def income_credit_density(df: pd.DataFrame, bins: int = DENSITY_BINS) -> pd.DataFrame:
+    """Income x credit score 2D histogram per approval class, one row per non-empty bin.
+
+    Rows without a finite income or credit score, or without an approval
+    label, have no cell and are left out.
+    """
+    income = df['Income'].to_numpy(dtype=float)
+    credit = df['Credit_Score'].to_numpy(dtype=float)
+    label_index, labels = pd.factorize(df['Approval'], sort=True)
+    keep = np.isfinite(income) & np.isfinite(credit) & (label_index >= 0)
+    if not keep.any():
+        return pd.DataFrame(columns=['Income', 'Credit_Score', 'Applications', 'Avg_Loan_Amount',
+                                     'Avg_DTI_Ratio', 'Approval'])
+    x_index, x_centers = _bin_index(income[keep], bins)
+    y_index, y_centers = _bin_index(credit[keep], bins)
+
+    # One flat cell id per (class, income bin, credit bin); bincount gives counts and sums
+    cells = (label_index[keep] * bins + x_index) * bins + y_index
+    size = len(labels) * bins * bins
+    counts = np.bincount(cells, minlength=size)
+    loan_mean = _bin_mean(cells, df['Loan_Amount'].to_numpy(dtype=float)[keep], size)
+    dti_mean = _bin_mean(cells, df['DTI_Ratio'].to_numpy(dtype=float)[keep], size)
+
+    occupied = np.flatnonzero(counts)
+    label_cell, rest = np.divmod(occupied, bins * bins)
+    x, y = np.divmod(rest, bins)
+    return pd.DataFrame({
+        'Income': x_centers[x],
+        'Credit_Score': y_centers[y],
+        'Applications': counts[occupied],
+        'Avg_Loan_Amount': loan_mean[occupied].round(0),
+        'Avg_DTI_Ratio': dti_mean[occupied].round(2),
+        'Approval': np.asarray(labels)[label_cell],
+    })
+
+def stratified_sample(df: pd.DataFrame, point_budget: int = SAMPLE_POINT_BUDGET, random_state: int = 0) -> pd.DataFrame:
+    """At most `point_budget` rows, keeping each approval class's share"""
+    if len(df) <= point_budget:
+        return df
+    return df.groupby('Approval', group_keys=False).sample(frac=point_budget / len(df), random_state=random_state)
+
+def build_income_vs_credit_figure(df: pd.DataFrame, mode: str = 'auto') -> go.Figure:
+    """Income vs credit score by approval status.
+
+    mode: 'raw' plots every row, 'sample' a stratified sample capped at
+    SAMPLE_POINT_BUDGET, 'density' binned counts sized by applications;
+    'auto' uses raw points up to RAW_POINTS_LIMIT rows and density above.
+    """
+    if mode == 'auto':
+        mode = 'raw' if len(df) <= RAW_POINTS_LIMIT else 'density'
+    title = 'Income vs Credit Score by Approval Status'
+
+    if mode == 'density':
+        binned = income_credit_density(df)
+        return px.scatter(
+            binned,
+            x='Income',
+            y='Credit_Score',
+            color='Approval',
+            size='Applications',
+            opacity=0.6,
+            title=f"{title} ({len(df):,} applications, binned)",
+            hover_data=['Applications', 'Avg_Loan_Amount', 'Avg_DTI_Ratio']
+        )
+
+    points = stratified_sample(df) if mode == 'sample' else df
+    if mode == 'sample' and len(points) < len(df):
+        title = f"{title} (sample of {len(points):,} / {len(df):,})"
+    return px.scatter(
+        points,
+        x='Income',
+        y='Credit_Score',
         color='Approval',
-        title='Income vs Credit Score by Approval Status',
+        title=title,
         hover_data=['Loan_Amount', 'DTI_Ratio']
     )
-    st.plotly_chart(fig)
+
+def create_income_vs_credit_chart(df: pd.DataFrame, mode: str = 'auto', cache_key: Optional[Hashable] = None):
+    """Create income vs credit score chart, aggregated server-side for large data"""
+    key = None if cache_key is None else ('income_vs_credit', mode, cache_key)
+    st.plotly_chart(_cached_figure(key, lambda: build_income_vs_credit_figure(df, mode)))
 
 def validate_loan_inputs(income: float, credit_score: int, loan_amount: float, dti_ratio: float) -> Dict[str, str]:
     """Validate loan application inputs"""
@@ -0,0 +1,268 @@
+"""Local stand-in for the Ollama HTTP API, for tests and benchmarks.
+
+Serves /api/tags, /api/version, /api/generate and /api/chat, streaming
+NDJSON chunks with a configurable per-token delay, and records every
+request payload it receives and the client connections it saw.
+`max_parallel` limits concurrent generations like a real single-GPU server.
+`model_delays` gives individual models their own first-token delay, to
+stand in for a fast small model next to a slow large one.
+
+Like Ollama, the stub keeps each model loaded for the request's
+`keep_alive` (a `load_delay` is paid when it is not) and remembers the
+model's previous prompt. Only the part of a new prompt past the prefix it
+shares with that one is prefilled (`prefill_token_delay` per token) and
+counted in `prompt_eval_count`.
+
+    stub = OllamaStubServer(response_text="Hello there", token_delay=0.01).start()
+    model = LoanApprovalModel(host=stub.url)
+    ...
+    stub.stop()
+
+Run it standalone with `python ollama_stub.py --port 11434`.
+"""
+import argparse
+import json
+import math
+import os
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple, Union
+
+# Ollama unloads a model this long after its last request unless told otherwise
+DEFAULT_KEEP_ALIVE_SECONDS = 300.0
+DURATION_UNITS = (('ms', 0.001), ('h', 3600.0), ('m', 60.0), ('s', 1.0))
+
+DEFAULT_RESPONSE = ("Based on the loan data, applicants with credit scores above 700, "
+                    "a DTI ratio under 35% and stable employment are approved most often.")
+
+
+def keep_alive_seconds(value: Union[str, float, None]) -> float:
+    """Ollama keep_alive ('30m', '10s', seconds; negative keeps the model loaded) in seconds"""
+    if value is None:
+        return DEFAULT_KEEP_ALIVE_SECONDS
+    seconds = None
+    if isinstance(value, str):
+        for unit, scale in DURATION_UNITS:
+            if value.endswith(unit):
+                seconds = float(value[:-len(unit)]) * scale
+                break
+    if seconds is None:
+        seconds = float(value)
+    return math.inf if seconds < 0 else seconds
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "OllamaStubServer"
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; avoid the delayed-ACK stall on keep-alive connections
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload: Dict, status: int = 200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            self._send_json({'models': [{'name': name, 'model': name} for name in self.server.models]})
+        elif self.path == '/api/version':
+            self._send_json({'version': 'stub'})
+        else:
+            self._send_json({'error': 'not found'}, 404)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        self.server.record(self.path, payload, self.client_address)
+
+        if self.path not in ('/api/generate', '/api/chat'):
+            self._send_json({'error': 'not found'}, 404)
+            return
+        if self.server.fail_requests:
+            self._send_json({'error': 'stub failure'}, 500)
+            return
+
+        with self.server.model_slots:
+            try:
+                self._generate(payload)
+            finally:
+                self.server.release(payload)
+
+    def _generate(self, payload: Dict):
+        chat = self.path == '/api/chat'
+        tokens = self.server.tokens_for(payload)
+        load_seconds, prompt_tokens = self.server.prepare(payload)
+        start = time.perf_counter()
+        time.sleep(load_seconds)
+        load_done = time.perf_counter()
+        time.sleep(self.server.model_delays.get(payload.get('model'), self.server.first_token_delay)
+                   + self.server.prefill_token_delay * prompt_tokens)
+        prefill_done = time.perf_counter()
+
+        def chunk(text: str, done: bool) -> Dict:
+            message = {'model': payload.get('model'), 'created_at': datetime.now(timezone.utc).isoformat(), 'done': done}
+            if chat:
+                message['message'] = {'role': 'assistant', 'content': text}
+            else:
+                message['response'] = text
+            if done:
+                end = time.perf_counter()
+                message.update({
+                    'done_reason': 'stop',
+                    'total_duration': int((end - start) * 1e9),
+                    'load_duration': int((load_done - start) * 1e9),
+                    'prompt_eval_count': prompt_tokens,
+                    'prompt_eval_duration': int((prefill_done - load_done) * 1e9),
+                    'eval_count': len(tokens),
+                    'eval_duration': int((end - prefill_done) * 1e9),
+                })
+            return message
+
+        if not payload.get('stream', True):
+            time.sleep(self.server.token_delay * len(tokens))
+            self._send_json(chunk(''.join(tokens), True))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for token in tokens:
+            self._write_chunk(json.dumps(chunk(token, False)) + '\n')
+            time.sleep(self.server.token_delay)
+        self._write_chunk(json.dumps(chunk('', True)) + '\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _write_chunk(self, line: str):
+        data = line.encode('utf-8')
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+
+class OllamaStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, response_text: str = DEFAULT_RESPONSE,
+                 token_delay: float = 0.0, first_token_delay: float = 0.0, models: Optional[List[str]] = None,
+                 max_parallel: int = 64, model_delays: Optional[Dict[str, float]] = None,
+                 load_delay: float = 0.0, prefill_token_delay: float = 0.0):
+        super().__init__((host, port), _Handler)
+        self.response_text = response_text
+        self.token_delay = token_delay
+        self.first_token_delay = first_token_delay
+        self.models = models or ['llama2']
+        self.model_delays = dict(model_delays or {})
+        self.load_delay = load_delay
+        self.prefill_token_delay = prefill_token_delay
+        # Per model: when it unloads, and the last prompt (whose KV cache a new prompt can reuse)
+        self.loaded_until: Dict[str, float] = {}
+        self.prompt_cache: Dict[str, str] = {}
+        self.fail_requests = False
+        self.requests: List[Dict] = []
+        # Like OLLAMA_NUM_PARALLEL: generations beyond this wait for a slot
+        self.model_slots = threading.BoundedSemaphore(max_parallel)
+        self.connections = set()
+        self._open_sockets = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, path: str, payload: Dict, client_address=None):
+        with self._lock:
+            self.requests.append({'path': path, 'payload': payload})
+            if client_address is not None:
+                self.connections.add(client_address)
+
+    def finish_request(self, request, client_address):
+        with self._lock:
+            self._open_sockets.add(request)
+        try:
+            super().finish_request(request, client_address)
+        finally:
+            with self._lock:
+                self._open_sockets.discard(request)
+
+    def handle_error(self, request, client_address):
+        # Clients that disconnect mid-response (cancelled or killed) are expected
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    def tokens_for(self, payload: Dict) -> List[str]:
+        words = self.response_text.split(' ')
+        return [word if i == 0 else ' ' + word for i, word in enumerate(words)]
+
+    @staticmethod
+    def prompt_text(payload: Dict) -> str:
+        """The prompt as the model would see it, with chat messages rendered in order"""
+        if 'messages' in payload:
+            return ''.join(f"<|{m.get('role')}|>{m.get('content', '')}" for m in payload['messages'])
+        return (payload.get('system') or '') + (payload.get('prompt') or '')
+
+    def prepare(self, payload: Dict) -> Tuple[float, int]:
+        """Seconds to spend loading the model, and prompt tokens to evaluate past the cached prefix"""
+        model = payload.get('model')
+        text = self.prompt_text(payload)
+        with self._lock:
+            loaded = self.loaded_until.get(model, 0.0) > time.monotonic()
+            previous = self.prompt_cache.get(model, '') if loaded else ''
+            self.prompt_cache[model] = text
+            # Loaded until this request finishes (see release)
+            self.loaded_until[model] = math.inf
+        reused = len(os.path.commonprefix([previous, text]))
+        return (0.0 if loaded else self.load_delay), max(1, (len(text) - reused) // 4)
+
+    def release(self, payload: Dict):
+        with self._lock:
+            self.loaded_until[payload.get('model')] = time.monotonic() + keep_alive_seconds(payload.get('keep_alive'))
+
+    def start(self) -> 'OllamaStubServer':
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        # Drop keep-alive connections too, as a server that went away would
+        with self._lock:
+            for sock in self._open_sockets:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a stub Ollama server")
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--token-delay', type=float, default=0.02)
+    parser.add_argument('--first-token-delay', type=float, default=0.1)
+    args = parser.parse_args()
+    server = OllamaStubServer(port=args.port, token_delay=args.token_delay, first_token_delay=args.first_token_delay)
+    print(f"Stub Ollama listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import sys
+import os
+import asyncio
+import time
+
+# Add modules to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+N_USERS = 50
+REQUESTS_PER_USER = 2
+GENERATION_SECONDS = 0.05
+MODEL_PARALLEL = 4
+
+
+async def serial_test(model, n):
+    start = time.perf_counter()
+    for i in range(n):
+        await model.agenerate_response(f"Serial question {i}", "context")
+    return n / (time.perf_counter() - start)
+
+
+async def load_test(model):
+    async def user(user_id):
+        for i in range(REQUESTS_PER_USER):
+            await model.agenerate_response(f"Question {i} from analyst {user_id}", "context")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(u) for u in range(N_USERS)))
+    return time.perf_counter() - start
+
+
+async def coalescing_test(model):
+    return await asyncio.gather(*(model.agenerate_response("What DTI ratio is acceptable?", "context")
+                                  for _ in range(N_USERS)))
+
+
+async def main():
+    from ollama_stub import OllamaStubServer
+    from modules.async_model_handler import AsyncLoanApprovalModel
+
+    stub = OllamaStubServer(first_token_delay=GENERATION_SECONDS, max_parallel=MODEL_PARALLEL).start()
+    model = AsyncLoanApprovalModel(host=stub.url, max_concurrency=MODEL_PARALLEL)
+    assert await model.initialize_model_async(), "stub server should be detected as available"
+
+    # 50 concurrent users with distinct prompts: throughput scales with the model's parallel slots,
+    # measured against one user asking in turn on the same machine and run
+    serial = await serial_test(model, 10)
+    elapsed = await load_test(model)
+    requests = N_USERS * REQUESTS_PER_USER
+    throughput = requests / elapsed
+    assert throughput >= 0.5 * MODEL_PARALLEL * serial, (throughput, serial)
+    assert len(stub.connections) <= MODEL_PARALLEL + 1, f"{len(stub.connections)} connections opened"
+    print(f"✅ {requests} requests from {N_USERS} users: {throughput:.0f} req/s "
+          f"({throughput / serial:.1f}x one user's {serial:.0f} req/s) over {len(stub.connections)} pooled connections")
+
+    # Identical simultaneous prompts share one generation
+    generations_before = model.counters['generations']
+    answers = await coalescing_test(model)
+    assert len(set(answers)) == 1 and model.counters['generations'] == generations_before + 1
+    print(f"✅ {N_USERS} identical prompts coalesced into one generation ({model.counters['coalesced']} joined)")
+
+    # Cancelling the caller that started a shared generation leaves the others waiting on it
+    prompt = "Which loan purposes get approved most often?"
+    first = asyncio.ensure_future(model.agenerate_response(prompt, "context"))
+    await asyncio.sleep(0)
+    followers = [asyncio.ensure_future(model.agenerate_response(prompt, "context")) for _ in range(5)]
+    await asyncio.sleep(0)
+    first.cancel()
+    answers = await asyncio.gather(*followers)
+    assert first.cancelled() and answers == [stub.response_text] * 5, answers
+    print("✅ Cancelled first caller: 5 coalesced callers still got the model's answer")
+
+    # Requests that cannot get a slot in time fall back instead of piling up
+    stub.first_token_delay = 0.5
+    model.queue_timeout = 0.1
+    answers = await asyncio.gather(*(model.agenerate_response(f"Slow question {i}") for i in range(MODEL_PARALLEL + 2)))
+    assert model.counters['queue_timeouts'] == 2
+    print("✅ Queued requests time out to fallback responses")
+
+    # A failed analysis gets the rule-based analysis, not a chat answer to the analysis prompt
+    stub.fail_requests = True
+    analysis = await model.aanalyze_loan_application({'income': 60000, 'credit_score': 710, 'loan_amount': 15000,
+                                                      'dti_ratio': 25, 'employment_status': 'employed'})
+    assert analysis.startswith("Analysis for application"), analysis
+    stub.fail_requests = False
+    print("✅ Failed async analysis falls back to the rule-based analysis")
+
+    await model.aclose()
+    stub.stop()
+
+
+try:
+    asyncio.run(main())
+except Exception as e:
+    print(f"❌ Error: {e}")
+    import traceback
+    traceback.print_exc()
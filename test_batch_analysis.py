@@ -0,0 +1,91 @@
+import sys
+import os
+import json
+import subprocess
+import tempfile
+import time
+
+# Add modules to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+N_APPLICATIONS = 120
+GENERATION_SECONDS = 0.05
+MODEL_PARALLEL = 4
+
+try:
+    import pandas as pd
+    from ollama_stub import OllamaStubServer
+    from modules.batch_analysis import BatchAnalyzer, load_checkpoint
+    from modules.model_handler import LoanApprovalModel
+    from modules.response_cache import ResponseCache
+
+    workdir = tempfile.mkdtemp()
+    input_path = os.path.join(workdir, 'queued.csv')
+    checkpoint_path = os.path.join(workdir, 'analyses.jsonl')
+    pd.read_csv('loan_data.csv', nrows=N_APPLICATIONS).to_csv(input_path, index=False)
+    stub = OllamaStubServer(first_token_delay=GENERATION_SECONDS, max_parallel=MODEL_PARALLEL).start()
+
+    # A run killed part-way leaves a usable checkpoint
+    run = subprocess.Popen([sys.executable, '-m', 'modules.batch_analysis', input_path, checkpoint_path,
+                            '--host', stub.url, '--workers', '8', '--no-context'],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if os.path.exists(checkpoint_path) and sum(1 for _ in open(checkpoint_path)) >= 30:
+            break
+        time.sleep(0.01)
+    run.kill()
+    run.wait()
+    with open(checkpoint_path, 'a') as f:
+        f.write('{"id": "999", "status": "ok", "anal')  # record cut off mid-write
+    done_before = load_checkpoint(checkpoint_path)
+    assert 30 <= len(done_before) < N_APPLICATIONS, len(done_before)
+    print(f"✅ Killed run left {len(done_before)} analyses in the checkpoint")
+
+    # Resuming analyzes only the rest, in parallel, with progress and ETA
+    model = LoanApprovalModel(host=stub.url, response_cache=ResponseCache())
+    reports = []
+    analyzer = BatchAnalyzer(model, workers=8, progress_interval=0,
+                             on_progress=lambda p: reports.append(p.snapshot()))
+    progress = analyzer.run(input_path, checkpoint_path)
+    records = [json.loads(line) for line in open(checkpoint_path)]
+    ids = [r['id'] for r in records]
+    assert sorted(set(ids), key=int) == [str(i) for i in range(1, N_APPLICATIONS + 1)], "every application once"
+    assert len(ids) == len(set(ids)), "no application analyzed twice"
+    assert progress.completed == N_APPLICATIONS - len(done_before) and progress.skipped == len(done_before)
+    assert all(r['status'] == 'ok' and r['source'] == 'model' for r in records)
+    assert any(r['eta_s'] is not None for r in reports[:-1]) and reports[-1]['eta_s'] == 0
+    serial_limit = 1 / GENERATION_SECONDS
+    assert progress.throughput > 2 * serial_limit, progress.throughput
+    print(f"✅ Resumed: {progress.completed} more analyzed at {progress.throughput:.0f}/s "
+          f"(one at a time: {serial_limit:.0f}/s), {len(reports)} progress reports with ETA")
+
+    # Without a model every item degrades to the rule-based analysis
+    jsonl_path = os.path.join(workdir, 'queued.jsonl')
+    with open(jsonl_path, 'w') as f:
+        for i in range(5):
+            f.write(json.dumps({'application_id': f"A{i}", 'income': 40000 + i, 'credit_score': 690,
+                                'loan_amount': 12000, 'dti_ratio': 30, 'employment_status': 'employed'}) + "\n")
+    offline = LoanApprovalModel(host='http://127.0.0.1:9', response_cache=ResponseCache())
+    fallback_checkpoint = os.path.join(workdir, 'offline.jsonl')
+    progress = BatchAnalyzer(offline, workers=2).run(jsonl_path, fallback_checkpoint)
+    records = [json.loads(line) for line in open(fallback_checkpoint)]
+    assert progress.fallbacks == 5 and {r['id'] for r in records} == {f"A{i}" for i in range(5)}
+    assert all(r['analysis'].startswith("Analysis for application") and r['status'] == 'fallback' for r in records)
+    print("✅ Model unavailable: every item fell back to the rule-based analysis")
+
+    # Fallback answers are kept on request, and otherwise retried with the model once it is back
+    assert BatchAnalyzer(offline, retry_fallbacks=False).run(jsonl_path, fallback_checkpoint).skipped == 5
+    assert load_checkpoint(fallback_checkpoint) == set()
+    progress = BatchAnalyzer(model, workers=2).run(jsonl_path, fallback_checkpoint)
+    records = [json.loads(line) for line in open(fallback_checkpoint)]
+    assert progress.skipped == 0 and progress.completed == 5 and progress.fallbacks == 0
+    assert [r['status'] for r in records[5:]] == ['ok'] * 5 and all(r['source'] == 'model' for r in records[5:])
+    assert load_checkpoint(fallback_checkpoint) == {f"A{i}" for i in range(5)}
+    print("✅ Resumed run retried the 5 fallback analyses with the model")
+    stub.stop()
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+    import traceback
+    traceback.print_exc()
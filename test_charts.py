@@ -0,0 +1,84 @@
+import sys
+import os
+import time
+
+# Add modules to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+try:
+    from benchmark import generate_loan_data
+    from modules import utils
+
+    df = generate_loan_data(1_000_000)
+    small = df.head(2000)
+
+    # Small data keeps every point; large data is binned server-side
+    raw = utils.build_income_vs_credit_figure(small)
+    assert sum(len(trace.x) for trace in raw.data) == len(small)
+    start = time.perf_counter()
+    dense = utils.build_income_vs_credit_figure(df)
+    elapsed = time.perf_counter() - start
+    points = sum(len(trace.x) for trace in dense.data)
+    assert points <= 2 * utils.DENSITY_BINS ** 2
+    binned = utils.income_credit_density(df)
+    assert binned['Applications'].sum() == len(df)
+    assert binned.groupby('Approval')['Applications'].sum().to_dict() == df['Approval'].value_counts().to_dict()
+    print(f"✅ {len(df):,} rows rendered as {points:,} binned points in {elapsed:.2f}s "
+          f"({len(dense.to_json()) / 1e6:.2f} MB figure)")
+
+    # Missing incomes, credit scores, loan amounts and labels (as ingest can add) are left out quietly
+    import warnings
+    gaps = small.copy()
+    gaps.loc[gaps.index[:10], 'Income'] = float('nan')
+    gaps.loc[gaps.index[10:15], 'Credit_Score'] = float('nan')
+    gaps.loc[gaps.index[15:20], 'Approval'] = None
+    gaps.loc[gaps.index[20:40], 'Loan_Amount'] = float('nan')
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        with_gaps = utils.income_credit_density(gaps)
+    assert with_gaps['Applications'].sum() == len(gaps) - 20
+    assert with_gaps[['Income', 'Credit_Score']].notna().all().all()
+    # Only cells whose every row lacks a loan amount have no average
+    assert with_gaps['Avg_DTI_Ratio'].notna().all() and with_gaps['Avg_Loan_Amount'].isna().sum() <= 20
+    assert with_gaps['Avg_Loan_Amount'].notna().sum() > len(with_gaps) - 20
+    assert with_gaps['Income'].min() >= gaps['Income'].min() and with_gaps['Income'].max() <= gaps['Income'].max()
+    print("✅ Density skips rows with a missing income, credit score or label, without warnings")
+
+    # Stratified sample keeps the approval mix within the point budget
+    sample = utils.stratified_sample(df)
+    assert len(sample) <= utils.SAMPLE_POINT_BUDGET + 2
+    share = (sample['Approval'] == 'Approved').mean() - (df['Approval'] == 'Approved').mean()
+    assert abs(share) < 0.01, share
+    print(f"✅ Stratified sample of {len(sample):,} points keeps the approval share")
+
+    # Figures are cached per dataset key
+    built = []
+    first = utils._cached_figure(('test', 'v1'), lambda: built.append(1) or utils.build_approval_figure(df))
+    second = utils._cached_figure(('test', 'v1'), lambda: built.append(1) or utils.build_approval_figure(df))
+    assert first is second and len(built) == 1
+    print("✅ Figures cached by dataset key")
+
+    # Sessions hitting, inserting and evicting at once never corrupt the shared cache
+    import threading
+    errors = []
+
+    def session(worker):
+        try:
+            for i in range(300):
+                figure = utils._cached_figure(('concurrent', (worker + i) % (2 * utils.FIGURE_CACHE_SIZE)), dict)
+                assert isinstance(figure, dict)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=session, args=(w,)) for w in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors and len(utils._figure_cache) <= utils.FIGURE_CACHE_SIZE, errors
+    print("✅ 8 concurrent sessions shared the figure cache without errors")
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+    import traceback
+    traceback.print_exc()
@@ -0,0 +1,72 @@
+import sys
+import os
+import shutil
+import tempfile
+import time
+
+# Add modules to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+try:
+    import numpy as np
+    import pandas as pd
+    from sklearn.ensemble import GradientBoostingClassifier
+    from sklearn.model_selection import train_test_split
+    from modules.classifier import ApprovalClassifier, classifier_path, load_or_train_classifier, main
+    from modules.data_loader import FEATURE_COLUMNS, LoanDataLoader
+
+    # Compiled inference equals sklearn's predict_proba on held-out rows
+    pipeline = LoanDataLoader('loan_data.csv').feature_pipeline()
+    X = pipeline.matrix(FEATURE_COLUMNS)
+    y = pipeline.target()
+    X_train, X_test, y_train, _ = train_test_split(X, y, test_size=0.2, stratify=y, random_state=0)
+    model = GradientBoostingClassifier(n_estimators=50, max_depth=3, random_state=0).fit(X_train, y_train)
+    classifier = ApprovalClassifier.from_sklearn(model)
+    expected = model.predict_proba(X_test)[:, 1]
+    assert np.allclose(classifier.predict_proba(X_test), expected, rtol=0, atol=1e-9)
+
+    holdout = X_test[:500]
+    single = [classifier.predict_proba_one({'income': row[0], 'credit_score': row[1], 'loan_amount': row[2],
+                                            'dti_ratio': row[3],
+                                            'employment_status': 'employed' if row[4] else 'unemployed'})
+              for row in holdout]
+    assert np.allclose(single, expected[:500], rtol=0, atol=1e-9)
+    print(f"✅ predict_proba and predict_proba_one match sklearn on {len(X_test)} held-out rows")
+
+    # Persisted next to the CSV, reused while the data is unchanged, retrained when it changes
+    workdir = tempfile.mkdtemp()
+    data_path = os.path.join(workdir, 'loan_data.csv')
+    raw = pd.read_csv('loan_data.csv')
+    raw.iloc[:6000].to_csv(data_path, index=False)
+    trained = load_or_train_classifier(LoanDataLoader(data_path, use_cache=False))
+    assert os.path.exists(classifier_path(data_path))
+    reloaded = load_or_train_classifier(LoanDataLoader(data_path, use_cache=False))
+    assert reloaded.metadata['trained_at'] == trained.metadata['trained_at']
+    assert np.array_equal(reloaded.predict_proba(X_test[:100]), trained.predict_proba(X_test[:100]))
+
+    time.sleep(0.01)
+    raw.iloc[:5000].to_csv(data_path, index=False)
+    retrained = load_or_train_classifier(LoanDataLoader(data_path, use_cache=False))
+    assert retrained.metadata['trained_at'] != trained.metadata['trained_at']
+    assert retrained.metadata['training_rows'] == 4000 and trained.metadata['training_rows'] == 4800
+    print("✅ Classifier reloaded while the CSV is unchanged and retrained after it changed")
+
+    # The batch CLI derives features like training does, so it agrees with predict_proba_one
+    input_path = os.path.join(workdir, 'applications.csv')
+    output_path = os.path.join(workdir, 'predictions.csv')
+    raw.iloc[6000:6300].to_csv(input_path, index=False)
+    main(['predict', input_path, output_path, '--model-data', data_path, '--chunksize', '128'])
+    predicted = pd.read_csv(output_path)
+    single = [retrained.predict_proba_one({'income': row.Income, 'credit_score': row.Credit_Score,
+                                           'loan_amount': row.Loan_Amount, 'dti_ratio': row.DTI_Ratio,
+                                           'employment_status': row.Employment_Status})
+              for row in predicted.itertuples()]
+    assert len(predicted) == 300 and np.allclose(predicted['Approval_Probability'], single, rtol=0, atol=1e-9)
+    print("✅ CLI predictions over 3 chunks match predict_proba_one")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+    import traceback
+    traceback.print_exc()
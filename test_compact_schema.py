@@ -0,0 +1,57 @@
+import sys
+import os
+
+# Add modules to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+try:
+    import numpy as np
+    import pandas as pd
+    from modules.data_loader import LoanDataLoader
+    from modules.retrieval import PurposeIndex
+    from modules.scoring import score_applications
+    from modules.segment_cube import SegmentCube
+
+    compact = LoanDataLoader('loan_data.csv')
+    compact.load_data()
+    plain = LoanDataLoader('loan_data.csv', use_cache=False, compact=False)
+    plain.load_data()
+
+    # At least 3x less resident memory per loaded dataset
+    report = compact.memory_report()
+    baseline = plain.memory_report()
+    ratio = baseline['total_bytes'] / report['total_bytes']
+    assert ratio >= 3, ratio
+    assert report['columns']['Approval']['dtype'] == 'category'
+    print(f"✅ {report['rows']:,} rows in {report['total_bytes'] / 1e6:.2f} MB "
+          f"({report['bytes_per_row']:.0f} B/row) vs {baseline['total_bytes'] / 1e6:.2f} MB: {ratio:.1f}x smaller")
+
+    # Same values: categories decode to the original strings, narrowed numbers round-trip
+    for column in ('Text', 'Employment_Status', 'Approval', 'Income', 'Credit_Score', 'Loan_Amount'):
+        assert (compact.df[column].astype(plain.df[column].dtype) == plain.df[column]).all(), column
+    assert np.allclose(compact.df['DTI_Ratio'], plain.df['DTI_Ratio'], atol=1e-4)
+    print("✅ Compact columns hold the original values")
+
+    # Downstream results are unchanged
+    assert compact.get_approval_stats() == plain.get_approval_stats()
+    grouped = compact.get_grouped_stats(('Income', 'Credit_Score', 'Loan_Amount'), ('count', 'mean', 'min', 'max'))
+    assert grouped == plain.get_grouped_stats(('Income', 'Credit_Score', 'Loan_Amount'), ('count', 'mean', 'min', 'max'))
+    pd.testing.assert_frame_equal(score_applications(compact.df), score_applications(plain.df))
+    compact_features, compact_target = compact.preprocess_data()
+    plain_features, plain_target = plain.preprocess_data()
+    assert (compact_target == plain_target).all() and compact_target.dtype == plain_target.dtype
+    assert (compact_features['Credit_Score_Group'] == plain_features['Credit_Score_Group']).all()
+    assert np.array_equal(SegmentCube.build(compact.df).counts, SegmentCube.build(plain.df).counts)
+    assert PurposeIndex.build(compact.df).search("solar panels") == PurposeIndex.build(plain.df).search("solar panels")
+    print("✅ Stats, scoring, derived features, segment cube and retrieval unchanged")
+
+    # Reloading from the columnar cache keeps the compact schema
+    cached = LoanDataLoader('loan_data.csv')
+    cached.load_data()
+    assert cached.memory_report()['total_bytes'] == report['total_bytes']
+    print("✅ Columnar cache round-trips the compact schema")
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+    import traceback
+    traceback.print_exc()
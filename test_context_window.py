@@ -0,0 +1,59 @@
+import sys
+import os
+
+# Add modules to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+N_TURNS = 200
+
+try:
+    from ollama_stub import OllamaStubServer
+    from modules.chat_engine import LoanApprovalChatEngine
+    from modules.context_window import ConversationWindow, estimate_tokens
+    from modules.model_handler import LoanApprovalModel
+    from modules.registry import get_shared_resources
+
+    stub = OllamaStubServer().start()
+    engine = LoanApprovalChatEngine('loan_data.csv', shared=get_shared_resources('loan_data.csv'))
+    engine.model_handler = LoanApprovalModel(host=stub.url)
+
+    # Follow-up questions see the previous exchange
+    engine.process_message("I earn 60000 and want a business loan for a food truck.")
+    engine.process_message("What about my chances?")
+    messages = stub.requests[-1]['payload']['messages']
+    assert [m['role'] for m in messages] == ['system', 'user', 'assistant', 'user']
+    assert "food truck" in messages[1]['content'] and messages[-1]['content'].endswith("What about my chances?")
+    print("✅ Follow-up prompt carries the previous turn")
+
+    # A long session: prompt size stays within budget, old turns are summarized
+    prompt_tokens = []
+    for i in range(N_TURNS):
+        engine.process_message(f"Question {i}: how does my credit score of {600 + i} affect approval?")
+        prompt_tokens.append(engine.last_prompt_report['prompt_tokens'])
+        assert engine.last_prompt_report['context_tokens'] <= engine.context_window.prompt_budget
+    report = engine.last_prompt_report
+    assert max(prompt_tokens[N_TURNS // 2:]) <= max(prompt_tokens[:N_TURNS // 2]) + 8, "prompt keeps growing"
+    assert report['turns_summarized'] > 0 and "CONVERSATION SUMMARY" in stub.requests[-1]['payload']['messages'][1]['content']
+    assert len(engine.conversation_history) <= 10
+    print(f"✅ {N_TURNS} turns: prompt peaked at {max(prompt_tokens)} tokens "
+          f"(budget {report['budget']} for context), {report['turns_summarized']} turns summarized, "
+          f"{report['turns_included']} kept verbatim")
+
+    # Budgets hold even for oversized inputs
+    window = ConversationWindow(prompt_budget=300, history_budget=120, summary_budget=40)
+    for i in range(50):
+        window.add_turn("long question " * 40, "long answer. " * 200)
+    context, report = window.build("data " * 500, "retrieved " * 500)
+    assert estimate_tokens(context) <= 300, report
+    print(f"✅ Oversized context trimmed to {estimate_tokens(context)} of 300 tokens")
+
+    engine.clear_history()
+    assert not engine.conversation_history and not engine.context_window.turns
+    print("✅ Clearing history resets the context window")
+
+    stub.stop()
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+    import traceback
+    traceback.print_exc()
@@ -0,0 +1,111 @@
+import sys
+import os
+import shutil
+import tempfile
+
+# Add modules to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+try:
+    import pandas as pd
+    from modules import data_cache
+    from modules.data_loader import LoanDataLoader
+
+    workdir = tempfile.mkdtemp()
+    data_path = os.path.join(workdir, 'loan_data.csv')
+    raw = pd.read_csv('loan_data.csv').iloc[:3000]
+    raw.to_csv(data_path, index=False)
+
+    # Count CSV parses behind load_data
+    parses = []
+    read_csv = pd.read_csv
+
+    def counting_read_csv(*args, **kwargs):
+        parses.append(args[0] if args else kwargs.get('filepath_or_buffer'))
+        return read_csv(*args, **kwargs)
+
+    pd.read_csv = counting_read_csv
+
+    def load():
+        before = len(parses)
+        df = LoanDataLoader(data_path).load_data()
+        return df, len(parses) > before
+
+    # First load parses the CSV and writes the cache; the next one skips parsing
+    first, parsed = load()
+    assert parsed and os.path.exists(data_cache.sidecar_path(data_path, 'feather'))
+    cached, parsed = load()
+    assert not parsed and cached.equals(first)
+    print("✅ Second load served from the columnar cache without parsing the CSV")
+
+    # A touched but unchanged file stays cached (content hash decides)
+    stat = os.stat(data_path)
+    os.utime(data_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000_000))
+    _, parsed = load()
+    assert not parsed
+    _, parsed = load()
+    assert not parsed
+    print("✅ Touched file with the same contents still served from the cache")
+
+    # Changed size, or same size with new contents and mtime, rebuild the cache
+    raw.iloc[:2000].to_csv(data_path, index=False)
+    df, parsed = load()
+    assert parsed and len(df) == 2000
+    _, parsed = load()
+    assert not parsed
+    with open(data_path, 'rb') as f:
+        content = f.read()
+    last_line = content.rstrip(b'\n').rsplit(b'\n', 1)[1]
+    flipped = last_line.replace(b'Approved', b'Rejected') if b'Approved' in last_line else last_line.replace(b'Rejected', b'Approved')
+    with open(data_path, 'wb') as f:
+        f.write(content[:len(content) - len(last_line) - 1] + flipped + b'\n')
+    stat = os.stat(data_path)
+    os.utime(data_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 20_000_000_000))
+    assert os.path.getsize(data_path) == len(content)
+    df, parsed = load()
+    assert parsed and df['Approval'].iloc[-1] == flipped.rsplit(b',', 1)[1].decode()
+    print("✅ Cache rebuilt after the CSV changed size and after a same-size edit")
+
+    # A new cache format version invalidates existing caches
+    _, parsed = load()
+    assert not parsed
+    data_cache.CACHE_FORMAT_VERSION += 1
+    try:
+        _, parsed = load()
+        assert parsed
+        _, parsed = load()
+        assert not parsed
+    finally:
+        data_cache.CACHE_FORMAT_VERSION -= 1
+    print("✅ Cache rebuilt after a format version change")
+
+    pd.read_csv = read_csv
+
+    # A failed sidecar write leaves the previous file in place and no temporary file behind
+    target = os.path.join(workdir, '.loan_data.csv.test.json')
+
+    def write(tmp_path, text='{"ok": 1}', fail=False):
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        if fail:
+            raise OSError("disk full")
+
+    data_cache.atomic_write(target, write)
+    failing_write = lambda tmp_path: write(tmp_path, '{"ok"', fail=True)
+
+    try:
+        data_cache.atomic_write(target, failing_write)
+        raise AssertionError("the write error should propagate")
+    except OSError:
+        pass
+    with open(target) as f:
+        assert f.read() == '{"ok": 1}'
+    assert not [name for name in os.listdir(workdir) if '.tmp' in name]
+    print("✅ Failed sidecar write left the previous file intact")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+    import traceback
+    traceback.print_exc()
@@ -0,0 +1,42 @@
+import sys
+import os
+
+# Add modules to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+try:
+    from benchmark import bench_fallback
+    from modules.fallback import DEFAULT_INTENTS, FallbackResponder
+    from modules.registry import get_shared_resources
+
+    responder = FallbackResponder()
+    expected = {
+        "Hello there": 'greeting',
+        "What are the approval criteria?": 'approval_criteria',
+        "How is my credit score used?": 'credit_score',
+        "Does salary matter?": 'income',
+        "What DTI is acceptable?": 'dti',
+        "Can I get a business loan?": 'business',
+        "What can you do?": 'help',
+        "Tell me about this thing": None,  # 'hi' inside 'this'/'thing' is not a greeting
+    }
+    for prompt, intent in expected.items():
+        assert responder.match(prompt) == intent, (prompt, responder.match(prompt))
+    print(f"✅ {len(expected)} prompts routed to the expected intents")
+
+    # Shared model handler quotes figures computed from the dataset
+    shared = get_shared_resources('loan_data.csv')
+    answer = shared.model_handler._get_fallback_response("What income do I need?")
+    assert f"${shared.stats['avg_income_approved']:,.0f}" in answer, answer
+    print(f"✅ Income answer quotes dataset figure: {answer.splitlines()[-1]}")
+
+    # Matching cost does not grow with the size of the intent table
+    small = bench_fallback(len(DEFAULT_INTENTS), repeat=500)['matcher_us']
+    large = bench_fallback(1000, repeat=500)['matcher_us']
+    assert large < 2 * small, (small, large)
+    print(f"✅ Fallback latency {small:.1f} us with {len(DEFAULT_INTENTS)} intents, {large:.1f} us with 1000")
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+    import traceback
+    traceback.print_exc()
@@ -0,0 +1,123 @@
+import sys
+import os
+import time
+
+# Add modules to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+PROBE_INTERVAL = 0.2
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+try:
+    from ollama_stub import OllamaStubServer
+    from modules.health import OPEN, CLOSED, HALF_OPEN, CircuitBreaker, OllamaHealthMonitor
+    from modules.model_handler import LoanApprovalModel
+    from modules.response_cache import ResponseCache
+    from modules.router import ModelRouter
+
+    # Session start no longer waits on the network, even for an unroutable host
+    start = time.perf_counter()
+    LoanApprovalModel(host="http://10.255.255.1:11434")
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.5, elapsed  # the probe alone would take its 2 s timeout
+    print(f"✅ Model handler constructed in {elapsed * 1000:.1f} ms against an unreachable host")
+
+    stub = OllamaStubServer().start()
+    port = stub.server_address[1]
+    monitor = OllamaHealthMonitor(host=stub.url, interval=PROBE_INTERVAL,
+                                  breaker=CircuitBreaker(failure_threshold=3, reset_timeout=60)).start()
+    model = LoanApprovalModel(host=stub.url, health_monitor=monitor)
+    assert model.generate_response("What is a good credit score?") == stub.response_text
+    print("✅ Healthy server answers through the model")
+
+    # Requests failing in a row trip the breaker; later calls fall back with no wait
+    stub.fail_requests = True
+    for i in range(3):
+        model.generate_response(f"Failing question {i}")
+    assert monitor.breaker.state == OPEN and not model.model_available
+    calls_before = len(stub.requests)
+    start = time.perf_counter()
+    answer = model.generate_response("Tell me about income requirements")
+    fallback_ms = (time.perf_counter() - start) * 1000
+    assert answer == model._get_fallback_response("Tell me about income requirements")
+    assert len(stub.requests) == calls_before, "an open circuit must not call the server"
+    print(f"✅ Breaker opened after 3 failures; fallback served in {fallback_ms:.2f} ms")
+
+    # The server going away is noticed by the background probe
+    stub.fail_requests = False
+    monitor.breaker.record_success()
+    stub.stop()
+    assert wait_for(lambda: monitor.breaker.state == OPEN), "probe should open the circuit"
+    print("✅ Background probe detected the server going down")
+
+    # ...and recovery happens on its own once it is back
+    stub = OllamaStubServer(port=port).start()
+    assert wait_for(lambda: monitor.breaker.state == CLOSED), "probe should close the circuit"
+    assert model.generate_response("Is my DTI ratio too high?") == stub.response_text
+    print(f"✅ Recovered automatically: {monitor.status()['state']}, last probe "
+          f"{monitor.last_probe['latency'] * 1000:.1f} ms")
+
+    # Half-open lets exactly one trial through; its outcome closes or re-opens the circuit
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+    breaker.trip()
+    assert not breaker.allow_request()
+    time.sleep(0.15)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request(), "the first caller gets the trial"
+    assert not any(breaker.allow_request() for _ in range(5)), "others wait for the trial"
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow_request()
+    time.sleep(0.15)
+    assert breaker.allow_request() and not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED and all(breaker.allow_request() for _ in range(5))
+    # A trial that never reports back frees its slot after another reset_timeout
+    breaker.trip()
+    time.sleep(0.15)
+    assert breaker.allow_request() and not breaker.allow_request()
+    time.sleep(0.15)
+    assert breaker.allow_request()
+    print("✅ Half-open circuit let one trial request through and rejected the rest")
+
+    # Streamed chat through the router spends the half-open trial on a real request
+    def chat_calls():
+        return sum(request['path'] == '/api/chat' for request in stub.requests)
+
+    trial_monitor = OllamaHealthMonitor(host=stub.url, interval=60,
+                                        breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.1)).start()
+    assert wait_for(lambda: trial_monitor.last_probe is not None)
+    router = ModelRouter(LoanApprovalModel(host=stub.url, health_monitor=trial_monitor, response_cache=ResponseCache()))
+    prompt = "Walk me through how lenders weigh my income against my existing debts"
+    trial_monitor.breaker.trip()
+    time.sleep(0.15)
+    calls_before = chat_calls()
+    assert ''.join(router.generate_response_stream(prompt)) == stub.response_text
+    assert chat_calls() == calls_before + 1 and trial_monitor.breaker.state == CLOSED
+    # A cache hit does not take the trial; a stream arriving while it is taken falls back
+    trial_monitor.breaker.trip()
+    time.sleep(0.15)
+    assert router.generate_response(prompt) == stub.response_text and trial_monitor.breaker.state == HALF_OPEN
+    assert trial_monitor.try_acquire(), "the cache hit must leave the trial free"
+    calls_before = chat_calls()
+    other = "How do lenders treat income from freelance work and side projects"
+    assert ''.join(router.generate_response_stream(other)) == router._get_fallback_response(other)
+    assert chat_calls() == calls_before
+    trial_monitor.stop()
+    print("✅ Half-open: streamed chat sent the trial request and closed the circuit; cache hits leave the trial free")
+
+    monitor.stop()
+    stub.stop()
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+    import traceback
+    traceback.print_exc()
@@ -0,0 +1,124 @@
+import sys
+import os
+import math
+import shutil
+import tempfile
+import time
+
+# Add modules to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+BASE_ROWS = 20_000
+
+try:
+    import pandas as pd
+    from benchmark import generate_loan_data
+    from modules.chat_engine import LoanApprovalChatEngine
+    from modules.data_loader import LoanDataLoader, apply_compact_schema
+    from modules.registry import SharedResources
+
+    raw = pd.read_csv('loan_data.csv')
+    workdir = tempfile.mkdtemp()
+    data_path = os.path.join(workdir, 'loan_data.csv')
+    raw.iloc[:BASE_ROWS].to_csv(data_path, index=False)
+    shared = SharedResources(data_path)
+    engine = LoanApprovalChatEngine(data_path, shared=shared)
+    first_cube = shared.segment_cube
+    cube_before = int(first_cube.counts.sum())
+
+    # New decisions appended to the dataset itself; a half-written line waits for the next poll
+    watcher = shared.watch(data_path, interval=3600)
+    with open(data_path, 'a') as f:
+        raw.iloc[BASE_ROWS:BASE_ROWS + 2000].to_csv(f, header=False, index=False)
+        f.write("Partial purpose,5000")
+    assert watcher.poll() == 2000 and shared.stats['total_applications'] == BASE_ROWS + 2000
+    with open(data_path, 'a') as f:
+        f.write("0,700,1000,20.5,employed,Approved\n")
+    assert watcher.poll() == 1 and shared.stats['total_applications'] == BASE_ROWS + 2001
+    assert shared.df['Text'].iloc[-1] == "Partial purpose" and shared.df['Income'].iloc[-1] == 50000
+    print("✅ Rows appended to the dataset file ingested; incomplete line held until finished")
+
+    # A directory of delta files: each file once, in-progress (.tmp / dot) files ignored
+    delta_dir = os.path.join(workdir, 'deltas')
+    os.makedirs(delta_dir)
+    rest = raw.iloc[BASE_ROWS + 2000:]
+    rest.iloc[:1000].to_csv(os.path.join(delta_dir, '001.csv'), index=False)
+    rest.iloc[1000:].to_json(os.path.join(delta_dir, '002.jsonl'), orient='records', lines=True)
+    rest.iloc[:10].to_csv(os.path.join(delta_dir, '003.csv.tmp'), index=False)
+    shared.watch(delta_dir, interval=3600)
+    assert shared.delta_watcher.poll() == len(rest) and shared.delta_watcher.poll() == 0
+    print(f"✅ Delta directory: {len(rest)} rows from 2 files, partial file skipped")
+
+    # Running aggregates match a full reload of the same rows
+    combined = pd.concat([raw, pd.DataFrame([{'Text': "Partial purpose", 'Income': 50000, 'Credit_Score': 700,
+                                              'Loan_Amount': 1000, 'DTI_Ratio': 20.5,
+                                              'Employment_Status': 'employed', 'Approval': 'Approved'}])])
+    full = LoanDataLoader('unused.csv')
+    full.df = apply_compact_schema(combined.reset_index(drop=True))
+    expected = full.get_approval_stats()
+    for key, value in expected.items():
+        assert math.isclose(shared.stats[key], value, rel_tol=1e-9), (key, shared.stats[key], value)
+    assert int(shared.segment_cube.counts.sum()) == cube_before + len(raw) - BASE_ROWS + 1
+    # Each ingest publishes a new cube; one already handed out keeps its counts
+    assert int(first_cube.counts.sum()) == cube_before and engine.segment_cube is shared.segment_cube
+    assert isinstance(shared.df['Approval'].dtype, pd.CategoricalDtype)
+    print(f"✅ Incremental stats match a full reload ({expected['total_applications']} applications)")
+
+    # Sessions read the refreshed context; ingestion never holds up a request
+    assert f"Total Applications: {expected['total_applications']}" in engine.data_context
+    with shared._ingest_lock:
+        start = time.perf_counter()
+        context = engine.build_context("What credit score do approved applicants have?")
+        assert f"Total Applications: {expected['total_applications']}" in context.data_context
+    print(f"✅ Existing session sees the new data context; built in {(time.perf_counter() - start) * 1000:.0f} ms "
+          f"while ingestion held its lock")
+
+    # Stats cost O(new rows): merging a small batch is far cheaper than recomputing
+    big = LoanDataLoader('unused.csv')
+    big.df = apply_compact_schema(generate_loan_data(1_000_000))
+    start = time.perf_counter()
+    big.get_approval_stats()
+    full_s = time.perf_counter() - start
+    batch = generate_loan_data(1_000)
+    start = time.perf_counter()
+    big.append_rows(batch)
+    append_s = time.perf_counter() - start
+    start = time.perf_counter()
+    stats = big.get_approval_stats()
+    stats_s = time.perf_counter() - start
+    assert stats['total_applications'] == 1_001_000
+    assert stats_s < full_s / 10 and append_s < full_s, (stats_s, append_s, full_s)
+    print(f"✅ 1M rows + 1k: appended in {append_s * 1000:.0f} ms, stats refreshed in {stats_s * 1000:.2f} ms "
+          f"vs {full_s * 1000:.0f} ms recomputed")
+
+    # A rejected batch changes nothing and is retried; a row without Loan_Amount is accepted
+    bad_dir = os.path.join(workdir, 'bad_deltas')
+    os.makedirs(bad_dir)
+    total = shared.stats['total_applications']
+    loader_rows, cube_rows = len(shared.data_loader.df), int(shared.segment_cube.counts.sum())
+    with open(os.path.join(bad_dir, '001.jsonl'), 'w') as f:
+        f.write('{"Text": "Car", "Income": "abc", "Credit_Score": 700, "Loan_Amount": 1000, '
+                '"DTI_Ratio": 20, "Employment_Status": "employed", "Approval": "Approved"}\n')
+    shared.watch(bad_dir, interval=3600)
+    try:
+        shared.delta_watcher.poll()
+        raise AssertionError("non-numeric Income accepted")
+    except ValueError as e:
+        assert 'Income' in str(e)
+    assert shared.stats['total_applications'] == total and len(shared.data_loader.df) == loader_rows
+    assert len(shared.df) == loader_rows and int(shared.segment_cube.counts.sum()) == cube_rows
+    assert not shared.delta_watcher.seen_files
+    with open(os.path.join(bad_dir, '001.jsonl'), 'w') as f:
+        f.write('{"Text": "Car", "Income": 40000, "Credit_Score": 700, '
+                '"DTI_Ratio": 20, "Employment_Status": "employed", "Approval": "Approved"}\n')
+    assert shared.delta_watcher.poll() == 1 and shared.stats['total_applications'] == total + 1
+    assert len(shared.data_loader.df) == len(shared.df) == loader_rows + 1
+    print("✅ Bad delta rejected without changing any state, then retried; missing Loan_Amount accepted")
+
+    shared.delta_watcher.stop()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+    import traceback
+    traceback.print_exc()
@@ -0,0 +1,76 @@
+import sys
+import os
+import shutil
+import tempfile
+
+# Add modules to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+try:
+    import numpy as np
+    import pandas as pd
+    from modules.data_loader import LoanDataLoader
+    from modules.neighbors import (SimilarApplicantsIndex, _feature_matrix, load_or_build_neighbor_index,
+                                   neighbor_index_path)
+
+    workdir = tempfile.mkdtemp()
+    data_path = os.path.join(workdir, 'loan_data.csv')
+    raw = pd.read_csv('loan_data.csv').iloc[:5000]
+    raw.to_csv(data_path, index=False)
+
+    # The nearest applications agree with a brute-force scan of the normalized rows
+    loader = LoanDataLoader(data_path, use_cache=False)
+    index = load_or_build_neighbor_index(loader)
+    row = raw.iloc[1234]
+    application = {'income': row['Income'], 'credit_score': row['Credit_Score'], 'loan_amount': row['Loan_Amount'],
+                   'dti_ratio': row['DTI_Ratio'], 'employment_status': row['Employment_Status']}
+    result = index.query(application, k=10)
+    X = (_feature_matrix(raw) - index.mean) / index.scale
+    point = X[1234]
+    distances = np.sqrt(((X - point) ** 2).sum(axis=1))
+    expected = np.sort(distances)[:10]
+    assert np.allclose(np.sort(result['neighbors']['Distance'].to_numpy()), expected.round(3), atol=1e-3)
+    assert result['neighbors']['Distance'].iloc[0] == 0.0
+    nearest = raw.loc[result['neighbors'].index]
+    assert (nearest['Income'].to_numpy() == result['neighbors']['Income'].to_numpy()).all()
+    assert result['approved'] == int((nearest['Approval'] == 'Approved').sum())
+    print(f"✅ 10 nearest match a brute-force scan; {result['approval_rate']:.0f}% approved")
+
+    # Saved as plain arrays (no pickle) and reused while the CSV is unchanged
+    path = neighbor_index_path(data_path)
+    with np.load(path, allow_pickle=False) as data:
+        assert {'data', 'mean', 'scale', 'approved', 'row_ids', 'metadata'} < set(data.files)
+        assert any(name.startswith('tree_') for name in data.files)
+    saved_mtime = os.stat(path).st_mtime_ns
+    reloaded = load_or_build_neighbor_index(LoanDataLoader(data_path, use_cache=False))
+    assert os.stat(path).st_mtime_ns == saved_mtime
+    again = reloaded.query(application, k=10)
+    assert again['neighbors'].equals(result['neighbors']) and again['approval_rate'] == result['approval_rate']
+    assert all(np.array_equal(saved, built) for saved, built in zip(reloaded.tree.get_arrays(), index.tree.get_arrays()))
+    assert 'tree_layout' not in reloaded.metadata
+    print("✅ Index reloaded from the .npz sidecar, KD-tree restored from its node arrays, identical results")
+
+    # Node arrays written by another scikit-learn version are not trusted: the tree is rebuilt
+    from modules import neighbors
+    version = neighbors.sklearn.__version__
+    neighbors.sklearn.__version__ = version + '.other'
+    try:
+        rebuilt_tree = SimilarApplicantsIndex.load(path)
+    finally:
+        neighbors.sklearn.__version__ = version
+    assert rebuilt_tree.query(application, k=10)['neighbors'].equals(result['neighbors'])
+    print("✅ Index saved under another scikit-learn version rebuilds its KD-tree with identical results")
+
+    # A changed CSV rebuilds the index
+    raw.iloc[:4000].to_csv(data_path, index=False)
+    rebuilt = load_or_build_neighbor_index(LoanDataLoader(data_path, use_cache=False))
+    assert len(rebuilt) == 4000 and rebuilt.metadata['rows'] == 4000
+    assert len(SimilarApplicantsIndex.load(path)) == 4000
+    print("✅ Stale index rebuilt after the CSV changed")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+    import traceback
+    traceback.print_exc()
@@ -0,0 +1,69 @@
+import sys
+import os
+import shutil
+import tempfile
+import time
+
+# Add modules to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+try:
+    from modules.model_handler import GENERATION_OPTIONS
+    from modules.response_cache import ResponseCache, make_cache_key
+
+    # Hits and misses are counted
+    cache = ResponseCache()
+    assert cache.get('a') is None
+    cache.put('a', "answer a")
+    assert cache.get('a') == "answer a" and cache.get('b') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 2, 1) and abs(stats['hit_rate'] - 1 / 3) < 1e-9
+    print(f"✅ Counters: {stats['hits']} hit, {stats['misses']} misses")
+
+    # Entries expire after the TTL
+    short = ResponseCache(ttl_seconds=0.1)
+    short.put('a', "answer a")
+    assert short.get('a') == "answer a"
+    time.sleep(0.15)
+    assert short.get('a') is None and short.stats()['size'] == 0
+    print("✅ Entries expire after the TTL")
+
+    # The least recently used entry is evicted at capacity
+    lru = ResponseCache(max_entries=3)
+    for key in ('a', 'b', 'c'):
+        lru.put(key, f"answer {key}")
+    lru.get('a')
+    lru.put('d', "answer d")
+    assert lru.get('b') is None and [lru.get(key) for key in ('a', 'c', 'd')] == ["answer a", "answer c", "answer d"]
+    assert lru.stats()['size'] == 3
+    print("✅ Least recently used entry evicted at capacity")
+
+    # Two instances share answers through the SQLite file
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, 'responses.db')
+    writer = ResponseCache(db_path=db_path)
+    reader = ResponseCache(db_path=db_path)
+    assert reader.get('shared') is None
+    writer.put('shared', "from the other process")
+    assert reader.get('shared') == "from the other process" and reader.stats()['persistent']
+    expired = ResponseCache(ttl_seconds=0.05, db_path=db_path)
+    expired.put('stale', "old")
+    time.sleep(0.1)
+    assert reader.get('stale') is None
+    print("✅ Answers shared between instances through SQLite; expired rows not served")
+
+    # Keys change with the data context and the generation options, not with prompt formatting
+    key = make_cache_key('llama2', "What credit score do I need?", "Total Applications: 24000", GENERATION_OPTIONS)
+    assert key == make_cache_key('llama2', "  what credit score do I need ", "Total Applications: 24000", GENERATION_OPTIONS)
+    assert key != make_cache_key('llama2', "What credit score do I need?", "Total Applications: 24001", GENERATION_OPTIONS)
+    assert key != make_cache_key('llama2', "What credit score do I need?", "Total Applications: 24000",
+                                 {**GENERATION_OPTIONS, 'temperature': 0.7})
+    assert key != make_cache_key('tinyllama', "What credit score do I need?", "Total Applications: 24000", GENERATION_OPTIONS)
+    print("✅ Keys change with data context, options and model")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+    import traceback
+    traceback.print_exc()
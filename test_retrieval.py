@@ -0,0 +1,56 @@
+import sys
+import os
+import shutil
+import tempfile
+import time
+
+# Add modules to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+try:
+    import pandas as pd
+    from modules.data_loader import LoanDataLoader
+    from modules.retrieval import PurposeIndex, load_or_build_retrieval_index, retrieval_index_path
+
+    raw = pd.read_csv('loan_data.csv')
+    index = PurposeIndex.build(raw)
+
+    # A known query finds its purposes first, with their approval figures from the data
+    result = index.search("plumbing vocational training course")
+    top = result['results'][0]
+    assert top['text'] == "I need money to pay for a vocational training course in plumbing.", top
+    rows = raw[raw['Text'] == top['text']]
+    assert top['applications'] == len(rows) and top['approved'] == int((rows['Approval'] == 'Approved').sum())
+    scores = [r['score'] for r in result['results']]
+    assert scores == sorted(scores, reverse=True)
+    print(f"✅ Top hit for the plumbing course: {top['applications']} applications, {top['approval_rate']:.1f}% approved")
+
+    # Empty, stop-word-only and unknown queries return nothing
+    for query in ("", "I need a loan for my", "zzzz qqqq"):
+        assert index.search(query) == {'results': [], 'applications': 0, 'approval_rate': None}, query
+    print("✅ Empty and unmatched queries return no results")
+
+    # The npz sidecar is reused while the CSV is unchanged and rebuilt when it changes
+    workdir = tempfile.mkdtemp()
+    data_path = os.path.join(workdir, 'loan_data.csv')
+    raw[raw['Text'] != top['text']].to_csv(data_path, index=False)
+    built = load_or_build_retrieval_index(LoanDataLoader(data_path, use_cache=False))
+    path = retrieval_index_path(data_path)
+    saved_mtime = os.stat(path).st_mtime_ns
+    reloaded = load_or_build_retrieval_index(LoanDataLoader(data_path, use_cache=False))
+    assert os.stat(path).st_mtime_ns == saved_mtime and reloaded.metadata == built.metadata
+    assert top['text'] not in [r['text'] for r in reloaded.search("plumbing vocational training course")['results']]
+
+    time.sleep(0.01)
+    raw.to_csv(data_path, index=False)
+    rebuilt = load_or_build_retrieval_index(LoanDataLoader(data_path, use_cache=False))
+    assert os.stat(path).st_mtime_ns != saved_mtime and rebuilt.metadata['rows'] == len(raw)
+    assert rebuilt.search("plumbing vocational training course")['results'][0]['text'] == top['text']
+    print("✅ Retrieval sidecar reused while the CSV is unchanged and rebuilt after it changed")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+    import traceback
+    traceback.print_exc()
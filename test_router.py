@@ -0,0 +1,119 @@
+import sys
+import os
+import json
+import tempfile
+import time
+
+# Add modules to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+LARGE_MODEL = 'llama2'
+SMALL_MODEL = 'tinyllama'
+
+try:
+    from ollama_stub import OllamaStubServer
+    from modules.chat_engine import LoanApprovalChatEngine
+    from modules.model_handler import LoanApprovalModel
+    from modules.response_cache import ResponseCache
+    from modules.router import DEFAULT_ROUTES, ModelRouter, Route
+
+    stub = OllamaStubServer(models=[LARGE_MODEL, SMALL_MODEL],
+                            model_delays={LARGE_MODEL: 0.5, SMALL_MODEL: 0.02}).start()
+    large = LoanApprovalModel(LARGE_MODEL, host=stub.url, response_cache=ResponseCache())
+    small = LoanApprovalModel(SMALL_MODEL, host=stub.url, response_cache=ResponseCache(), health_monitor=large.health)
+    routes = dict(DEFAULT_ROUTES)
+    routes['chat'] = Route('chat', 'large', 2.0, hedge_after=0.1)
+    decision_log = os.path.join(tempfile.mkdtemp(), 'routing.jsonl')
+    router = ModelRouter(large, small, routes=routes, decision_log=decision_log)
+
+    def models_called():
+        return [request['payload'].get('model') for request in stub.requests if request['path'] == '/api/chat']
+
+    # Greetings never reach a model
+    start = time.perf_counter()
+    answer = router.generate_response("Hello!")
+    assert answer.startswith("Hello! I'm Uniccon") and not models_called()
+    print(f"✅ Greeting answered by the rules in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    # Short topical questions go to the small model
+    router.generate_response("What credit score do I need?")
+    assert models_called() == [SMALL_MODEL] and router.decisions[-1].served == 'small'
+    print("✅ Short credit question served by the small model")
+
+    # A slow large model is hedged with the small one, which answers within the SLO
+    start = time.perf_counter()
+    router.generate_response("Walk me through how lenders weigh my whole financial situation "
+                             "when several of my accounts changed this year and I plan a move")
+    elapsed = time.perf_counter() - start
+    decision = router.decisions[-1]
+    assert decision.route == 'chat' and decision.hedged and decision.served == 'small' and elapsed < 0.4, decision
+    print(f"✅ Slow large model hedged after 100 ms; small model answered in {elapsed * 1000:.0f} ms")
+
+    # A fast large model answers by itself
+    stub.model_delays[LARGE_MODEL] = 0.01
+    router.generate_response("Explain how lenders compare my application with the rest of their portfolio today")
+    decision = router.decisions[-1]
+    assert decision.served == 'large' and not decision.hedged, decision
+    print("✅ Fast large model served without hedging")
+
+    # Nothing answers within the SLO: the rules take over at the deadline
+    stub.model_delays.update({LARGE_MODEL: 1.0, SMALL_MODEL: 1.0})
+    router.routes['analysis'] = Route('analysis', 'large', 0.3, hedge_after=0.1)
+    start = time.perf_counter()
+    text, source = router.analyze_with_source({'income': 60000, 'credit_score': 710, 'loan_amount': 15000,
+                                               'dti_ratio': 25, 'employment_status': 'employed'})
+    elapsed = time.perf_counter() - start
+    decision = router.decisions[-1]
+    assert source == 'fallback' and text.startswith("Analysis for application") and decision.slo_met, decision
+    assert 0.29 < elapsed < 0.35, elapsed
+    print(f"✅ Both models too slow: rules answered the analysis at {elapsed * 1000:.0f} ms (SLO 300 ms)")
+
+    # Decisions and per-tier latency are recorded for tuning
+    summary = router.summary()
+    assert set(summary['routes']) == {'instant', 'quick', 'chat', 'analysis'}
+    assert summary['routes']['analysis']['served'] == {'rules': 1}
+    assert {'rules', 'small', 'large'} <= set(summary['tiers'])
+    logged = [json.loads(line) for line in open(decision_log)]
+    assert len(logged) == len(router.decisions) == 5 and logged[2]['hedged']
+    print(f"✅ {len(logged)} decisions logged; small p50 {summary['tiers']['small']['p50'] * 1000:.0f} ms, "
+          f"large p50 {summary['tiers']['large']['p50'] * 1000:.0f} ms")
+
+    # Attempts left running past a deadline are bounded: a full router answers from the rules at once
+    busy = ModelRouter(large, small, routes=router.routes, max_workers=2)
+    busy.analyze_with_source({'income': 60000, 'credit_score': 710, 'loan_amount': 15000,
+                              'dti_ratio': 25, 'employment_status': 'employed'})
+    start = time.perf_counter()
+    busy.generate_response("What credit score do I need for a car loan?")
+    elapsed = time.perf_counter() - start
+    decision = busy.decisions[-1]
+    assert decision.served == 'rules' and 'busy' in decision.error and elapsed < 0.1, (decision, elapsed)
+    print(f"✅ Two abandoned attempts still running: next request answered by the rules in {elapsed * 1000:.1f} ms")
+
+    # Default single-model setup: quick questions take the large model's SLO, and a slow model is waited for
+    stub.model_delays[LARGE_MODEL] = 0.5
+    single_routes = dict(DEFAULT_ROUTES)
+    single_routes['quick'] = Route('quick', 'small', 0.2)
+    single_routes['chat'] = Route('chat', 'large', 0.3, hedge_after=0.1)
+    single = ModelRouter(LoanApprovalModel(LARGE_MODEL, host=stub.url, response_cache=ResponseCache()),
+                         routes=single_routes)
+    single.generate_response("What credit score do I need?")
+    decision = single.decisions[-1]
+    assert decision.route == 'quick' and decision.served == 'large' and decision.slo_seconds == 0.3, decision
+    single.generate_response("Explain how lenders compare my application with the rest of their portfolio")
+    decision = single.decisions[-1]
+    assert decision.served == 'large' and not decision.slo_met and decision.seconds >= 0.5, decision
+    print(f"✅ Single model: quick question held to the chat SLO, slow answer served after "
+          f"{decision.seconds * 1000:.0f} ms instead of the rules")
+
+    # The chat engine uses the router as its model handler
+    engine = LoanApprovalChatEngine('loan_data.csv')
+    engine.model_handler = router
+    assert engine.process_message("hi").startswith("Hello! I'm Uniccon")
+    assert router.decisions[-1].route == 'instant'
+    print("✅ Chat engine routes through the router")
+    stub.stop()
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+    import traceback
+    traceback.print_exc()
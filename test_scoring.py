@@ -0,0 +1,57 @@
+import sys
+import os
+import tempfile
+
+# Add modules to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+try:
+    import pandas as pd
+    from modules.registry import create_session_engine
+    from modules.scoring import score_applications, score_csv, FACTOR_COLUMNS
+
+    engine = create_session_engine('loan_data.csv')
+    df = pd.read_csv('loan_data.csv')
+
+    # Every threshold boundary, on both sides, plus the real data
+    edges = pd.DataFrame({
+        'Income': [50000, 50001, 75000, 75001, 0, 49999.5],
+        'Credit_Score': [650, 651, 700, 701, 750, 751],
+        'DTI_Ratio': [19.99, 20, 34.99, 35, 49.99, 50],
+        'Employment_Status': ['employed', 'Employed', 'unemployed', 'EMPLOYED', '', 'retired'],
+    })
+    applications = pd.concat([df.sample(3000, random_state=0), edges], ignore_index=True)
+
+    batch = score_applications(applications)
+    for i, row in enumerate(applications.itertuples(index=False)):
+        expected = engine.get_approval_analysis({
+            'income': row.Income,
+            'credit_score': row.Credit_Score,
+            'dti_ratio': row.DTI_Ratio,
+            'employment_status': row.Employment_Status,
+        })
+        scored = batch.iloc[i]
+        assert scored['score'] == expected['score'], (i, scored['score'], expected['score'])
+        assert [scored[column] for column in FACTOR_COLUMNS] == expected['factors'], i
+        assert scored['recommendation'] == expected['recommendation'], i
+    print(f"✅ Batch scores match the per-row path for {len(applications)} applications")
+
+    # NumPy column sets with the form field names
+    columns = {'income': applications['Income'].to_numpy(),
+               'credit_score': applications['Credit_Score'].to_numpy(),
+               'dti_ratio': applications['DTI_Ratio'].to_numpy(),
+               'employment_status': applications['Employment_Status'].to_numpy()}
+    assert score_applications(columns)['score'].tolist() == batch['score'].tolist()
+    print("✅ NumPy column input matches DataFrame input")
+
+    with tempfile.TemporaryDirectory() as directory:
+        output_path = os.path.join(directory, 'scored.csv')
+        rows = score_csv('loan_data.csv', output_path, chunksize=5000, workers=2)
+        scored_csv = pd.read_csv(output_path)
+        assert rows == len(df) and scored_csv['score'].tolist() == score_applications(df)['score'].tolist()
+    print(f"✅ Chunked multi-process CSV scoring wrote {rows} rows")
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+    import traceback
+    traceback.print_exc()
@@ -0,0 +1,136 @@
+import sys
+import os
+import json
+import http.client
+import threading
+import time
+
+# Add modules to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+
+def request(server, method, path, payload=None):
+    conn = http.client.HTTPConnection(server.host, server.port, timeout=30)
+    body = json.dumps(payload) if payload is not None else None
+    conn.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    if response.getheader('Content-Type', '').startswith('application/json'):
+        data = json.loads(data)
+    return response.status, data, response
+
+
+try:
+    from ollama_stub import OllamaStubServer
+    from modules.registry import get_shared_resources
+    from modules.router import build_model_handler
+    from modules.scoring import score_application
+    from modules.server import LoanApiServer
+
+    stub = OllamaStubServer(token_delay=0.005).start()
+    shared = get_shared_resources('loan_data.csv')
+    shared.model_handler = build_model_handler(host=stub.url, fallback=shared.model_handler.fallback)
+    server = LoanApiServer(shared, port=0, workers=4, max_queue=4).start()
+
+    # Health and stats for the load balancer and dashboards
+    status, health, _ = request(server, 'GET', '/health')
+    assert status == 200 and health['status'] == 'ok' and health['capacity'] == 8, health
+    status, stats, _ = request(server, 'GET', '/stats')
+    assert status == 200 and stats['total_applications'] == shared.stats['total_applications']
+    print(f"✅ /health {health['status']}, /stats {stats['total_applications']} applications")
+
+    # Chat keeps history per session_id on top of the shared resources
+    status, first, _ = request(server, 'POST', '/chat', {'message': "What income do approved applicants have?"})
+    assert status == 200 and first['response'] == stub.response_text and first['session_id']
+    status, second, _ = request(server, 'POST', '/chat', {'message': "And what about credit scores?",
+                                                          'session_id': first['session_id']})
+    payload = [r['payload'] for r in stub.requests if r['path'] == '/api/chat'][-1]
+    assert [m['role'] for m in payload['messages']] == ['system', 'user', 'assistant', 'user'], payload['messages']
+    print("✅ /chat answered and carried the session's history into the next turn")
+
+    # Streaming chat as NDJSON chunks
+    conn = http.client.HTTPConnection(server.host, server.port, timeout=30)
+    conn.request('POST', '/chat', body=json.dumps({'message': "Tell me about DTI ratios", 'stream': True}))
+    response = conn.getresponse()
+    assert response.getheader('Content-Type') == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.read().splitlines() if line.strip()]
+    conn.close()
+    assert ''.join(line.get('chunk', '') for line in lines) == stub.response_text
+    assert len(lines) > 2 and lines[-1]['done'] and lines[-1]['session_id']
+    print(f"✅ Streamed /chat in {len(lines) - 1} chunks")
+
+    # Analysis and batch scoring match the in-process results
+    application = {'income': 80000, 'credit_score': 760, 'loan_amount': 20000, 'dti_ratio': 18,
+                   'employment_status': 'employed', 'purpose': 'Home improvement'}
+    status, analysis, _ = request(server, 'POST', '/analyze', application)
+    assert status == 200 and analysis['score'] == score_application(application)[0] and 'approval_probability' in analysis
+    applications = [application, {'income': 20000, 'credit_score': 580, 'dti_ratio': 50, 'employment_status': 'unemployed'}]
+    status, scored, _ = request(server, 'POST', '/score', {'applications': applications})
+    assert status == 200 and len(scored['results']) == 2
+    for result, app in zip(scored['results'], applications):
+        score, factors = score_application(app)
+        assert result['score'] == min(score, 100) and result['factors'] == factors
+        assert 0.0 <= result['approval_probability'] <= 1.0
+    print(f"✅ /analyze score {analysis['score']}, /score batch matches score_application")
+
+    # Bad requests are answered, not dropped
+    assert request(server, 'POST', '/chat', {'message': ""})[0] == 400
+    assert request(server, 'POST', '/score', {'applications': "nope"})[0] == 400
+    assert request(server, 'GET', '/nowhere')[0] == 404
+    assert request(server, 'GET', '/chat')[0] == 405
+    for bad in ({**application, 'income': None}, {**application, 'income': "abc"}, {'credit_score': 700, 'dti_ratio': 20}):
+        status, error, _ = request(server, 'POST', '/score', {'applications': [application, bad]})
+        assert status == 400 and error['error'].startswith("applications[1]: 'income'"), error
+    status, error, _ = request(server, 'POST', '/analyze', {**application, 'income': "80000"})
+    assert status == 400 and "'income' must be a finite number" in error['error'], error
+    for huge in (10 ** 400, -10 ** 400):
+        status, error, _ = request(server, 'POST', '/score', {'applications': [{**application, 'income': huge}]})
+        assert status == 400 and "'income' must be a finite number" in error['error'], error
+    status, body, _ = request(server, 'POST', '/score', {'applications': [{**application, 'income': 2 ** 64}]})
+    assert status == 200, body
+    status, error, _ = request(server, 'POST', '/analyze', {**application, 'loan_amount': True})
+    assert status == 400 and "'loan_amount'" in error['error'], error
+    conn = http.client.HTTPConnection(server.host, server.port, timeout=30)
+    conn.putrequest('POST', '/score')
+    conn.putheader('Content-Length', 'lots')
+    conn.endheaders()
+    response = conn.getresponse()
+    assert response.status == 400 and b"Content-Length" in response.read()
+    conn.close()
+    print("✅ Invalid requests get 400/404/405, naming the bad field")
+    server.stop()
+
+    # Backpressure: beyond workers + queue, requests get 429 immediately; slow requests get 504
+    slow_stub = OllamaStubServer(first_token_delay=1.0).start()
+    shared.model_handler = build_model_handler(host=slow_stub.url, fallback=shared.model_handler.fallback)
+    busy = LoanApiServer(shared, port=0, workers=1, max_queue=1, request_timeout=0.4).start()
+    results = []
+
+    def chat(i):
+        start = time.perf_counter()
+        status, _, response = request(busy, 'POST', '/chat', {'message': f"Question number {i} about loans"})
+        results.append((status, time.perf_counter() - start, response.getheader('Retry-After')))
+
+    threads = [threading.Thread(target=chat, args=(i,)) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    statuses = sorted(status for status, _, _ in results)
+    rejected = [r for r in results if r[0] == 429]
+    assert statuses.count(504) >= 1 and len(rejected) >= 2, results
+    assert all(seconds < 0.3 and retry == '1' for _, seconds, retry in rejected), rejected
+    status, health, _ = request(busy, 'GET', '/health')
+    assert status == 200 and health['rejected'] == len(rejected)
+    print(f"✅ Backpressure: {statuses.count(429)} × 429 (Retry-After) and {statuses.count(504)} × 504 "
+          f"with 1 worker and a queue of 1")
+    busy.stop()
+
+    stub.stop()
+    slow_stub.stop()
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+    import traceback
+    traceback.print_exc()
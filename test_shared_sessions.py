@@ -0,0 +1,58 @@
+import sys
+import os
+import tracemalloc
+
+# Add modules to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+import pyarrow as pa
+
+N_SESSIONS = 20
+
+
+def allocated_bytes():
+    # pandas string columns live in Arrow's memory pool, which tracemalloc cannot see
+    return tracemalloc.get_traced_memory()[0] + pa.total_allocated_bytes()
+
+
+try:
+    from modules.data_loader import LoanDataLoader
+    from modules.registry import create_session_engine, get_shared_resources, clear_shared_resources
+
+    tracemalloc.start()
+
+    # Cost of one dataset copy
+    before = allocated_bytes()
+    loader = LoanDataLoader('loan_data.csv')
+    loader.load_data()
+    loader.get_approval_stats()
+    dataset_bytes = allocated_bytes() - before
+    del loader
+    print(f"✅ One dataset copy: {dataset_bytes / 1e6:.1f} MB")
+
+    # The first session builds the shared bundle (dataset, classifier, indexes) once
+    clear_shared_resources()
+    before = allocated_bytes()
+    engines = [create_session_engine('loan_data.csv')]
+    shared_bytes = allocated_bytes() - before
+
+    before = allocated_bytes()
+    engines += [create_session_engine('loan_data.csv') for _ in range(N_SESSIONS - 1)]
+    sessions_bytes = allocated_bytes() - before
+    print(f"✅ {N_SESSIONS} sessions: {shared_bytes / 1e6:.1f} MB shared + {sessions_bytes / 1e6:.2f} MB "
+          f"for {N_SESSIONS - 1} more sessions (previously ~{2 * N_SESSIONS}x one dataset)")
+
+    shared = get_shared_resources('loan_data.csv')
+    assert all(engine.data_loader.df is shared.df for engine in engines), "sessions must share one DataFrame"
+    assert sessions_bytes < 0.5 * dataset_bytes, "extra sessions should not copy the dataset"
+
+    engines[0].process_message("hello")
+    assert len(engines[0].conversation_history) == 2 and not engines[1].conversation_history
+    print("✅ Conversation history stays per session")
+
+    tracemalloc.stop()
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+    import traceback
+    traceback.print_exc()
@@ -0,0 +1,88 @@
+import sys
+import os
+import time
+
+# Add modules to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+try:
+    from ollama_stub import OllamaStubServer
+    from modules.chat_engine import LoanApprovalChatEngine
+    from modules.model_handler import SYSTEM_PROMPT, LoanApprovalModel
+    from modules.registry import get_shared_resources
+
+    stub = OllamaStubServer(token_delay=0.02, first_token_delay=0.05).start()
+
+    model = LoanApprovalModel(host=stub.url)
+    assert model.model_available, "stub server should be detected as available"
+    print("✅ Model handler connected to stub Ollama")
+
+    # Time to first token vs full generation
+    start = time.perf_counter()
+    chunks = []
+    first_token = None
+    for chunk in model.generate_response_stream("What credit score do I need?", "context"):
+        if first_token is None:
+            first_token = time.perf_counter() - start
+        chunks.append(chunk)
+    total = time.perf_counter() - start
+    assert len(chunks) > 1 and ''.join(chunks) == stub.response_text
+    assert first_token < total / 2, (first_token, total)
+    print(f"✅ Streamed {len(chunks)} chunks: first token {first_token * 1000:.0f} ms, full response {total * 1000:.0f} ms")
+
+    # Repeat questions come back whole from the response cache
+    assert list(model.generate_response_stream("what credit score do i need", "context")) == [stub.response_text]
+    print("✅ Cached answer returned in one chunk")
+
+    # Chat engine streaming records the final message in history
+    shared = get_shared_resources('loan_data.csv')
+    engine = LoanApprovalChatEngine('loan_data.csv', shared=shared)
+    engine.model_handler = model
+    streamed = ''.join(engine.process_message_stream("Tell me about DTI ratios"))
+    assert streamed == stub.response_text
+    assert [m.role for m in engine.conversation_history] == ['user', 'assistant']
+    assert engine.conversation_history[-1].content == stub.response_text
+    print("✅ Chat engine stream recorded in conversation history")
+
+    # Chat API: stable system prefix, session turns as messages, keep-alive, prefill vs decode timing
+    kv_stub = OllamaStubServer(token_delay=0.001, load_delay=0.2, prefill_token_delay=0.0005).start()
+    engine = LoanApprovalChatEngine('loan_data.csv', shared=shared)
+    engine.model_handler = LoanApprovalModel(host=kv_stub.url, keep_alive='10m')
+    engine.process_message("What income do approved applicants have?")
+    first = engine.model_handler.last_timing
+    engine.process_message("And how does my DTI ratio of 30% compare?")
+    second = engine.model_handler.last_timing
+    payloads = [r['payload'] for r in kv_stub.requests if r['path'] == '/api/chat']
+    assert all(p['keep_alive'] == '10m' for p in payloads)
+    assert payloads[0]['messages'][0] == payloads[1]['messages'][0], "system prefix is stable across turns"
+    assert payloads[0]['messages'][0]['content'].startswith(SYSTEM_PROMPT)
+    assert "Total Applications" in payloads[0]['messages'][0]['content']
+    assert [m['role'] for m in payloads[1]['messages']] == ['system', 'user', 'assistant', 'user']
+    full_tokens = len(kv_stub.prompt_text(payloads[1])) // 4
+    assert first['load_seconds'] >= 0.2 and second['load_seconds'] < 0.01, (first, second)
+    assert second['prompt_tokens'] < full_tokens / 3, (second['prompt_tokens'], full_tokens)
+    assert second['prefill_seconds'] < first['prefill_seconds'] and second['decode_seconds'] > 0
+    print(f"✅ Second turn reused the prefix: prefilled {second['prompt_tokens']} of {full_tokens} prompt tokens "
+          f"in {second['prefill_seconds'] * 1000:.0f} ms (first turn {first['prompt_tokens']} in "
+          f"{first['prefill_seconds'] * 1000:.0f} ms + {first['load_seconds'] * 1000:.0f} ms load), "
+          f"decode {second['decode_seconds'] * 1000:.0f} ms, model kept loaded")
+
+    unloading = LoanApprovalModel(host=kv_stub.url, keep_alive=0)
+    unloading.generate_response("What credit score do I need?")
+    unloading.generate_response("What DTI ratio is too high?")
+    assert unloading.last_timing['load_seconds'] >= 0.2, "keep_alive=0 unloads after every request"
+    print("✅ keep_alive=0 reloads the model on every request")
+    kv_stub.stop()
+
+    # Failure before the first token falls back to the rule-based answer
+    stub.fail_requests = True
+    fallback = ''.join(model.generate_response_stream("hello there"))
+    assert fallback == model._get_fallback_response("hello there")
+    print("✅ Stream falls back when the model fails")
+
+    stub.stop()
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+    import traceback
+    traceback.print_exc()
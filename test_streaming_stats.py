@@ -0,0 +1,46 @@
+import sys
+import os
+import math
+
+# Add modules to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+try:
+    import pandas as pd
+    from modules.data_loader import LoanDataLoader
+
+    loader = LoanDataLoader('loan_data.csv', use_cache=False)
+    expected = loader.get_approval_stats()
+    rows = expected['total_applications']
+
+    def assert_matches(stats, label):
+        assert set(stats) == set(expected), label
+        for key, value in expected.items():
+            assert math.isclose(stats[key], value, rel_tol=1e-6), (label, key, stats[key], value)
+
+    # One chunk, many chunks, an uneven last chunk, and a chunk size from a memory ceiling
+    assert_matches(LoanDataLoader('loan_data.csv', use_cache=False).stream_approval_stats(), "single chunk")
+    streamer = LoanDataLoader('loan_data.csv', use_cache=False)
+    for chunksize in (1000, 7001):
+        assert_matches(streamer.stream_approval_stats(chunksize=chunksize), f"chunks of {chunksize}")
+    ceiling = LoanDataLoader('loan_data.csv', use_cache=False, memory_limit_mb=1)
+    chunk_rows = ceiling.stream_chunk_size()
+    assert chunk_rows < rows
+    assert_matches(ceiling.stream_approval_stats(), "1 MB ceiling")
+    assert streamer.df is None and ceiling.df is None
+    print(f"✅ Streamed stats equal get_approval_stats() for {rows} rows, in one chunk and in chunks "
+          f"of 1000, 7001 and {chunk_rows} (1 MB ceiling)")
+
+    # Samples: the first rows, or a reproducible uniform sample drawn across chunks
+    raw = pd.read_csv('loan_data.csv')
+    assert streamer.stream_sample_data(5).equals(raw.head(5))
+    sample = streamer.stream_sample_data(50, random_state=0, chunksize=1000)
+    again = streamer.stream_sample_data(50, random_state=0, chunksize=1000)
+    assert len(sample) == 50 and sample.equals(again) and sample.index.is_monotonic_increasing
+    assert sample.equals(raw.loc[sample.index]) and sample.index.max() > 1000
+    print(f"✅ Streamed samples: head and a reproducible 50-row sample across {math.ceil(rows / 1000)} chunks")
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+    import traceback
+    traceback.print_exc()